@@ -0,0 +1,83 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+from src.pipeline import Pipeline
+from src.schemas.test_case import TestCase
+from src.schemas.test_result import TestResult
+from src.rate_limit import DEFAULT_RATE_LIMITS, TokenBucket, call_with_retries, provider_for
+
+class AsyncExperimentRunner:
+    def __init__(self,
+                 pipeline: Pipeline,
+                 concurrency: int = 16,
+                 rate_limits: Optional[Dict[str, float]] = None,
+                 generate_answer: bool = False,
+                 max_retries: int = 5,
+                 k: int = 5,
+                 search_k: Optional[int] = None,
+                 on_result: Optional[Callable[[TestResult], None]] = None) -> None:
+        """
+        Runs test cases concurrently, keeping at most `concurrency` in flight.
+        Every provider call goes through that provider's token bucket and is retried with backoff when rate limited.
+        Each search goes search_k deep so deeper cutoffs can be scored, while a hit and the generated answer use the top k.
+        on_result is called with each result as soon as its case finishes.
+        """
+        self.pipeline = pipeline
+        self.concurrency = concurrency
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        self.generate_answer = generate_answer
+        self.max_retries = max_retries
+        self.k = k
+        self.search_k = max(k, search_k or k)
+        self.on_result = on_result
+        self.embedding_provider = provider_for(pipeline.embedding_function)
+
+    async def run_case(self, test_case: TestCase, semaphore: asyncio.Semaphore, buckets: Dict[str, TokenBucket]) -> TestResult:
+        async with semaphore:
+            try:
+                question = test_case.question
+
+                embed_start = time.time()
+                query_embedding = await call_with_retries(
+                    lambda: self.pipeline.aembed_query(question),
+                    buckets[self.embedding_provider],
+                    max_retries=self.max_retries,
+                )
+                embed_time = time.time() - embed_start
+
+                search_start = time.time()
+                retrieved_documents, sources = await self.pipeline.asearch(query_embedding, k=self.search_k)
+                search_time = time.time() - search_start
+
+                generate_time = 0.0
+                if self.generate_answer:
+                    generate_start = time.time()
+                    await call_with_retries(
+                        lambda: self.pipeline.agenerate(question, retrieved_documents=retrieved_documents[:self.k]),
+                        buckets["openai"],
+                        max_retries=self.max_retries,
+                    )
+                    generate_time = time.time() - generate_start
+
+                scores = [score for _doc, score in retrieved_documents]
+                result = TestResult(test_case, sources, embed_time=embed_time, search_time=search_time, generate_time=generate_time, scores=scores, k=self.k)
+            except Exception as e:
+                print(f"Error in AsyncExperimentRunner.run_case: {e}")
+                result = TestResult(test_case, [], k=self.k, error=str(e))
+
+            print(f"{'Passed' if result.hit else 'Failed'} test: {test_case.question}")
+            if self.on_result:
+                self.on_result(result)
+            return result
+
+    async def run(self, test_cases: List[TestCase]) -> List[TestResult]:
+        """
+        Runs all test cases and returns their results in the same order.
+        """
+        # Semaphores and buckets bind to the running event loop, so they are created per run
+        semaphore = asyncio.Semaphore(self.concurrency)
+        buckets = {provider: TokenBucket(rate) for provider, rate in self.rate_limits.items()}
+        return await asyncio.gather(*(self.run_case(test_case, semaphore, buckets) for test_case in test_cases))
+
+    def run_sync(self, test_cases: List[TestCase]) -> List[TestResult]:
+        return asyncio.run(self.run(test_cases))
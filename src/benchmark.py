@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+import numpy as np
+from typing import Dict, List, Optional
+from tabulate import tabulate
+from src.fakes import FakeChatModel, FakeEmbeddings
+from src.llm_cache import LLMResponseCache
+from src.model import Model
+from src.pipeline import Pipeline
+from src.schemas.question import Question
+from src.schemas.test_case import TestCase
+from src.test_generator import TestQuestionGenerator
+from src.tracing import tracer
+from src.vectorstore import SqlDb, VectorStoreManager
+
+BASELINES_PATH = "benchmarks/baselines.json"
+SYLLABLES = ["ka", "lo", "mi", "ner", "pol", "qu", "ra", "sen", "ti", "vo", "wex", "yor", "zan", "bri", "cul", "dro"]
+# metrics where a larger value is better, everything else is a latency
+THROUGHPUT_METRICS = ("ingest_pages_per_s", "ingest_chunks_per_s", "recall_at_5")
+
+def escape_pdf_text(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """
+    Writes a minimal text-only PDF, one list of lines per page, that pypdf can extract text from.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # the page tree is filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_numbers = []
+    for lines in pages:
+        content = "BT /F1 10 Tf 12 TL 50 750 Td " + " ".join(f"({escape_pdf_text(line)}) Tj T*" for line in lines) + " ET"
+        content = content.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        page_numbers.append(len(objects))
+    kids = " ".join(f"{number} 0 R" for number in page_numbers).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_numbers))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    with open(path, "wb") as f:
+        f.write(out)
+
+def build_synthetic_corpus(data_dir: str, num_files: int, pages_per_file: int, words_per_page: int = 400, vocab_size: int = 5000, seed: int = 0) -> None:
+    """
+    Writes num_files PDFs of made-up words drawn with a Zipf-like frequency, so the same seed always gives the same corpus.
+    """
+    rng = random.Random(seed)
+    vocab = list(dict.fromkeys("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(vocab_size)))
+    weights = [1.0 / (rank + 1) for rank in range(len(vocab))]
+    os.makedirs(data_dir, exist_ok=True)
+    for i in range(num_files):
+        pages = []
+        for _ in range(pages_per_file):
+            words = rng.choices(vocab, weights=weights, k=words_per_page)
+            pages.append([" ".join(words[start:start + 14]) for start in range(0, len(words), 14)])
+        write_pdf(os.path.join(data_dir, f"synthetic-{i:03d}.pdf"), pages)
+
+def sample_test_cases(vector_store_manager: VectorStoreManager, num_cases: int, seed: int = 0, query_words: int = 12) -> List[TestCase]:
+    """
+    Turns a run of words from each of num_cases random chunks into a question whose answer is that chunk.
+    """
+    rng = random.Random(seed)
+    count = vector_store_manager.count()
+    offsets = rng.sample(range(count), min(num_cases, count))
+    ids_at = vector_store_manager.ids_at(offsets)
+    ids = [ids_at[offset] for offset in offsets if offset in ids_at]
+    items = vector_store_manager.vector_store.get(ids=ids, include=["documents", "metadatas"])
+    chunks = {doc_id: (document, metadata) for doc_id, document, metadata in zip(items["ids"], items["documents"], items["metadatas"])}
+    test_cases = []
+    for doc_id in ids:
+        document, metadata = chunks[doc_id]
+        words = document.split()
+        start = rng.randint(0, max(0, len(words) - query_words))
+        test_cases.append(TestCase({
+            "QA": Question(question=" ".join(words[start:start + query_words]), answer="True"),
+            "doc_id": doc_id,
+            "source": os.path.basename(metadata["source"]),
+        }))
+    return test_cases
+
+def percentiles(latencies: List[float], name: str) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(np.asarray(latencies) * 1000, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+    return {f"{name}_p50_ms": float(p50), f"{name}_p95_ms": float(p95), f"{name}_p99_ms": float(p99)}
+
+def timed(call, items, warmup: int = 10) -> List[float]:
+    """
+    Times call on every item, after a few untimed calls so caches and lazy imports do not land in the tail.
+    """
+    for item in items[:warmup]:
+        call(item)
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        call(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+def run_benchmark(backend: str = "chroma",
+                  num_files: int = 4,
+                  pages_per_file: int = 20,
+                  num_queries: int = 200,
+                  dim: int = 256,
+                  embed_latency: float = 0.0,
+                  llm_latency: float = 0.0,
+                  seed: int = 0) -> Dict[str, float]:
+    """
+    Ingests a synthetic corpus into a throwaway store with fake embeddings and a fake chat model,
+    then times retrieve, generate and run_test_case per query. Nothing touches the network or the real db folder.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        data_dir = os.path.join(workdir, "data/")
+        build_synthetic_corpus(data_dir, num_files, pages_per_file, seed=seed)
+
+        # the framework prints per call, which would swamp the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            sql = SqlDb(os.path.join(workdir, "tracker.db"))
+            client = None
+            if backend == "chroma":
+                import chromadb
+                client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+            embeddings = FakeEmbeddings(dim=dim, latency=embed_latency)
+            manager = VectorStoreManager(
+                embedding_function=embeddings,
+                sql_document_tracker=sql,
+                backend=backend,
+                client=client,
+                store_dir=os.path.join(workdir, "numpy_store"),
+                data_dir=data_dir,
+                page_cache_dir=os.path.join(workdir, "page_cache"),
+            )
+            # the response cache is off so every generate call is timed against the model
+            llm_cache = LLMResponseCache(os.path.join(workdir, "llm_cache.db"), enabled=False)
+            pipeline = Pipeline(model=Model(llm=FakeChatModel(latency=llm_latency), cache=llm_cache), vector_store_manager=manager)
+            generator = TestQuestionGenerator(sql=sql, vector_store_manager=manager)
+
+            ingest_start = time.perf_counter()
+            stats = manager.ingest_data()
+            ingest_time = time.perf_counter() - ingest_start
+
+            test_cases = sample_test_cases(manager, num_queries, seed=seed)
+            questions = [test_case.question for test_case in test_cases]
+            retrieve_latencies = timed(lambda question: pipeline.retrieve(question, k=5), questions)
+            generate_latencies = timed(lambda question: pipeline.generate(question), questions)
+            end_to_end_latencies = timed(lambda test_case: generator.run_test_case(pipeline, test_case, generate_answer=True), test_cases)
+            results = [generator.run_test_case(pipeline, test_case) for test_case in test_cases]
+            sql.close()
+
+    # run_test_case makes one embedding call and one LLM call, whatever is left is our own overhead
+    simulated_latency = embed_latency + llm_latency
+    metrics = {
+        "ingest_s": ingest_time,
+        "ingest_pages_per_s": (stats.pages if stats else 0) / ingest_time,
+        "ingest_chunks_per_s": (stats.chunks if stats else 0) / ingest_time,
+    }
+    metrics.update(percentiles(retrieve_latencies, "retrieve"))
+    metrics.update(percentiles(generate_latencies, "generate"))
+    metrics.update(percentiles(end_to_end_latencies, "run_test_case"))
+    metrics["overhead_mean_ms"] = float(np.mean(end_to_end_latencies) - simulated_latency) * 1000 if end_to_end_latencies else 0.0
+    metrics["recall_at_5"] = sum(1 for result in results if result.hit) / len(results) if results else 0.0
+    return metrics
+
+def scenario_name(backend: str, num_files: int, pages_per_file: int, num_queries: int, dim: int) -> str:
+    return f"{backend}-files{num_files}-pages{pages_per_file}-queries{num_queries}-dim{dim}"
+
+def load_baselines(path: str = BASELINES_PATH) -> Dict[str, Dict[str, float]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_baseline(scenario: str, metrics: Dict[str, float], path: str = BASELINES_PATH) -> None:
+    baselines = load_baselines(path)
+    baselines[scenario] = metrics
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+
+def compare(metrics: Dict[str, float], baseline: Optional[Dict[str, float]], tolerance: float) -> tuple:
+    """
+    Returns the report rows and whether any metric regressed by more than tolerance against the baseline.
+    """
+    rows, regressed = [], False
+    for name, value in metrics.items():
+        base = (baseline or {}).get(name)
+        if base is None:
+            rows.append([name, "-", f"{value:.4f}", "-", "new"])
+            continue
+        change = (value - base) / base * 100 if base else 0.0
+        if name in THROUGHPUT_METRICS:
+            worse = value < base / (1 + tolerance)
+        else:
+            worse = value > base * (1 + tolerance)
+        regressed = regressed or worse
+        rows.append([name, f"{base:.4f}", f"{value:.4f}", f"{change:+.1f}%", "REGRESSION" if worse else "ok"])
+    return rows, regressed
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmarks with fake embeddings and a fake chat model, compared against stored baselines.")
+    parser.add_argument("--backend", choices=["chroma", "numpy", "both"], default="both")
+    parser.add_argument("--files", type=int, default=4, help="synthetic PDFs to generate")
+    parser.add_argument("--pages", type=int, default=20, help="pages per synthetic PDF")
+    parser.add_argument("--queries", type=int, default=200, help="queries timed per stage")
+    parser.add_argument("--dim", type=int, default=256, help="fake embedding dimension")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="seconds slept per embedding call")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds slept per LLM call")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative slowdown before a metric is flagged, timings on a shared machine are noisy")
+    parser.add_argument("--baselines", default=BASELINES_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline for its scenario")
+    parser.add_argument("--trace", action="store_true", help="also print per-stage timings for each backend")
+    args = parser.parse_args()
+    if args.trace:
+        tracer.enable()
+
+    backends = ["chroma", "numpy"] if args.backend == "both" else [args.backend]
+    baselines = load_baselines(args.baselines)
+    any_regressed = False
+    for backend in backends:
+        scenario = scenario_name(backend, args.files, args.pages, args.queries, args.dim)
+        metrics = run_benchmark(
+            backend=backend,
+            num_files=args.files,
+            pages_per_file=args.pages,
+            num_queries=args.queries,
+            dim=args.dim,
+            embed_latency=args.embed_latency,
+            llm_latency=args.llm_latency,
+        )
+        rows, regressed = compare(metrics, baselines.get(scenario), args.tolerance)
+        any_regressed = any_regressed or regressed
+        print(f"\nBenchmark: {scenario}")
+        print(tabulate(rows, headers=["Metric", "Baseline", "Current", "Change", "Status"], tablefmt="grid"))
+        if args.trace:
+            print(tracer.report())
+            tracer.reset()
+        if args.save_baseline:
+            save_baseline(scenario, metrics, args.baselines)
+            print(f"Saved baseline for {scenario} to {args.baselines}")
+    return 1 if any_regressed and not args.save_baseline else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,219 @@
+import os
+import time
+import hashlib
+import itertools
+from typing import Dict, List, Sequence, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import CharacterTextSplitter, RecursiveCharacterTextSplitter, TextSplitter, TokenTextSplitter
+from tabulate import tabulate
+from src.metrics import DEFAULT_KS, RetrievalMetrics
+from src.numpy_store import NumpyVectorStore
+from src.pipeline import QUERY_BATCH_SIZE, embed_queries
+from src.schemas.test_case import TestCase
+from src.vectorstore import VectorStoreManager
+
+CHUNKING_SWEEP_DIR = "db/chunking_sweep"
+DEFAULT_SPLITTERS = ("recursive", "character")
+DEFAULT_CHUNK_SIZES = (400, 800, 1200)
+DEFAULT_OVERLAPS = (0, 80)
+# a retrieved chunk is a hit when it covers at least this share of the shorter of itself and the test case's chunk
+MIN_SPAN_OVERLAP = 0.5
+EMBED_BATCH_SIZE = 256
+
+def build_splitter(splitter: str, chunk_size: int, chunk_overlap: int) -> TextSplitter:
+    if splitter == "recursive":
+        return RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if splitter == "character":
+        return CharacterTextSplitter(separator="\n", chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    if splitter == "token":
+        # sizes are in tokens of the encoding the OpenAI embedding models use, rather than characters
+        return TokenTextSplitter(encoding_name="cl100k_base", chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    raise ValueError(f"Unknown splitter: {splitter}")
+
+def locate_chunks(page_text: str, chunks: List[str]) -> List[Tuple[int, int]]:
+    """
+    Character span of each chunk within its page. Chunks come in page order, so each search starts after the previous chunk's start.
+    """
+    spans = []
+    cursor = 0
+    for chunk in chunks:
+        start = page_text.find(chunk, cursor)
+        if start < 0:
+            start = max(page_text.find(chunk), 0)
+        spans.append((start, start + len(chunk)))
+        cursor = start + 1
+    return spans
+
+def spans_match(chunk: Tuple[str, int, int, int], target: Tuple[str, int, int, int]) -> bool:
+    source, page, start, end = chunk
+    target_source, target_page, target_start, target_end = target
+    if source != target_source or page != target_page:
+        return False
+    overlap = min(end, target_end) - max(start, target_start)
+    return overlap > 0 and overlap >= MIN_SPAN_OVERLAP * min(end - start, target_end - target_start)
+
+class ChunkingSweep:
+    def __init__(self,
+                 vector_store_manager: VectorStoreManager,
+                 splitters: Sequence[str] = DEFAULT_SPLITTERS,
+                 chunk_sizes: Sequence[int] = DEFAULT_CHUNK_SIZES,
+                 overlaps: Sequence[int] = DEFAULT_OVERLAPS,
+                 ks: Sequence[int] = DEFAULT_KS,
+                 store_dir: str = CHUNKING_SWEEP_DIR) -> None:
+        """
+        Re-splits the cached page text of the corpus under every combination of splitter, chunk size and overlap,
+        keeping each configuration's chunks in its own NumPy store next to the model's collection.
+        Only chunk texts the embedding cache has never seen are sent to the API, and configurations already built are only topped up.
+        Since chunk ids differ between configurations, a retrieved chunk counts as a hit when its span on the page overlaps the test case's chunk.
+        """
+        self.vector_store_manager = vector_store_manager
+        self.embedding_function = vector_store_manager.embedding_function
+        self.configs = [
+            (splitter, chunk_size, overlap)
+            for splitter, chunk_size, overlap in itertools.product(splitters, chunk_sizes, overlaps)
+            if overlap < chunk_size
+        ]
+        self.ks = sorted(set(ks))
+        self.store_dir = store_dir
+
+    def load_pages(self) -> Tuple[Dict[str, List[str]], float]:
+        """
+        Page texts of every file in the data folder, from the page cache where possible, and the time it took.
+        """
+        start = time.perf_counter()
+        pages = {}
+        for path in self.vector_store_manager.manifest.list_files():
+            try:
+                pages[path] = self.vector_store_manager.page_cache.load_pages(path)
+            except Exception as e:
+                print(f"Error in ChunkingSweep.load_pages: {e}")
+        return pages, time.perf_counter() - start
+
+    def target_spans(self, test_cases: List[TestCase], pages: Dict[str, List[str]]) -> Tuple[List[TestCase], List[Tuple[str, int, int, int]]]:
+        """
+        Finds where each test case's chunk sits on its page, dropping test cases whose chunk cannot be found.
+        """
+        items = self.vector_store_manager.vector_store.get(ids=[test_case.doc_id for test_case in test_cases], include=["documents", "metadatas"])
+        chunks = {doc_id: (document, metadata) for doc_id, document, metadata in zip(items["ids"], items["documents"], items["metadatas"])}
+        kept, spans = [], []
+        for test_case in test_cases:
+            if test_case.doc_id not in chunks:
+                continue
+            document, metadata = chunks[test_case.doc_id]
+            source, page = metadata.get("source"), metadata.get("page")
+            if source not in pages or page is None or page >= len(pages[source]):
+                continue
+            start = pages[source][page].find(document)
+            if start < 0:
+                continue
+            kept.append(test_case)
+            spans.append((source, page, start, start + len(document)))
+        return kept, spans
+
+    def ingest(self, config: Tuple[str, int, int], pages: Dict[str, List[str]]) -> Tuple[NumpyVectorStore, Dict]:
+        """
+        Brings one configuration's store up to date with the corpus, embedding only the chunks it does not have.
+        """
+        splitter_name, chunk_size, overlap = config
+        namespace = f"{self.vector_store_manager.collection_name}-{splitter_name}-{chunk_size}-{overlap}"
+        store = NumpyVectorStore(namespace, self.embedding_function, store_dir=self.store_dir)
+        splitter = build_splitter(splitter_name, chunk_size, overlap)
+
+        split_start = time.perf_counter()
+        chunks = {}
+        for source, page_texts in pages.items():
+            for page, text in enumerate(page_texts):
+                texts = splitter.split_text(text)
+                for chunk_text, (start, end) in zip(texts, locate_chunks(text, texts)):
+                    chunk_id = hashlib.sha256(f"{source}\0{page}\0{start}\0{chunk_text}".encode()).hexdigest()[:32]
+                    chunks[chunk_id] = Document(page_content=chunk_text, metadata={"source": source, "page": page, "start": start, "end": end, "id": chunk_id})
+        split_time = time.perf_counter() - split_start
+
+        # chunks of files that changed or disappeared since the last sweep
+        stale = set(store.ids).difference(chunks)
+        if stale:
+            store.delete(ids=list(stale))
+        new_ids = [chunk_id for chunk_id in chunks if chunk_id not in store.index_by_id]
+
+        misses_before = getattr(self.embedding_function, "misses", None)
+        embed_start = time.perf_counter()
+        for start in range(0, len(new_ids), EMBED_BATCH_SIZE):
+            batch = new_ids[start:start + EMBED_BATCH_SIZE]
+            store.add_documents([chunks[chunk_id] for chunk_id in batch], ids=batch)
+        embed_time = time.perf_counter() - embed_start
+        api_embeddings = self.embedding_function.misses - misses_before if misses_before is not None else len(new_ids)
+
+        index_bytes = store.count() * store.dim * 4
+        if os.path.exists(store.records_path):
+            index_bytes += os.path.getsize(store.records_path)
+        return store, {
+            "chunks": len(chunks),
+            "new_chunks": len(new_ids),
+            "api_embeddings": api_embeddings,
+            "split_s": split_time,
+            "embed_s": embed_time,
+            "index_bytes": index_bytes,
+        }
+
+    def run(self, test_cases: List[TestCase]) -> List[Dict]:
+        """
+        Ingests and scores every configuration with the same test cases, returning one row of results each.
+        """
+        pages, load_time = self.load_pages()
+        test_cases, targets = self.target_spans(test_cases, pages)
+        print(f"Sweeping {len(self.configs)} chunking configurations over {sum(map(len, pages.values()))} pages with {len(test_cases)} test cases")
+
+        questions = [test_case.question for test_case in test_cases]
+        queries = []
+        for start in range(0, len(questions), QUERY_BATCH_SIZE):
+            queries += embed_queries(self.embedding_function, questions[start:start + QUERY_BATCH_SIZE])
+
+        rows = []
+        for config in self.configs:
+            try:
+                store, cost = self.ingest(config, pages)
+            except Exception as e:
+                print(f"Error in ChunkingSweep.run for {'-'.join(map(str, config))}: {e}")
+                continue
+            search_start = time.perf_counter()
+            results = store.search_by_vectors(queries, k=max(self.ks))
+            search_time = time.perf_counter() - search_start
+
+            ranks = []
+            for retrieved, target in zip(results, targets):
+                rank = 0
+                for i, (document, _score) in enumerate(retrieved):
+                    metadata = document.metadata
+                    if spans_match((metadata["source"], metadata["page"], metadata["start"], metadata["end"]), target):
+                        rank = i + 1
+                        break
+                ranks.append(rank)
+
+            splitter_name, chunk_size, overlap = config
+            rows.append({
+                "splitter": splitter_name,
+                "chunk_size": chunk_size,
+                "overlap": overlap,
+                **cost,
+                "page_load_s": load_time,
+                "search_ms_per_query": search_time / max(len(queries), 1) * 1000,
+                "metrics": RetrievalMetrics(ranks, self.ks),
+            })
+        return rows
+
+    def to_dict(self, rows: List[Dict]) -> List[Dict]:
+        return [{**row, "metrics": row["metrics"].to_dict()} for row in rows]
+
+    def report(self, rows: List[Dict]) -> str:
+        headers = ["Splitter", "Size", "Overlap", "Chunks", "New Chunks", "API Embeddings", "Split (s)", "Embed (s)", "Index Size (MB)", "Search (ms/query)"]
+        headers += [f"Recall@{k} (%)" for k in self.ks] + [f"MRR@{self.ks[-1]}"]
+        table = []
+        for row in rows:
+            metrics = row["metrics"]
+            table.append(
+                [row["splitter"], row["chunk_size"], row["overlap"], row["chunks"], row["new_chunks"], row["api_embeddings"],
+                 f"{row['split_s']:.3f}", f"{row['embed_s']:.3f}", f"{row['index_bytes'] / 1e6:.2f}", f"{row['search_ms_per_query']:.3f}"]
+                + [f"{recall * 100:.2f}" for recall in metrics.recall]
+                + [f"{metrics.mrr:.4f}"]
+            )
+        return tabulate(table, headers=headers, tablefmt="grid")
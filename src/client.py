@@ -0,0 +1,146 @@
+import sys
+import json
+import socket
+import argparse
+import http.client
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+from tabulate import tabulate
+
+# kept here rather than in src.server so the client never imports the evaluation stack
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class EvaluationClient:
+    def __init__(self, url: str = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}", socket_path: Optional[str] = None) -> None:
+        """
+        Talks to a running evaluation server (python -m src.server) over TCP or, when socket_path is set, a Unix socket.
+        """
+        self.url = urlparse(url)
+        self.socket_path = socket_path
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self.socket_path:
+            return UnixHTTPConnection(self.socket_path)
+        return http.client.HTTPConnection(self.url.hostname, self.url.port or DEFAULT_PORT)
+
+    def health(self) -> Dict:
+        connection = self._connection()
+        try:
+            connection.request("GET", "/health")
+            return json.loads(connection.getresponse().read())
+        finally:
+            connection.close()
+
+    def submit(self, job: Dict) -> Iterator[Dict]:
+        """
+        Submits a job and yields its events (started, result per case, summary or error) as the server sends them.
+        """
+        connection = self._connection()
+        try:
+            body = json.dumps(job)
+            connection.request("POST", "/jobs", body=body, headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            if response.status != 200:
+                yield {"event": "error", "message": json.loads(response.read() or b"{}").get("error", response.reason)}
+                return
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            connection.close()
+
+def summary_table(summary: Dict) -> str:
+    table = [
+        ["Run Id", summary["run_id"]],
+        ["Total Experiments", summary["num_cases"]],
+        ["Successes", summary["successes"]],
+        ["Failures", summary["num_cases"] - summary["successes"]],
+        ["Errored Cases", summary["failed_cases"]],
+        ["Success Rate (%)", f"{summary['success_rate'] * 100:.2f}"],
+        ["Total Duration (s)", f"{summary['duration_s']:.4f}"],
+    ]
+    metrics = summary.get("metrics", {})
+    for k, recall in metrics.get("recall", {}).items():
+        table.append([f"Recall@{k} (%)", f"{recall['value'] * 100:.2f}"])
+    if "mrr" in metrics:
+        table.append(["MRR", f"{metrics['mrr']['value']:.4f}"])
+    return tabulate(table, headers=["Metric", "Value"], tablefmt="grid")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Submit an evaluation job to a running server and stream its results.")
+    parser.add_argument("--url", default=f"http://{DEFAULT_HOST}:{DEFAULT_PORT}")
+    parser.add_argument("--socket", help="connect to the server's Unix socket instead of --url")
+    parser.add_argument("--health", action="store_true", help="print the server's status and exit")
+    parser.add_argument("--embedding", default="OPENAI_LARGE")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="chroma")
+    parser.add_argument("--mode", choices=["sequential", "batch", "async"], default="batch")
+    parser.add_argument("--cases", type=int, default=10, help="test cases to sample")
+    parser.add_argument("--doc-ids", nargs="*", help="run these documents' stored QA pairs instead of sampling")
+    parser.add_argument("--k", type=int, default=5, help="cutoff for a hit")
+    parser.add_argument("--ks", default="1,3,5,10,20", help="cutoffs to score, comma separated")
+    parser.add_argument("--no-stratify", action="store_true", help="sample chunks uniformly instead of spreading over sources and pages")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--generate", action="store_true", help="also generate answers (Sequential and Async)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sync", action="store_true", help="sync the collection with data/ before running")
+    parser.add_argument("--json", action="store_true", help="print the raw event stream as newline-delimited JSON")
+    parser.add_argument("--fail-under", type=float, help="exit non-zero when the success rate (%%) is below this")
+    args = parser.parse_args()
+
+    client = EvaluationClient(args.url, args.socket)
+    if args.health:
+        print(json.dumps(client.health(), indent=2))
+        return
+
+    job = {
+        "embedding": args.embedding,
+        "backend": args.backend,
+        "mode": args.mode,
+        "num_cases": args.cases,
+        "doc_ids": args.doc_ids,
+        "k": args.k,
+        "ks": [int(k) for k in args.ks.split(",") if k.strip()],
+        "stratify": not args.no_stratify,
+        "seed": args.seed,
+        "generate_answer": args.generate,
+        "concurrency": args.concurrency,
+        "sync": args.sync,
+    }
+
+    summary = None
+    for event in client.submit(job):
+        if args.json:
+            print(json.dumps(event), flush=True)
+        elif event["event"] == "started":
+            print(f"Run {event['run_id']}: {event['num_cases']} test cases", flush=True)
+        elif event["event"] == "result":
+            rank = event.get("rank")
+            print(f"{'Passed' if event.get('hit') else 'Failed'} test: {event.get('question')} (rank {rank if rank else '-'})", flush=True)
+        elif event["event"] == "error":
+            print(f"Error from server: {event['message']}", file=sys.stderr)
+            sys.exit(1)
+        if event["event"] == "summary":
+            summary = event
+
+    if summary is None:
+        print("Server closed the stream before the job finished", file=sys.stderr)
+        sys.exit(1)
+    if not args.json:
+        print(summary_table(summary))
+    if args.fail_under is not None and summary["success_rate"] * 100 < args.fail_under:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+from tabulate import tabulate
+from src.metrics import DEFAULT_KS, RetrievalMetrics
+from src.schemas.test_case import TestCase
+from src.schemas.test_result import TestResult
+from src.registry import Embedding, registry
+from src.test_generator import TestQuestionGenerator
+from src.vectorstore import sync_vector_stores
+
+class EmbeddingComparison:
+    def __init__(self, embeddings: List[Embedding], backend: str = "chroma") -> None:
+        """
+        Evaluates several embedding models side by side against the same test cases.
+        Each model searches its own collection, and test documents are sampled from the first model's collection.
+        """
+        self.pipelines = {embedding.name: registry.pipeline(embedding, backend) for embedding in embeddings}
+        self.vector_store_managers = {name: pipeline.vector_store_manager for name, pipeline in self.pipelines.items()}
+        first_manager = next(iter(self.vector_store_managers.values()))
+        self.test_generator = TestQuestionGenerator(vector_store_manager=first_manager)
+        self.durations = {}
+        self.ks = DEFAULT_KS
+
+    def sync(self) -> None:
+        """
+        Brings every model's collection up to date, parsing and chunking each changed file only once.
+        """
+        sync_vector_stores(list(self.vector_store_managers.values()))
+
+    def run(self, test_cases: List[TestCase], k: int = 5, ks: Sequence[int] = DEFAULT_KS,
+            on_result: Optional[Callable[[str, TestResult], None]] = None) -> Dict[str, List[TestResult]]:
+        """
+        Runs the same test cases against every model, returning each model's results in test case order.
+        Each model searches once at the largest cutoff in ks so every cutoff can be reported.
+        on_result is called with the model's name and each result as its batch finishes.
+        """
+        self.ks = ks
+        results = {}
+        for name, pipeline in self.pipelines.items():
+            start = time.time()
+            record = (lambda result, name=name: on_result(name, result)) if on_result else None
+            results[name] = self.test_generator.run_test_cases_batch(pipeline_to_test=pipeline, test_cases=test_cases, k=k, search_k=max(ks), on_result=record)
+            # accumulated, since an adaptive run calls this once per round
+            self.durations[name] = self.durations.get(name, 0.0) + time.time() - start
+        return results
+
+    def report(self, results: Dict[str, List[TestResult]]) -> str:
+        """
+        Formats one summary table per model followed by the test cases the models disagree on.
+        """
+        sections = []
+        for name, model_results in results.items():
+            num_cases = len(model_results)
+            success_count = sum(1 for result in model_results if result.hit)
+            table = [
+                ["Total Experiments", num_cases],
+                ["Successes", success_count],
+                ["Failures", num_cases - success_count],
+                ["Success Rate (%)", f"{success_count / num_cases * 100 if num_cases else 0:.2f}"],
+                ["Total Duration (s)", f"{self.durations.get(name, 0):.4f}"],
+                ["Average Embedding Time (s)", f"{sum(r.embed_time for r in model_results) / max(num_cases, 1):.4f}"],
+                ["Average Search Time (s)", f"{sum(r.search_time for r in model_results) / max(num_cases, 1):.4f}"],
+            ]
+            table += RetrievalMetrics.from_results(model_results, self.ks).summary_rows()
+            sections.append(f"\nTest Results Summary: {name}\n" + tabulate(table, headers=["Metric", "Value"], tablefmt="grid"))
+
+        names = list(results)
+        disagreements = []
+        for i, case_results in enumerate(zip(*(results[name] for name in names))):
+            hits = [result.hit for result in case_results]
+            if len(set(hits)) > 1:
+                question = case_results[0].question
+                disagreements.append(
+                    [i + 1, case_results[0].doc_id, question if len(question) <= 60 else question[:57] + "..."]
+                    + ["hit" if hit else "miss" for hit in hits]
+                )
+        num_cases = min((len(model_results) for model_results in results.values()), default=0)
+        sections.append(f"\nDisagreements ({len(disagreements)} of {num_cases} test cases)")
+        if disagreements:
+            sections.append(tabulate(disagreements, headers=["Case", "Doc ID", "Question"] + names, tablefmt="grid"))
+        return "\n".join(sections)
@@ -0,0 +1,163 @@
+import time
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+from tabulate import tabulate
+from src.metrics import DEFAULT_KS, RetrievalMetrics
+from src.numpy_store import normalize, top_k
+from src.pipeline import QUERY_BATCH_SIZE, embed_queries
+from src.schemas.test_case import TestCase
+from src.vectorstore import VectorStoreManager
+
+DEFAULT_DIMS = (256, 512, 1024)
+RESCORE_FACTOR = 4  # binary search keeps this many candidates per result for float rescoring
+DEQUANTIZE_BLOCK_SIZE = 4096  # int8 rows expanded to float32 at a time
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+class FloatIndex:
+    name = "float32"
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        self.vectors = vectors.astype(np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return self.vectors.nbytes
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        return top_k((self.vectors @ query)[None, :], k)[0][0]
+
+class Int8Index:
+    name = "int8"
+
+    def __init__(self, vectors: np.ndarray) -> None:
+        """
+        Symmetric scalar quantization with one scale per dimension, so each value takes one byte.
+        Rows are expanded back to float32 a block at a time while searching.
+        """
+        self.scale = np.abs(vectors).max(axis=0) / 127.0
+        self.scale[self.scale == 0] = 1.0
+        self.codes = np.clip(np.round(vectors / self.scale), -127, 127).astype(np.int8)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scale.astype(np.float32).nbytes
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        # folding the scales into the query keeps the codes untouched
+        scaled_query = (query * self.scale).astype(np.float32)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), DEQUANTIZE_BLOCK_SIZE):
+            scores[start:start + DEQUANTIZE_BLOCK_SIZE] = self.codes[start:start + DEQUANTIZE_BLOCK_SIZE].astype(np.float32) @ scaled_query
+        return top_k(scores[None, :], k)[0][0]
+
+class BinaryIndex:
+    def __init__(self, vectors: np.ndarray, rescore: bool = False) -> None:
+        """
+        One bit per dimension (the sign), searched by Hamming distance.
+        With rescore, the best RESCORE_FACTOR * k candidates are re-ranked against the float vectors,
+        which would stay on disk rather than in memory, so they are not counted in nbytes.
+        """
+        self.name = "binary + rescore" if rescore else "binary"
+        self.codes = np.packbits(vectors > 0, axis=1)
+        self.vectors = vectors.astype(np.float32) if rescore else None
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    def search(self, query: np.ndarray, k: int) -> np.ndarray:
+        query_code = np.packbits(query > 0)
+        similarity = -POPCOUNT[np.bitwise_xor(self.codes, query_code)].sum(axis=1, dtype=np.int32)
+        if self.vectors is None:
+            return top_k(similarity[None, :], k)[0][0]
+        candidates = top_k(similarity[None, :], k * RESCORE_FACTOR)[0][0]
+        order = top_k((self.vectors[candidates] @ query)[None, :], k)[0][0]
+        return candidates[order]
+
+class CompressionStudy:
+    def __init__(self, vector_store_manager: VectorStoreManager, dims: Sequence[int] = DEFAULT_DIMS, ks: Sequence[int] = DEFAULT_KS) -> None:
+        """
+        Searches compressed copies of a collection's stored vectors with the same test cases:
+        Matryoshka-style truncation to each of dims, int8 scalar quantization and binary quantization with and without rescoring.
+        Nothing is re-embedded except the test questions, which the embedding cache usually already holds.
+        """
+        self.vector_store_manager = vector_store_manager
+        self.ks = sorted(set(ks))
+        self.dims = sorted(set(dims))
+
+    def load_vectors(self) -> Tuple[List[str], np.ndarray]:
+        return self.vector_store_manager.load_embeddings()
+
+    def build_indexes(self, vectors: np.ndarray) -> List[Tuple[int, object]]:
+        """
+        Returns (dimensions, index) for every variant, the full dimension first.
+        """
+        full_dim = vectors.shape[1]
+        indexes = []
+        for dim in [full_dim] + [dim for dim in self.dims if dim < full_dim]:
+            # truncated prefixes are renormalized, as Matryoshka models expect
+            truncated = normalize(vectors[:, :dim])
+            indexes += [
+                (dim, FloatIndex(truncated)),
+                (dim, Int8Index(truncated)),
+                (dim, BinaryIndex(truncated)),
+                (dim, BinaryIndex(truncated, rescore=True)),
+            ]
+        return indexes
+
+    def run(self, test_cases: List[TestCase]) -> List[Dict]:
+        """
+        Scores every variant on the test cases, returning one row of results per variant.
+        """
+        ids, vectors = self.load_vectors()
+        position = {doc_id: i for i, doc_id in enumerate(ids)}
+        test_cases = [test_case for test_case in test_cases if test_case.doc_id in position]
+        if not test_cases:
+            print("No test cases to score, generate some QA pairs for this model first")
+            return []
+        print(f"Scoring {len(test_cases)} test cases against {len(ids)} stored vectors")
+        targets = np.array([position[test_case.doc_id] for test_case in test_cases], dtype=int)
+
+        questions = [test_case.question for test_case in test_cases]
+        queries = []
+        for start in range(0, len(questions), QUERY_BATCH_SIZE):
+            queries += embed_queries(self.vector_store_manager.embedding_function, questions[start:start + QUERY_BATCH_SIZE])
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(questions), -1)
+
+        k = max(self.ks)
+        full_size = None
+        rows = []
+        for dim, index in self.build_indexes(vectors):
+            truncated_queries = normalize(queries[:, :dim])
+            latencies, ranks = [], []
+            for query, target in zip(truncated_queries, targets):
+                start = time.perf_counter()
+                found = index.search(query, k)
+                latencies.append(time.perf_counter() - start)
+                hits = np.flatnonzero(found == target)
+                ranks.append(int(hits[0]) + 1 if len(hits) else 0)
+            full_size = full_size or index.nbytes
+            rows.append({
+                "variant": index.name,
+                "dim": dim,
+                "bytes": index.nbytes,
+                "compression": full_size / index.nbytes,
+                "latency_p50_ms": float(np.percentile(latencies, 50) * 1000) if latencies else 0.0,
+                "metrics": RetrievalMetrics(ranks, self.ks),
+            })
+        return rows
+
+    def to_dict(self, rows: List[Dict]) -> List[Dict]:
+        return [{**row, "metrics": row["metrics"].to_dict()} for row in rows]
+
+    def report(self, rows: List[Dict]) -> str:
+        headers = ["Variant", "Dim", "Index Size (MB)", "Compression", "p50 Query (ms)"] + [f"Recall@{k} (%)" for k in self.ks] + [f"MRR@{self.ks[-1]}"]
+        table = []
+        for row in rows:
+            metrics = row["metrics"]
+            table.append(
+                [row["variant"], row["dim"], f"{row['bytes'] / 1e6:.2f}", f"{row['compression']:.1f}x", f"{row['latency_p50_ms']:.3f}"]
+                + [f"{recall * 100:.2f}" for recall in metrics.recall]
+                + [f"{metrics.mrr:.4f}"]
+            )
+        return tabulate(table, headers=headers, tablefmt="grid")
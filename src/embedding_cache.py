@@ -0,0 +1,173 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from typing import Dict, List
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = "db/embedding_cache.db"
+LOOKUP_BATCH_SIZE = 500  # stay below sqlite's bound parameter limit
+
+def is_cohere(embedding_function: Embeddings) -> bool:
+    # checked by class name so OpenAI-only runs never import the Cohere SDK
+    return type(embedding_function).__name__ == "CohereEmbeddings"
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying: Embeddings, cache_path: str = EMBEDDING_CACHE_PATH, max_entries: int = 1_000_000) -> None:
+        """
+        Wraps any LangChain Embeddings object with a disk-backed cache keyed by (model, input type, hash of text).
+        The least recently used vectors are evicted once the cache holds more than max_entries.
+        hits and misses count texts, requests counts the calls actually sent to the provider, retries included.
+        """
+        self.underlying = underlying
+        self.model = underlying.model
+        self.max_entries = max_entries
+        # Cohere embeds queries and documents differently, OpenAI does not, so only split the cache where it matters
+        self.query_kind = "query" if is_cohere(underlying) else "document"
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        try:
+            self.conn = sqlite3.connect(cache_path, check_same_thread=False, timeout=30)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS embeddings (
+                                    model TEXT NOT NULL,
+                                    kind TEXT NOT NULL,
+                                    text_hash TEXT NOT NULL,
+                                    vector BLOB NOT NULL,
+                                    last_used REAL NOT NULL,
+                                    PRIMARY KEY (model, kind, text_hash)
+                                )''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)')
+            self.conn.commit()
+            self.num_entries = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        except Exception as e:
+            print(f"Error in CachedEmbeddings.__init__: {e}")
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _lookup(self, kind: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """
+        Returns the cached vectors for the given text hashes and marks them as recently used.
+        """
+        found = {}
+        with self._lock:
+            unique_hashes = list(dict.fromkeys(hashes))
+            for start in range(0, len(unique_hashes), LOOKUP_BATCH_SIZE):
+                batch = unique_hashes[start:start + LOOKUP_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND kind = ? AND text_hash IN ({placeholders})',
+                    (self.model, kind, *batch)
+                ).fetchall()
+                for text_hash, vector in rows:
+                    found[text_hash] = np.frombuffer(vector, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self.conn.executemany(
+                    'UPDATE embeddings SET last_used = ? WHERE model = ? AND kind = ? AND text_hash = ?',
+                    [(now, self.model, kind, text_hash) for text_hash in found]
+                )
+                self.conn.commit()
+        return found
+
+    def _store(self, kind: str, vectors: Dict[str, List[float]]) -> None:
+        """
+        Persists newly computed vectors and evicts the least recently used entries past max_entries.
+        """
+        with self._lock:
+            now = time.time()
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (model, kind, text_hash, vector, last_used) VALUES (?, ?, ?, ?, ?)',
+                [(self.model, kind, text_hash, np.asarray(vector, dtype=np.float32).tobytes(), now) for text_hash, vector in vectors.items()]
+            )
+            self.num_entries += len(vectors)
+
+            if self.num_entries > self.max_entries:
+                # The running count is an upper bound, so recount before evicting anything
+                self.num_entries = self.conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+                overflow = self.num_entries - self.max_entries
+                if overflow > 0:
+                    self.conn.execute(
+                        'DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)',
+                        (overflow,)
+                    )
+                    self.num_entries -= overflow
+            self.conn.commit()
+
+    def _partition(self, kind: str, texts: List[str]):
+        """
+        Splits texts into cached vectors and the unique texts that still need embedding.
+        """
+        hashes = [self.hash_text(text) for text in texts]
+        try:
+            found = self._lookup(kind, hashes)
+        except Exception as e:
+            print(f"Error in CachedEmbeddings._partition: {e}")
+            found = {}
+
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+                missing[text_hash] = text
+        return hashes, found, missing
+
+    def _merge(self, kind: str, hashes: List[str], found: Dict[str, List[float]], missing: Dict[str, str], new_vectors: List[List[float]]) -> List[List[float]]:
+        computed = dict(zip(missing.keys(), new_vectors))
+        if computed:
+            try:
+                self._store(kind, computed)
+            except Exception as e:
+                print(f"Error in CachedEmbeddings._merge: {e}")
+        found.update(computed)
+        return [found[text_hash] for text_hash in hashes]
+
+    def _embed_uncached_queries(self, texts: List[str]) -> List[List[float]]:
+        self.requests += 1
+        if is_cohere(self.underlying):
+            return self.underlying.embed(texts, input_type="search_query")
+        return self.underlying.embed_documents(texts)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing = self._partition("document", texts)
+        if missing:
+            self.requests += 1
+        new_vectors = self.underlying.embed_documents(list(missing.values())) if missing else []
+        return self._merge("document", hashes, found, missing, new_vectors)
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing = self._partition(self.query_kind, texts)
+        new_vectors = self._embed_uncached_queries(list(missing.values())) if missing else []
+        return self._merge(self.query_kind, hashes, found, missing, new_vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, found, missing = self._partition("document", texts)
+        if missing:
+            self.requests += 1
+        new_vectors = await self.underlying.aembed_documents(list(missing.values())) if missing else []
+        return self._merge("document", hashes, found, missing, new_vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        hashes, found, missing = self._partition(self.query_kind, [text])
+        if not missing:
+            return found[hashes[0]]
+        self.requests += 1
+        new_vectors = [await self.underlying.aembed_query(text)]
+        return self._merge(self.query_kind, hashes, found, missing, new_vectors)[0]
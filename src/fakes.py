@@ -0,0 +1,75 @@
+import re
+import time
+import hashlib
+import numpy as np
+from typing import Any, Dict, List, Optional, Type
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable, RunnableLambda
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dim: int = 256, latency: float = 0.0) -> None:
+        """
+        Deterministic hashed bag-of-words embeddings for offline runs, no API key or network needed.
+        Texts sharing words land close together, so retrieval behaves sensibly on synthetic corpora.
+        latency is slept once per call to stand in for a provider round trip.
+        """
+        self.dim = dim
+        self.latency = latency
+        self.model = f"fake-hash-{dim}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+            # the lowest bit picks the sign so unrelated tokens cancel out rather than pile up
+            vector[(digest >> 1) % self.dim] += 1.0 if digest & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model for offline runs. Answers echo the last answer_length characters of the prompt,
+    and structured output fills the schema's fields from it, so QA pair generation works too.
+    latency is slept once per call to stand in for a provider round trip.
+    """
+    latency: float = 0.0
+    answer_length: int = 200
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        # latency never changes an answer, so it stays out of response cache keys
+        return {"answer_length": self.answer_length}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        text = " ".join(str(message.content) for message in messages)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text[-self.answer_length:]))])
+
+    def with_structured_output(self, schema: Type, **kwargs: Any) -> Runnable:
+        def structured(prompt_value) -> Any:
+            if self.latency:
+                time.sleep(self.latency)
+            text = prompt_value.to_string() if hasattr(prompt_value, "to_string") else str(prompt_value)
+            words = TOKEN_PATTERN.findall(text)
+            snippet = " ".join(words[-12:])
+            values = {"question": f"Is it true that {snippet}?", "answer": "True"}
+            return schema(**{name: values.get(name, snippet) for name in schema.__fields__})
+        return RunnableLambda(structured)
@@ -0,0 +1,159 @@
+import os
+import time
+import tempfile
+import itertools
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from tabulate import tabulate
+from src.numpy_store import normalize, top_k
+from src.pipeline import QUERY_BATCH_SIZE, embed_queries
+from src.schemas.test_case import TestCase
+from src.vectorstore import VectorStoreManager
+
+DEFAULT_GRID = {
+    "space": ["cosine", "l2"],
+    "construction_ef": [100, 200],
+    "M": [16, 32],
+    "search_ef": [10, 40, 100],
+}
+BUILD_KEYS = ("space", "construction_ef", "M")
+ADD_BATCH_SIZE = 5000
+
+def exact_scores(vectors: np.ndarray, queries: np.ndarray, space: str) -> np.ndarray:
+    """
+    Exact similarity of every query to every vector in the given HNSW distance space, higher is closer.
+    """
+    if space == "cosine":
+        return normalize(queries) @ normalize(vectors).T
+    if space == "ip":
+        return queries @ vectors.T
+    # l2: ranking by -||q - x||^2 only needs 2 q.x - ||x||^2
+    return 2 * queries @ vectors.T - (vectors ** 2).sum(axis=1)[None, :]
+
+def pareto_frontier(rows: List[Dict]) -> List[Dict]:
+    """
+    The configurations no other configuration beats on both p50 query latency and overlap with exact top-k.
+    """
+    frontier = []
+    for row in sorted(rows, key=lambda row: (row["latency_p50_ms"], -row["overlap"])):
+        if not frontier or row["overlap"] > frontier[-1]["overlap"]:
+            frontier.append(row)
+    return frontier
+
+class HnswSweep:
+    def __init__(self, vector_store_manager: VectorStoreManager, grid: Optional[Dict[str, Sequence]] = None, k: int = 10) -> None:
+        """
+        Rebuilds a model's index with hnswlib, the library behind Chroma's HNSW segment, under every combination of
+        HNSW parameters in grid, from the vectors already stored, and compares each index's top-k with exact search
+        over the same vectors.
+        """
+        self.vector_store_manager = vector_store_manager
+        self.grid = {**DEFAULT_GRID, **(grid or {})}
+        self.k = k
+        self.builds = []
+
+    def load(self, test_cases: List[TestCase]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns the stored ids and vectors, the embedded test questions and the position of each test case's chunk.
+        """
+        ids, vectors = self.vector_store_manager.load_embeddings()
+        position = {doc_id: i for i, doc_id in enumerate(ids)}
+        test_cases = [test_case for test_case in test_cases if test_case.doc_id in position]
+        questions = [test_case.question for test_case in test_cases]
+        queries = []
+        for start in range(0, len(questions), QUERY_BATCH_SIZE):
+            queries += embed_queries(self.vector_store_manager.embedding_function, questions[start:start + QUERY_BATCH_SIZE])
+        # sized from the stored vectors so an empty test set still gives a (0, dim) matrix
+        queries = np.asarray(queries, dtype=np.float32).reshape(len(questions), vectors.shape[1])
+        targets = np.array([position[test_case.doc_id] for test_case in test_cases], dtype=int)
+        return ids, vectors, queries, targets
+
+    def build(self, params: Dict, vectors: np.ndarray):
+        """
+        Builds an index the way Chroma's HNSW segment does, labelled by row position in vectors.
+        """
+        import hnswlib
+        index = hnswlib.Index(space=params["space"], dim=vectors.shape[1])
+        index.init_index(max_elements=max(len(vectors), 1), ef_construction=params["construction_ef"], M=params["M"])
+        for start in range(0, len(vectors), ADD_BATCH_SIZE):
+            batch = vectors[start:start + ADD_BATCH_SIZE]
+            index.add_items(batch, np.arange(start, start + len(batch)))
+        return index
+
+    @staticmethod
+    def index_bytes(index) -> int:
+        """
+        Size of the index as hnswlib saves it, which is the vectors and link lists it holds in memory.
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.bin")
+            index.save_index(path)
+            return os.path.getsize(path)
+
+    def run(self, test_cases: List[TestCase]) -> List[Dict]:
+        """
+        Builds one index per (space, construction_ef, M) and queries it once per search_ef, returning one row of results
+        per grid point. search_ef only applies at query time, so the rows of one build share its build time and index size.
+        """
+        ids, vectors, queries, targets = self.load(test_cases)
+        if not len(queries):
+            print("No test cases to score, generate some QA pairs for this model first")
+            return []
+        k = min(self.k, len(ids))
+        print(f"Sweeping {len(ids)} stored vectors with {len(queries)} test questions")
+
+        exact = {}
+        rows = []
+        self.builds = []
+        for i, values in enumerate(itertools.product(*(self.grid[key] for key in BUILD_KEYS))):
+            build_params = dict(zip(BUILD_KEYS, values))
+            space = build_params["space"]
+            if space not in exact:
+                exact[space] = top_k(exact_scores(vectors, queries, space), k)[0]
+            exact_hits = sum(target in exact_indices for exact_indices, target in zip(exact[space], targets))
+            num_queries = max(len(queries), 1)
+
+            build_start = time.perf_counter()
+            index = self.build(build_params, vectors)
+            self.builds.append({"build_id": i, **build_params, "build_s": time.perf_counter() - build_start, "index_bytes": self.index_bytes(index)})
+
+            for search_ef in self.grid["search_ef"]:
+                # hnswlib searches with max(ef, k), and ef only applies at query time
+                index.set_ef(search_ef)
+                latencies, overlaps, hits = [], [], 0
+                for query, exact_indices, target in zip(queries, exact[space], targets):
+                    query_start = time.perf_counter()
+                    found = index.knn_query(query[None, :], k=k)[0][0]
+                    latencies.append(time.perf_counter() - query_start)
+                    overlaps.append(len(set(exact_indices.tolist()).intersection(found.tolist())) / k)
+                    hits += target in found
+
+                rows.append({
+                    **build_params,
+                    "search_ef": search_ef,
+                    "build_id": i,
+                    "index_bytes": self.builds[-1]["index_bytes"],
+                    "latency_p50_ms": float(np.percentile(latencies, 50) * 1000) if latencies else 0.0,
+                    "latency_p95_ms": float(np.percentile(latencies, 95) * 1000) if latencies else 0.0,
+                    "overlap": float(np.mean(overlaps)) if overlaps else 0.0,
+                    "recall": hits / num_queries,
+                    "exact_recall": exact_hits / num_queries,
+                })
+        return rows
+
+    def report(self, rows: List[Dict]) -> str:
+        frontier = {id(row) for row in pareto_frontier(rows)}
+        headers = ["space", "construction_ef", "M", "search_ef", "Build (s)", "Index (MB)", "p50 (ms)", "p95 (ms)",
+                   f"Overlap@{self.k}", f"Recall@{self.k} (%)", f"Exact Recall@{self.k} (%)", "Pareto"]
+        build_times = {build["build_id"]: build["build_s"] for build in self.builds}
+        table = []
+        for i, row in enumerate(rows):
+            # one build serves every search_ef, so its time is shown on its first row only
+            first_of_build = i == 0 or rows[i - 1]["build_id"] != row["build_id"]
+            table.append([
+                row["space"], row["construction_ef"], row["M"], row["search_ef"],
+                f"{build_times[row['build_id']]:.3f}" if first_of_build else "", f"{row['index_bytes'] / 1e6:.2f}",
+                f"{row['latency_p50_ms']:.3f}", f"{row['latency_p95_ms']:.3f}", f"{row['overlap']:.4f}",
+                f"{row['recall'] * 100:.2f}", f"{row['exact_recall'] * 100:.2f}", "*" if id(row) in frontier else "",
+            ])
+        return tabulate(table, headers=headers, tablefmt="grid")
@@ -0,0 +1,207 @@
+import os
+import math
+import time
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
+from pypdf import PdfReader
+from tabulate import tabulate
+from src.manifest import hash_file
+from src.page_cache import PageTextCache, extract_pages
+
+def split_pages(path: str, page_start: int, texts: List[str], text_splitter: TextSplitter) -> List[Document]:
+    """
+    Splits page texts into chunks the way PyPDFLoader.load_and_split followed by the text splitter does, so chunk ids stay the same.
+    """
+    pages = [Document(page_content=text, metadata={"source": path, "page": page_start + i}) for i, text in enumerate(texts)]
+    documents = RecursiveCharacterTextSplitter().split_documents(pages)
+    return text_splitter.split_documents(documents)
+
+def parse_pages(path: str, page_start: int, page_stop: int, text_splitter: TextSplitter, texts: Optional[List[str]] = None):
+    """
+    Parses a range of pages from a PDF and splits them into chunks. Runs inside a worker process.
+    Pages whose text is passed in, from the page cache, are only split.
+    """
+    parse_start = time.time()
+    parsed = texts is None
+    if parsed:
+        texts = extract_pages(path, page_start, page_stop)
+    parse_time = time.time() - parse_start
+
+    split_start = time.time()
+    chunks = split_pages(path, page_start, texts, text_splitter)
+    split_time = time.time() - split_start
+    # freshly parsed text goes back to the parent for the page cache
+    return path, page_start, len(texts), chunks, parse_time, split_time, texts if parsed else None
+
+class IngestionStats:
+    def __init__(self) -> None:
+        self.pages = 0
+        # pages whose text came from the page cache instead of the PDF
+        self.cached_pages = 0
+        self.chunks = 0
+        self.embeddings = 0
+        # stored chunks removed because their file no longer has them
+        self.pruned = 0
+        self.parse_time = 0.0
+        self.split_time = 0.0
+        self.embed_time = 0.0
+        self.wall_time = 0.0
+        # files that could not be fully parsed or stored, so they keep their old chunks and are not recorded as ingested
+        self.failed_paths = set()
+
+    def report(self) -> str:
+        def rate(count, seconds):
+            return f"{count / seconds:.2f}" if seconds else "-"
+
+        table = [
+            ["Parse (pages)", self.pages - self.cached_pages, f"{self.parse_time:.4f}", rate(self.pages - self.cached_pages, self.parse_time), rate(self.pages - self.cached_pages, self.wall_time)],
+            ["Page cache hits (pages)", self.cached_pages, "-", "-", "-"],
+            ["Split (chunks)", self.chunks, f"{self.split_time:.4f}", rate(self.chunks, self.split_time), rate(self.chunks, self.wall_time)],
+            ["Embed + store (embeddings)", self.embeddings, f"{self.embed_time:.4f}", rate(self.embeddings, self.embed_time), rate(self.embeddings, self.wall_time)],
+            ["Prune (stale chunks)", self.pruned, "-", "-", "-"],
+        ]
+        return tabulate(table, headers=["Stage", "Items", "Busy (s)", "Items/s (busy)", "Items/s (wall)"], tablefmt="grid")
+
+class IngestionPipeline:
+    def __init__(self, vector_store_managers: List, max_workers: int = None, batch_size: int = 256, pages_per_task: int = 16, page_cache: Optional[PageTextCache] = None) -> None:
+        """
+        Parses and splits PDFs in a process pool and streams the chunks into each vector store in batches of batch_size.
+        Pages are parsed once however many vector stores need them, and only the embedding step is repeated.
+        At most two tasks per worker are pending at once, so memory stays bounded however large the corpus is.
+        Page text is read from page_cache when the file's bytes have been parsed before, and otherwise cached as soon as the file's last pages are parsed.
+        """
+        self.vector_store_managers = vector_store_managers
+        # all stores share the chunking setup so the same chunk ids mean the same text
+        self.text_splitter = vector_store_managers[0].text_splitter
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.pages_per_task = pages_per_task
+        self.page_cache = page_cache or getattr(vector_store_managers[0], "page_cache", None) or PageTextCache()
+
+    def _tasks(self, paths: List[str], stats: IngestionStats, parsed: Dict) -> Iterator[Tuple[str, int, int, Optional[List[str]]]]:
+        """
+        Yields (path, page_start, page_stop, cached texts) ranges so a single large PDF is spread across workers.
+        Files missing from the page cache get an entry in parsed to collect their page texts until their last range is back.
+        """
+        for path in paths:
+            try:
+                content_hash = hash_file(path)
+                cached = self.page_cache.get(content_hash)
+                if cached is None:
+                    num_pages = len(PdfReader(path).pages)
+                    if num_pages:
+                        parsed[path] = {"content_hash": content_hash, "texts": [None] * num_pages, "ranges": math.ceil(num_pages / self.pages_per_task), "failed": False}
+                    else:
+                        self.page_cache.put(content_hash, [])
+                else:
+                    num_pages = len(cached)
+                    stats.cached_pages += num_pages
+            except Exception as e:
+                print(f"Error in IngestionPipeline._tasks: {e}")
+                stats.failed_paths.add(path)
+                continue
+            for page_start in range(0, num_pages, self.pages_per_task):
+                page_stop = min(page_start + self.pages_per_task, num_pages)
+                yield path, page_start, page_stop, cached[page_start:page_stop] if cached is not None else None
+
+    def _range_done(self, parsed: Dict, path: str, failed: bool = False) -> None:
+        """
+        Counts one finished page range of a file being parsed. Once its last range is back the file's page texts
+        go to the page cache, unless a range failed, and are dropped, so only files still in flight are held in memory.
+        """
+        entry = parsed.get(path)
+        if entry is None:
+            return
+        entry["failed"] = entry["failed"] or failed
+        entry["ranges"] -= 1
+        if entry["ranges"] == 0:
+            del parsed[path]
+            if not entry["failed"]:
+                self.page_cache.put(entry["content_hash"], entry["texts"])
+
+    def _flush(self, vector_store_manager, buffer: List[Document], stats: IngestionStats) -> None:
+        embed_start = time.time()
+        added = vector_store_manager.add_to_chroma(buffer, calculate_ids=False)
+        stats.embed_time += time.time() - embed_start
+        if added is None:
+            # none of the batch reached the store, so pruning its files would lose the chunks it was replacing
+            stats.failed_paths.update(chunk.metadata["source"] for chunk in buffer)
+        else:
+            stats.embeddings += added
+
+    def ingest(self, targets: Dict[str, List]) -> IngestionStats:
+        """
+        Ingests each path in targets into the vector store managers listed for it.
+        Only chunks a store does not already have are embedded, and once everything is in,
+        stored chunks of these files that no longer exist are pruned.
+        """
+        stats = IngestionStats()
+        wall_start = time.time()
+        # content hash, page texts and outstanding ranges of the files still being parsed, for the page cache
+        parsed = {}
+        tasks = self._tasks(list(targets), stats, parsed)
+        buffers = {id(manager): [] for manager in self.vector_store_managers}
+        # chunk id -> content hash of every chunk each file now has, per manager
+        current_ids = {}
+
+        # spawn keeps the workers free of the parent's database clients and threads
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            pending = {}
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < 2 * self.max_workers:
+                    task = next(tasks, None)
+                    if task is None:
+                        exhausted = True
+                        break
+                    path, page_start, page_stop, texts = task
+                    pending[executor.submit(parse_pages, path, page_start, page_stop, self.text_splitter, texts)] = path
+
+                if not pending:
+                    break
+                done, _not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        path, page_start, num_pages, chunks, parse_time, split_time, texts = future.result()
+                    except Exception as e:
+                        print(f"Error in IngestionPipeline.ingest: {e}")
+                        stats.failed_paths.add(path)
+                        self._range_done(parsed, path, failed=True)
+                        continue
+                    stats.pages += num_pages
+                    stats.chunks += len(chunks)
+                    stats.parse_time += parse_time
+                    stats.split_time += split_time
+                    if texts is not None:
+                        parsed[path]["texts"][page_start:page_start + num_pages] = texts
+                    self._range_done(parsed, path)
+                    # Each task covers whole pages, so ids can be assigned before the chunks are batched
+                    for manager in targets[path]:
+                        copies = manager.calculate_chunk_ids([Document(page_content=chunk.page_content, metadata=dict(chunk.metadata)) for chunk in chunks])
+                        current_ids.setdefault((id(manager), path), {}).update((copy.metadata["id"], copy.metadata["content_hash"]) for copy in copies)
+                        buffers[id(manager)].extend(copies)
+
+                # Embedding the full batches here overlaps with the workers parsing the next pages
+                for manager in self.vector_store_managers:
+                    buffer = buffers[id(manager)]
+                    while len(buffer) >= self.batch_size:
+                        self._flush(manager, buffer[:self.batch_size], stats)
+                        buffer = buffer[self.batch_size:]
+                    buffers[id(manager)] = buffer
+
+        for manager in self.vector_store_managers:
+            if buffers[id(manager)]:
+                self._flush(manager, buffers[id(manager)], stats)
+
+        # files that failed part way keep their old chunks until they can be ingested in full
+        for path, managers in targets.items():
+            if path in stats.failed_paths:
+                continue
+            for manager in managers:
+                stats.pruned += manager.prune_source(path, current_ids.get((id(manager), path), {}))
+        stats.wall_time = time.time() - wall_start
+        return stats
@@ -0,0 +1,134 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+from langchain_core.load import dumpd
+
+LLM_CACHE_PATH = "db/llm_cache.db"
+LLM_CACHE_TTL = 30 * 24 * 3600  # seconds a response is reused before the model is asked again
+LOOKUP_BATCH_SIZE = 500  # stay below sqlite's bound parameter limit
+
+class LLMResponseCache:
+    def __init__(self, cache_path: str = LLM_CACHE_PATH, ttl: Optional[float] = LLM_CACHE_TTL, max_entries: int = 100_000, enabled: Optional[bool] = None) -> None:
+        """
+        Disk-backed cache of chat model responses keyed by a hash of (model settings, prompt template, inputs, output schema).
+        Only worth it because the model runs at temperature 0, so the same request gets the same answer.
+        Entries older than ttl seconds are ignored and the least recently used are evicted past max_entries.
+        Setting LLM_CACHE=off in the environment, or enabled=False, bypasses the cache entirely.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = os.getenv("LLM_CACHE", "on").lower() != "off" if enabled is None else enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        try:
+            self.conn = sqlite3.connect(cache_path, check_same_thread=False, timeout=30)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('''CREATE TABLE IF NOT EXISTS responses (
+                                    key TEXT PRIMARY KEY,
+                                    response TEXT NOT NULL,
+                                    created_at REAL NOT NULL,
+                                    last_used REAL NOT NULL
+                                )''')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses (last_used)')
+            self.conn.commit()
+            self.num_entries = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        except Exception as e:
+            print(f"Error in LLMResponseCache.__init__: {e}")
+            self.enabled = False
+
+    @staticmethod
+    def make_key(llm, template, inputs: Dict, schema: Optional[type] = None) -> str:
+        """
+        Hashes everything that decides the response: the model class and its settings (name, temperature, max tokens...),
+        the serialized prompt template, the inputs and the JSON schema of the structured output, if any.
+        """
+        payload = json.dumps([
+            type(llm).__name__,
+            llm._identifying_params,
+            dumpd(template),
+            inputs,
+            schema.schema() if schema is not None else None,
+        ], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get_many(self, keys: List[str]) -> Dict[str, object]:
+        """
+        Returns the cached responses for the given keys that have not expired, counting a hit or miss for each key.
+        """
+        if not self.enabled:
+            # every request goes to the model
+            self.misses += len(keys)
+            return {}
+        found = {}
+        try:
+            with self._lock:
+                now = time.time()
+                unique_keys = list(dict.fromkeys(keys))
+                for start in range(0, len(unique_keys), LOOKUP_BATCH_SIZE):
+                    batch = unique_keys[start:start + LOOKUP_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self.conn.execute(
+                        f'SELECT key, response, created_at FROM responses WHERE key IN ({placeholders})', batch
+                    ).fetchall()
+                    for key, response, created_at in rows:
+                        if self.ttl is None or now - created_at <= self.ttl:
+                            found[key] = json.loads(response)
+                if found:
+                    self.conn.executemany('UPDATE responses SET last_used = ? WHERE key = ?', [(now, key) for key in found])
+                    self.conn.commit()
+        except Exception as e:
+            print(f"Error in LLMResponseCache.get_many: {e}")
+        for key in keys:
+            if key in found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return found
+
+    def get(self, key: str) -> Optional[object]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, responses: Dict[str, object]) -> None:
+        """
+        Stores JSON-serializable responses, dropping expired entries and evicting the least recently used past max_entries.
+        """
+        if not self.enabled or not responses:
+            return
+        try:
+            with self._lock:
+                now = time.time()
+                self.conn.executemany(
+                    'INSERT OR REPLACE INTO responses (key, response, created_at, last_used) VALUES (?, ?, ?, ?)',
+                    [(key, json.dumps(response), now, now) for key, response in responses.items()]
+                )
+                self.num_entries += len(responses)
+
+                if self.num_entries > self.max_entries:
+                    if self.ttl is not None:
+                        self.conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+                    # The running count is an upper bound, so recount before evicting anything
+                    self.num_entries = self.conn.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+                    overflow = self.num_entries - self.max_entries
+                    if overflow > 0:
+                        self.conn.execute(
+                            'DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY last_used ASC LIMIT ?)',
+                            (overflow,)
+                        )
+                        self.num_entries -= overflow
+                self.conn.commit()
+        except Exception as e:
+            print(f"Error in LLMResponseCache.put_many: {e}")
+
+    def put(self, key: str, response: object) -> None:
+        self.put_many({key: response})
@@ -1,28 +1,88 @@
+import os
 import time
+IMPORT_START_TIME = time.time()  # Start timing startup before the heavy imports
 import inquirer
 from src.test_generator import TestQuestionGenerator
-from src.model import Model
-from src.vectorstore import VectorStoreManager, SqlDb
-from src.pipeline import Pipeline
-from src.schemas.question import Question
-from enum import Enum
-from langchain_cohere import CohereEmbeddings
-from langchain_openai import OpenAIEmbeddings
+from src.async_runner import AsyncExperimentRunner
+from src.comparison import EmbeddingComparison
+from src.compression import CompressionStudy
+from src.hnsw_sweep import HnswSweep, pareto_frontier
+from src.chunking_sweep import ChunkingSweep
+from src.registry import Embedding, registry
+from src.results_store import ResultsStore, new_run_id, split_completed
+from src.scheduler import AdaptiveScheduler, UsageMeter
+from src.metrics import RESULTS_DIR, RetrievalMetrics, parse_ks, save_results, write_json
+from src.pipeline import QUERY_BATCH_SIZE
+from src.tracing import tracer
 from tabulate import tabulate
-
-# Define available embeddings using an Enum
-class Embedding(Enum):
-    COHERE = CohereEmbeddings(model="embed-english-v3.0")
-    OPENAI_SMALL = OpenAIEmbeddings(model="text-embedding-3-small")
-    OPENAI_LARGE = OpenAIEmbeddings(model="text-embedding-3-large")
+IMPORT_TIME = time.time() - IMPORT_START_TIME
 
 def main():
     # CLI prompts for selecting embedding and number of experiments
     questions = [
+        inquirer.List(
+            "mode",
+            message="Choose how to run the experiments:",
+            choices=["Sequential", "Batch", "Async", "Compare", "Compression", "HNSW Sweep", "Chunking Sweep"],
+        ),
         inquirer.List(
             "embedding",
             message="Choose the embedding model to use:",
             choices=["COHERE", "OPENAI_SMALL", "OPENAI_LARGE"],
+            ignore=lambda answers: answers["mode"] == "Compare",
+        ),
+        inquirer.Checkbox(
+            "embeddings",
+            message="Choose the embedding models to compare:",
+            choices=["COHERE", "OPENAI_SMALL", "OPENAI_LARGE"],
+            default=["COHERE", "OPENAI_SMALL", "OPENAI_LARGE"],
+            ignore=lambda answers: answers["mode"] != "Compare",
+        ),
+        inquirer.List(
+            "backend",
+            message="Choose the vector store backend:",
+            choices=[("Chroma", "chroma"), ("NumPy exact search", "numpy")],
+        ),
+        inquirer.Text(
+            "concurrency",
+            message="Enter the maximum number of test cases in flight:",
+            default="16",
+            validate=lambda _, x: x.isdigit() and int(x) > 0,
+            ignore=lambda answers: answers["mode"] != "Async",
+        ),
+        inquirer.List(
+            "evaluation",
+            message="Choose what to evaluate:",
+            choices=["Retrieval only", "Full generation"],
+            ignore=lambda answers: answers["mode"] in ("Batch", "Compare", "Compression", "HNSW Sweep", "Chunking Sweep"),
+        ),
+        inquirer.Text(
+            "dims",
+            message="Enter the truncated dimensions to try, comma separated:",
+            default="256,512,1024",
+            validate=lambda _, x: all(d.strip().isdigit() and int(d) > 0 for d in x.split(",")),
+            ignore=lambda answers: answers["mode"] != "Compression",
+        ),
+        inquirer.Checkbox(
+            "splitters",
+            message="Choose the splitters to sweep:",
+            choices=[("Recursive character", "recursive"), ("Character on newlines", "character"), ("Token", "token")],
+            default=["recursive", "character"],
+            ignore=lambda answers: answers["mode"] != "Chunking Sweep",
+        ),
+        inquirer.Text(
+            "chunk_sizes",
+            message="Enter the chunk sizes to try, comma separated:",
+            default="400,800,1200",
+            validate=lambda _, x: all(d.strip().isdigit() and int(d) > 0 for d in x.split(",")),
+            ignore=lambda answers: answers["mode"] != "Chunking Sweep",
+        ),
+        inquirer.Text(
+            "overlaps",
+            message="Enter the chunk overlaps to try, comma separated:",
+            default="0,80",
+            validate=lambda _, x: all(d.strip().isdigit() for d in x.split(",")),
+            ignore=lambda answers: answers["mode"] != "Chunking Sweep",
         ),
         inquirer.Text(
             "experiments",
@@ -30,67 +90,309 @@ def main():
             default="10",
             validate=lambda _, x: x.isdigit() and int(x) > 0
         ),
+        inquirer.Confirm(
+            "adaptive",
+            message="Stop early, in rounds, once recall is settled or a budget is reached (experiments becomes the maximum)?",
+            default=False,
+            ignore=lambda answers: answers["mode"] in ("Compression", "HNSW Sweep", "Chunking Sweep"),
+        ),
+        inquirer.Text(
+            "precision",
+            message="Enter the 95% interval half-width on recall to stop at, e.g. 0.05 for +/- 5 points:",
+            default="0.05",
+            validate=lambda _, x: x.replace(".", "", 1).isdigit() and 0 < float(x) < 1,
+            ignore=lambda answers: not answers.get("adaptive"),
+        ),
+        inquirer.Text(
+            "max_calls",
+            message="Enter a cap on API calls (empty for none):",
+            default="",
+            validate=lambda _, x: x == "" or x.isdigit(),
+            ignore=lambda answers: not answers.get("adaptive"),
+        ),
+        inquirer.Text(
+            "max_dollars",
+            message="Enter a cap on estimated spend in dollars (empty for none):",
+            default="",
+            validate=lambda _, x: x == "" or x.replace(".", "", 1).isdigit(),
+            ignore=lambda answers: not answers.get("adaptive"),
+        ),
+        inquirer.Text(
+            "ks",
+            message="Enter the cutoffs to score, comma separated (one search at the largest):",
+            default="1,3,5,10,20",
+            validate=lambda _, x: all(k.strip().isdigit() and int(k) > 0 for k in x.split(",")),
+        ),
+        inquirer.Confirm(
+            "stratify",
+            message="Spread test documents evenly across source PDFs and pages?",
+            default=True,
+        ),
+        inquirer.Confirm(
+            "trace",
+            message="Record per-stage timings and export a Chrome trace?",
+            default=False,
+        ),
     ]
 
+    # Resuming a run replays the answers it was started with
+    store = ResultsStore()
+    run_id = inquirer.prompt([
+        inquirer.Text("run_id", message="Enter a run id to resume (Sequential, Batch, Async or Compare), or leave empty to start a new run:", default=""),
+    ])["run_id"].strip()
+    run, group = store.resolve(run_id) if run_id else (None, {})
+    if run_id and run is None:
+        print(f"No run found with id {run_id}")
+        return
+
     # Capture answers
-    answers = inquirer.prompt(questions)
+    answers = run["settings"] if run else inquirer.prompt(questions)
 
     # Convert selections to appropriate types
-    selected_embedding = Embedding[answers["embedding"]].value
     num_experiments = int(answers["experiments"])
+    mode = answers["mode"]
+    backend = answers["backend"]
+    stratify = answers["stratify"]
+    ks = parse_ks(answers["ks"])
+    search_k = max(ks)
+    if answers["trace"]:
+        tracer.enable()
+    adaptive = bool(answers.get("adaptive"))
+
+    def scheduler_for(run_round, meter: UsageMeter) -> AdaptiveScheduler:
+        return AdaptiveScheduler(
+            run_round,
+            target_half_width=float(answers["precision"]),
+            max_calls=int(answers["max_calls"]) if answers.get("max_calls") else None,
+            max_dollars=float(answers["max_dollars"]) if answers.get("max_dollars") else None,
+            meter=meter,
+        )
+
+    if mode == "Compare":
+        # Evaluate every chosen model against the same test cases, sharing parsing and chunking
+        comparison = EmbeddingComparison([Embedding[name] for name in answers["embeddings"]], backend=backend)
+        print("\nStartup")
+        print(registry.report(import_time=IMPORT_TIME))
+        comparison.sync()
+
+        # Each model's cases are written to its own run as they finish, and a resumed comparison skips cases every model has done
+        if group:
+            by_doc_id = comparison.test_generator.sql.get_questions_by_doc_ids(run["doc_ids"])
+            test_cases = [by_doc_id[doc_id] for doc_id in run["doc_ids"] if doc_id in by_doc_id]
+            run_ids = {name: group_run["run_id"] for name, group_run in group.items()}
+            group_id = run["settings"]["group"]
+        else:
+            test_cases = comparison.test_generator.build_test_set(num_experiments, stratify=stratify)
+            group_id = new_run_id()
+            run_ids = {name: store.start_run({**answers, "embedding": name, "group": group_id}, test_cases, run_id=f"{group_id}-{name}")
+                       for name in comparison.pipelines}
+        completed = {name: store.completed_results(run_ids[name]) for name in comparison.pipelines}
+        done, pending = split_completed(test_cases, completed)
+        prior = {name: [completed[name][test_case.doc_id] for test_case in done] for name in comparison.pipelines}
+        print(f"{'Resuming' if group else 'Started'} comparison {group_id}: {len(done)} of {len(test_cases)} test cases already done")
+        record = lambda name, result: store.record(run_ids[name], result)
+
+        scheduler = None
+        if adaptive:
+            # Rounds of the same cases for every model, until a paired test separates them or recall is pinned down
+            meter = UsageMeter([pipeline.embedding_function for pipeline in comparison.pipelines.values()], queries_per_request=QUERY_BATCH_SIZE)
+            scheduler = scheduler_for(lambda batch: comparison.run(batch, ks=ks, on_result=record), meter)
+            results = scheduler.run(pending, prior=prior)
+        else:
+            new_results = comparison.run(pending, ks=ks, on_result=record)
+            # earlier sessions' results count towards the comparison, in test set order
+            results = {}
+            for name in comparison.pipelines:
+                by_doc_id = {result.doc_id: result for result in prior[name] + new_results[name]}
+                results[name] = [by_doc_id[test_case.doc_id] for test_case in test_cases if test_case.doc_id in by_doc_id]
+        for name, model_results in results.items():
+            failed_cases = sum(1 for result in model_results if result.error)
+            unfinished = len(model_results) < len(test_cases) and not adaptive
+            store.finish_run(run_ids[name], status="incomplete" if failed_cases or unfinished else "finished")
+
+        print(comparison.report(results))
+        if scheduler:
+            print(scheduler.report())
+        for name, model_results in results.items():
+            run_info = {"mode": mode, "embedding": name, "backend": backend, "ks": ks, "stratify": stratify, "run_id": run_ids[name],
+                        "adaptive": scheduler.to_dict() if scheduler else None}
+            path = save_results(name, model_results, RetrievalMetrics.from_results(model_results, ks), run_info)
+            print(f"Saved {name} results to {path}")
+        report_trace("compare")
+        return
+
+    selected_embedding = Embedding[answers["embedding"]]
+    generate_answer = answers.get("evaluation") == "Full generation"
+    concurrency = int(answers.get("concurrency") or 16)
+
+    # Initialize components, each one is built once on first use and shared
+    RAG_pipeline = registry.pipeline(selected_embedding, backend)
+    x = TestQuestionGenerator(vector_store_manager=RAG_pipeline.vector_store_manager)
+    print("\nStartup")
+    print(registry.report(import_time=IMPORT_TIME))
+
+    # Sync the knowledge base once, queries never touch the data folder
+    RAG_pipeline.process_data()
+
+    if run:
+        # The same test cases in the same order, read back from the QA pairs
+        by_doc_id = x.sql.get_questions_by_doc_ids(run["doc_ids"])
+        test_cases = [by_doc_id[doc_id] for doc_id in run["doc_ids"] if doc_id in by_doc_id]
+    else:
+        # One test case per distinct document
+        test_cases = x.build_test_set(num_experiments, stratify=stratify)
+    num_experiments = len(test_cases)
+
+    if mode == "Compression":
+        # Search truncated and quantized copies of the stored vectors with the same test cases
+        study = CompressionStudy(RAG_pipeline.vector_store_manager, dims=parse_ks(answers["dims"]), ks=ks)
+        rows = study.run(test_cases)
+        print(f"\nCompression Study: {selected_embedding.name}")
+        print(study.report(rows))
+        run_info = {"mode": mode, "embedding": selected_embedding.name, "backend": backend, "ks": ks, "stratify": stratify}
+        print(f"Saved results to {write_json(f'compression-{selected_embedding.name}', {'run': run_info, 'variants': study.to_dict(rows)})}")
+        report_trace(selected_embedding.name)
+        return
+
+    if mode == "HNSW Sweep":
+        # Rebuild the index from the stored vectors under a grid of HNSW settings and compare with exact top-k
+        sweep = HnswSweep(RAG_pipeline.vector_store_manager, k=search_k)
+        rows = sweep.run(test_cases)
+        print(f"\nHNSW Sweep: {selected_embedding.name}")
+        print(sweep.report(rows))
+        run_info = {"mode": mode, "embedding": selected_embedding.name, "backend": backend, "k": search_k, "grid": sweep.grid}
+        path = write_json(f"hnsw-sweep-{selected_embedding.name}", {"run": run_info, "builds": sweep.builds, "configs": rows, "pareto_frontier": pareto_frontier(rows)})
+        print(f"Saved results to {path}")
+        report_trace(selected_embedding.name)
+        return
+
+    if mode == "Chunking Sweep":
+        # Re-split the cached page text under each chunking configuration and score it with the same test cases
+        sweep = ChunkingSweep(RAG_pipeline.vector_store_manager, splitters=answers["splitters"],
+                              chunk_sizes=parse_ks(answers["chunk_sizes"]), overlaps=sorted({int(x) for x in answers["overlaps"].split(",")}), ks=ks)
+        rows = sweep.run(test_cases)
+        print(f"\nChunking Sweep: {selected_embedding.name}")
+        print(sweep.report(rows))
+        run_info = {"mode": mode, "embedding": selected_embedding.name, "backend": backend, "ks": ks, "stratify": stratify}
+        print(f"Saved results to {write_json(f'chunking-sweep-{selected_embedding.name}', {'run': run_info, 'configs': sweep.to_dict(rows)})}")
+        report_trace(selected_embedding.name)
+        return
+
+    # Every finished case is written to the results store, and cases a resumed run already finished are skipped
+    if run:
+        completed = store.completed_results(run_id)
+        print(f"Resuming run {run_id}: {len(completed)} of {num_experiments} test cases already done")
+    else:
+        run_id = store.start_run(answers, test_cases)
+        completed = {}
+        print(f"Started run {run_id}")
+    _done, pending = split_completed(test_cases, {run_id: completed})
+    record = lambda result: store.record(run_id, result)
 
-    # Initialize components
-    llm = Model()
-    RAG_pipeline = Pipeline(
-        model=llm, 
-        embedding_function=selected_embedding, 
-        vector_store_manager=VectorStoreManager()
-    )
-    x = TestQuestionGenerator()
-    v = VectorStoreManager()
-    sql = SqlDb()
-    a = x.pick_random_document()
-    qa = x.generate_test_case(a)
-    
     # Run the experiments
-    results = []
     total_start_time = time.time()  # Start timing the total test
-    success_count = 0
-    total_iteration_time = 0
-
-    for i in range(num_experiments):
-        iteration_start_time = time.time()  # Start timing this iteration
-        result = x.run_test_case(pipeline_to_test=RAG_pipeline, test_case=qa)
-        results.append(result)
-
-        if result:
-            success_count += 1
-        
-        iteration_end_time = time.time()  # End timing this iteration
-        iteration_duration = iteration_end_time - iteration_start_time
-        total_iteration_time += iteration_duration
-        print(f"Iteration {i+1} took {iteration_duration:.4f} seconds")
+    iteration_times = []
+    runner = AsyncExperimentRunner(pipeline=RAG_pipeline, concurrency=concurrency, generate_answer=generate_answer, search_k=search_k, on_result=record) if mode == "Async" else None
+
+    def run_cases(batch):
+        if mode == "Batch":
+            # Embed every question in chunked requests and score top-k for the whole set at once
+            return x.run_test_cases_batch(pipeline_to_test=RAG_pipeline, test_cases=batch, search_k=search_k, on_result=record)
+        if mode == "Async":
+            # Keep many test cases in flight, rate limited per provider
+            return runner.run_sync(batch)
+        batch_results = []
+        for test_case in batch:
+            iteration_start_time = time.time()  # Start timing this iteration
+            result = x.run_test_case(pipeline_to_test=RAG_pipeline, test_case=test_case, generate_answer=generate_answer, search_k=search_k)
+            record(result)
+            batch_results.append(result)
+
+            iteration_end_time = time.time()  # End timing this iteration
+            iteration_times.append(iteration_end_time - iteration_start_time)
+            print(f"Iteration {len(iteration_times)} took {iteration_times[-1]:.4f} seconds")
+        return batch_results
+
+    scheduler = None
+    if adaptive:
+        # Rounds of cases until recall is pinned down or the budget runs out, counting cases a resumed run already did
+        meter = UsageMeter([RAG_pipeline.embedding_function], RAG_pipeline.model if generate_answer else None,
+                           queries_per_request=QUERY_BATCH_SIZE if mode == "Batch" else 1)
+        scheduler = scheduler_for(lambda batch: {selected_embedding.name: run_cases(batch)}, meter)
+        results = scheduler.run(pending, prior={selected_embedding.name: list(completed.values())})[selected_embedding.name][len(completed):]
+    else:
+        results = run_cases(pending)
 
     total_end_time = time.time()  # End timing the total test
     total_duration = total_end_time - total_start_time
+    failed_cases = sum(1 for result in results if result.error)
+    # stopping early on purpose still finishes a run
+    unfinished = len(results) < len(pending) and not adaptive
+    store.finish_run(run_id, status="incomplete" if failed_cases or unfinished else "finished")
+
+    # Earlier sessions' results count towards the run, in test set order
+    by_doc_id = {**completed, **{result.doc_id: result for result in results}}
+    results = [by_doc_id[test_case.doc_id] for test_case in test_cases if test_case.doc_id in by_doc_id]
+    success_count = sum(1 for result in results if result.hit)
+    if mode == "Sequential":
+        total_iteration_time = sum(iteration_times) + sum(result.duration for result in completed.values())
+    else:
+        total_iteration_time = sum(result.duration for result in results)
+    if adaptive:
+        # only the cases the scheduler needed count
+        num_experiments = len(results)
 
     # Calculate metrics
-    success_rate = success_count / num_experiments * 100
-    average_iteration_time = total_iteration_time / num_experiments
+    success_rate = success_count / num_experiments * 100 if num_experiments else 0
+    average_iteration_time = total_iteration_time / num_experiments if num_experiments else 0
+    # Every cutoff is scored from the ranks recorded by the single search at search_k
+    metrics = RetrievalMetrics.from_results(results, ks)
 
     # Prepare data for tabulation
     table = [
+        ["Run ID", run_id],
         ["Total Experiments", num_experiments],
         ["Successes", success_count],
         ["Failures", num_experiments - success_count],
         ["Success Rate (%)", f"{success_rate:.2f}"],
         ["Total Duration (s)", f"{total_duration:.4f}"],
-        ["Average Iteration Time (s)", f"{average_iteration_time:.4f}"]
+        ["Average Iteration Time (s)", f"{average_iteration_time:.4f}"],
+        ["Embedding Cache Hits", RAG_pipeline.embedding_function.hits],
+        ["Embedding Cache Misses", RAG_pipeline.embedding_function.misses],
     ]
+    if generate_answer:
+        llm_cache = RAG_pipeline.model.cache
+        table += [
+            ["LLM Cache Hits", llm_cache.hits],
+            ["LLM Cache Misses", llm_cache.misses],
+            ["LLM Cache Hit Rate (%)", f"{llm_cache.hit_rate * 100:.2f}" if llm_cache.enabled else "bypassed"],
+        ]
+    table += metrics.summary_rows()
 
     # Print the results in a tabulated format
     print("\nTest Results Summary")
     print(tabulate(table, headers=["Metric", "Value"], tablefmt="grid"))
+    if scheduler:
+        print(scheduler.report())
+
+    if failed_cases:
+        print(f"{failed_cases} test cases failed, resume run {run_id} to retry them")
+
+    run_info = {"run_id": run_id, "mode": mode, "embedding": selected_embedding.name, "backend": backend, "ks": ks, "stratify": stratify, "generate_answer": generate_answer,
+                "adaptive": scheduler.to_dict() if scheduler else None}
+    print(f"Saved results to {save_results(selected_embedding.name, results, metrics, run_info)}")
+    report_trace(selected_embedding.name)
+
+def report_trace(name: str) -> None:
+    """
+    Prints the per-stage latency table and writes the Chrome trace, when tracing was turned on.
+    """
+    if not tracer.enabled:
+        return
+    print("\nStage Timings")
+    print(tracer.report())
+    path = tracer.export_chrome_trace(os.path.join(RESULTS_DIR, f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{name}.json"))
+    print(f"Saved Chrome trace to {path}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
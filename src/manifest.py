@@ -0,0 +1,79 @@
+import os
+import hashlib
+from typing import Dict, List, Tuple
+
+DATA_DIR = "data/"
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ManifestDiff:
+    def __init__(self) -> None:
+        self.added: List[str] = []
+        self.modified: List[str] = []
+        self.deleted: List[str] = []
+        # files whose mtime changed but whose content did not
+        self.touched: List[str] = []
+        # (size, mtime, content hash) taken before ingestion for every added, modified or touched file
+        self.entries: Dict[str, Tuple[int, float, str]] = {}
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.modified or self.deleted)
+
+    def __str__(self) -> str:
+        return f"{len(self.added)} added, {len(self.modified)} modified, {len(self.deleted)} deleted"
+
+class CorpusManifest:
+    def __init__(self, sql, namespace: str, data_dir: str = DATA_DIR) -> None:
+        """
+        Records the path, size, mtime and content hash of every ingested file for one vector store namespace.
+        Files are only re-hashed when their size or mtime changes, so an unchanged corpus costs one stat per file.
+        """
+        self.sql = sql
+        self.namespace = namespace
+        self.data_dir = data_dir
+
+    def list_files(self) -> List[str]:
+        return sorted(
+            os.path.join(self.data_dir, name)
+            for name in os.listdir(self.data_dir)
+            if name.lower().endswith(".pdf")
+        )
+
+    def diff(self) -> ManifestDiff:
+        """
+        Compares the files on disk against the manifest and returns what was added, modified or deleted.
+        """
+        diff = ManifestDiff()
+        recorded = self.sql.get_manifest(self.namespace)
+
+        for path in self.list_files():
+            stat = os.stat(path)
+            entry = recorded.pop(path, None)
+            if entry is not None and stat.st_size == entry[0] and stat.st_mtime == entry[1]:
+                continue
+
+            new_hash = hash_file(path)
+            diff.entries[path] = (stat.st_size, stat.st_mtime, new_hash)
+            if entry is None:
+                diff.added.append(path)
+            elif new_hash == entry[2]:
+                diff.touched.append(path)
+            else:
+                diff.modified.append(path)
+
+        # whatever is left in the manifest is no longer on disk
+        diff.deleted = sorted(recorded)
+        return diff
+
+    def record(self, path: str, entry: Tuple[int, float, str]) -> None:
+        size, mtime, content_hash = entry
+        self.sql.upsert_manifest_entry(path, self.namespace, size, mtime, content_hash)
+
+    def forget(self, path: str) -> None:
+        self.sql.delete_manifest_entry(path, self.namespace)
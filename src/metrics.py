@@ -0,0 +1,124 @@
+import os
+import json
+import math
+import time
+import numpy as np
+from typing import Dict, List, Sequence, Tuple
+from src.schemas.test_result import TestResult
+
+DEFAULT_KS = (1, 3, 5, 10, 20)
+RESULTS_DIR = "results"
+Z_95 = 1.959963984540054
+
+def wilson_interval(successes: np.ndarray, n: int, z: float = Z_95) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Wilson score interval for binomial proportions, vectorized over successes.
+    """
+    if n == 0:
+        return np.zeros_like(successes, dtype=float), np.zeros_like(successes, dtype=float)
+    p = successes / n
+    denominator = 1 + z ** 2 / n
+    centre = (p + z ** 2 / (2 * n)) / denominator
+    half_width = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return centre - half_width, centre + half_width
+
+def mean_interval(values: np.ndarray, z: float = Z_95) -> Tuple[float, float, float]:
+    """
+    Mean with a normal-approximation confidence interval.
+    """
+    if len(values) == 0:
+        return 0.0, 0.0, 0.0
+    mean = float(values.mean())
+    if len(values) == 1:
+        return mean, mean, mean
+    half_width = z * float(values.std(ddof=1)) / np.sqrt(len(values))
+    return mean, max(0.0, mean - half_width), min(1.0, mean + half_width)
+
+def mcnemar_p_value(only_a: int, only_b: int) -> float:
+    """
+    Exact two-sided McNemar test for two models run on the same cases, where only_a cases were hit by the first model alone
+    and only_b by the second alone. Under the null each of those discordant cases is a fair coin flip.
+    """
+    n = only_a + only_b
+    if n == 0:
+        return 1.0
+    tail = sum(math.comb(n, i) for i in range(min(only_a, only_b) + 1)) / 2 ** n
+    return min(1.0, 2 * tail)
+
+class RetrievalMetrics:
+    def __init__(self, ranks: Sequence[int], ks: Sequence[int] = DEFAULT_KS) -> None:
+        """
+        Rank-aware retrieval metrics for one relevant document per test case, computed from a single search at max(ks).
+        ranks holds the 1-based rank of each test case's target document, or 0 when it was not retrieved.
+        """
+        self.ks = sorted(set(ks))
+        self.ranks = np.asarray(ranks, dtype=int)
+        self.n = len(self.ranks)
+        found = self.ranks > 0
+
+        # (num_ks x num_cases) matrix of hits, one row per cutoff
+        hits = found[None, :] & (self.ranks[None, :] <= np.asarray(self.ks)[:, None])
+        successes = hits.sum(axis=1)
+        self.recall = successes / self.n if self.n else np.zeros(len(self.ks))
+        self.recall_low, self.recall_high = wilson_interval(successes, self.n)
+
+        safe_ranks = np.where(found, self.ranks, 1)
+        # the deepest cutoff bounds MRR too, in case the search went deeper than the cutoffs asked for
+        reciprocal_ranks = np.where(hits[-1], 1.0 / safe_ranks, 0.0) if len(self.ks) else np.zeros(self.n)
+        self.mrr, self.mrr_low, self.mrr_high = mean_interval(reciprocal_ranks)
+
+        # a single relevant document makes the ideal DCG 1, so nDCG@k is just its discounted gain
+        gains = np.where(found, 1.0 / np.log2(safe_ranks + 1), 0.0)
+        self.ndcg = {}
+        for k, hit_row in zip(self.ks, hits):
+            self.ndcg[k] = mean_interval(np.where(hit_row, gains, 0.0))
+
+    @classmethod
+    def from_results(cls, results: List[TestResult], ks: Sequence[int] = DEFAULT_KS) -> "RetrievalMetrics":
+        return cls([result.rank or 0 for result in results], ks)
+
+    def summary_rows(self) -> List[List[str]]:
+        """
+        Rows for the results summary table, each value with its 95% confidence interval.
+        """
+        rows = []
+        for k, recall, low, high in zip(self.ks, self.recall, self.recall_low, self.recall_high):
+            rows.append([f"Recall@{k} (%)", f"{recall * 100:.2f} [{low * 100:.2f}, {high * 100:.2f}]"])
+        rows.append([f"MRR@{self.ks[-1]}", f"{self.mrr:.4f} [{self.mrr_low:.4f}, {self.mrr_high:.4f}]"])
+        for k, (ndcg, low, high) in self.ndcg.items():
+            rows.append([f"nDCG@{k}", f"{ndcg:.4f} [{low:.4f}, {high:.4f}]"])
+        return rows
+
+    def to_dict(self) -> Dict:
+        return {
+            "num_cases": self.n,
+            "recall": {str(k): {"value": float(r), "ci95": [float(l), float(h)]} for k, r, l, h in zip(self.ks, self.recall, self.recall_low, self.recall_high)},
+            "mrr": {"value": self.mrr, "ci95": [self.mrr_low, self.mrr_high]},
+            "ndcg": {str(k): {"value": v, "ci95": [l, h]} for k, (v, l, h) in self.ndcg.items()},
+        }
+
+def parse_ks(text: str) -> List[int]:
+    """
+    Parses a comma separated list of cutoffs such as "1,3,5,10,20".
+    """
+    return sorted({int(k) for k in text.split(",") if k.strip()})
+
+def write_json(name: str, payload: Dict, results_dir: str = RESULTS_DIR) -> str:
+    """
+    Writes payload to a timestamped JSON file in results_dir, returning its path.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    path = os.path.join(results_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}.json")
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+def save_results(name: str, results: List[TestResult], metrics: RetrievalMetrics, run_info: Dict, results_dir: str = RESULTS_DIR) -> str:
+    """
+    Writes the run settings, metrics and per case ranks and scores as JSON, returning the file path.
+    """
+    return write_json(name, {
+        "run": run_info,
+        "metrics": metrics.to_dict(),
+        "cases": [result.to_dict() for result in results],
+    }, results_dir)
@@ -4,14 +4,25 @@ import os
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
-from typing import Dict, List
+from typing import Dict, List, Optional
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import message_to_dict, messages_from_dict
 from src.schemas.question import Question
 from langchain_core.pydantic_v1 import BaseModel, Field
 from src.schemas.test_case import TestCase
+from src.rate_limit import rate_limit_errors
+from src.llm_cache import LLMResponseCache
+from src.tracing import traced
 
 
 class Model():
-    def __init__(self,)->None:
+    def __init__(self, llm: Optional[BaseChatModel] = None, cache: Optional[LLMResponseCache] = None)->None:
+        """
+        Wraps the chat model used for answers and QA pair generation, GPT-4o unless another llm is passed in.
+        Responses are looked up in cache first, the on-disk LLM response cache unless another one is passed in.
+        requests counts the calls that reach the model, one per prompt, retries by the caller included.
+        """
+        self.requests = 0
         self.RAG_PROMPT_TEMPLATE = ChatPromptTemplate.from_messages(
             [
                 (
@@ -38,7 +49,7 @@ class Model():
             OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
             COHERE_API_KEY = os.getenv('COHERE_API_KEY')
 
-            self.llm = ChatOpenAI(
+            self.llm = llm or ChatOpenAI(
                 model="gpt-4o",
                 temperature=0,
                 max_tokens=500,
@@ -47,42 +58,106 @@ class Model():
             )
 
             self.chain = self.RAG_PROMPT_TEMPLATE | self.llm
+            # built once, with_structured_output is not free and the chain never changes
+            self.test_case_chain = self.TEST_CASE_TEMPLATE | self.llm.with_structured_output(Question)
+            self.cache = cache or LLMResponseCache()
             print("succsefully initilsied the model")
         except Exception as e:
             print(f"error loading Model {e}")
         
+    @traced("model.query")
     def query(self, query:str, context_txt:str) -> str:
         try:
+            inputs = {"context": context_txt, "query": query}
+            key = self.cache.make_key(self.llm, self.RAG_PROMPT_TEMPLATE, inputs)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return messages_from_dict([cached])[0]
+
             print("invoking the model")
-            
-            return self.chain.invoke(
-                {
-                    "context": context_txt, 
-                    "query": query,
-                }
-            )
+            self.requests += 1
+            response = self.chain.invoke(inputs)
+            self.cache.put(key, message_to_dict(response))
+            return response
+        except Exception as e:
+            print(f"An error occurred when invoking the model {e}")
+        
+    @traced("model.aquery")
+    async def aquery(self, query:str, context_txt:str) -> str:
+        """
+        Async counterpart of query. Rate limit errors are raised so the caller can back off and retry.
+        """
+        try:
+            inputs = {"context": context_txt, "query": query}
+            key = self.cache.make_key(self.llm, self.RAG_PROMPT_TEMPLATE, inputs)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return messages_from_dict([cached])[0]
+
+            self.requests += 1
+            response = await self.chain.ainvoke(inputs)
+            self.cache.put(key, message_to_dict(response))
+            return response
+        except rate_limit_errors():
+            raise
         except Exception as e:
             print(f"An error occurred when invoking the model {e}")
         
-    def generate_qa_pair(self, document_content:str, doc_id:str)->TestCase:
+    @traced("model.generate_qa_pair")
+    def generate_qa_pair(self, document_content:str, doc_id:str, source:str=None)->TestCase:
         """
         generates a dictionary which creates question and answers based on documents in the knowledge base
         """
         ret = {}
-        test_case_chain = self.TEST_CASE_TEMPLATE | self.llm.with_structured_output(Question)
         try: 
-
-            ret["QA"] = test_case_chain.invoke(
-                {
-                    "context": document_content
-                }
-            )
+            inputs = {"context": document_content}
+            key = self.cache.make_key(self.llm, self.TEST_CASE_TEMPLATE, inputs, schema=Question)
+            cached = self.cache.get(key)
+            if cached is not None:
+                ret["QA"] = Question(**cached)
+            else:
+                self.requests += 1
+                ret["QA"] = self.test_case_chain.invoke(inputs)
+                self.cache.put(key, ret["QA"].dict())
             ret["doc_id"] = doc_id
+            ret["source"] = source
             
             print('succesfully generated QA pair, ')
             return TestCase(ret)
         except Exception as e:
-            print("exception occured: {e}")
+            print(f"exception occured: {e}")
         
 
+    @traced("model.generate_qa_pairs")
+    def generate_qa_pairs(self, documents: List[Dict[str, str]], max_concurrency: int = 8) -> List[TestCase]:
+        """
+        generates QA pairs for many documents (dicts with doc_id, document and source) with up to max_concurrency requests in flight.
+        Documents whose generation fails are left out of the result. Only documents without a cached QA pair are sent to the model.
+        """
+        inputs = [{"context": document["document"]} for document in documents]
+        keys = [self.cache.make_key(self.llm, self.TEST_CASE_TEMPLATE, document_inputs, schema=Question) for document_inputs in inputs]
+        cached = self.cache.get_many(keys)
+        questions = [Question(**cached[key]) if key in cached else None for key in keys]
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        self.requests += len(missing)
+        try:
+            generated = self.test_case_chain.batch(
+                [inputs[i] for i in missing],
+                config={"max_concurrency": max_concurrency},
+                return_exceptions=True,
+            ) if missing else []
+        except Exception as e:
+            print(f"Error in Model.generate_qa_pairs: {e}")
+            return []
+        for i, question in zip(missing, generated):
+            questions[i] = question
+        self.cache.put_many({keys[i]: question.dict() for i, question in zip(missing, generated) if isinstance(question, Question)})
 
+        test_cases = []
+        for document, question in zip(documents, questions):
+            if isinstance(question, Exception) or question is None:
+                print(f"Error generating QA pair for {document['doc_id']}: {question}")
+                continue
+            test_cases.append(TestCase({"QA": question, "doc_id": document["doc_id"], "source": document.get("source")}))
+        print(f"succesfully generated {len(test_cases)} of {len(documents)} QA pairs")
+        return test_cases
@@ -0,0 +1,206 @@
+import os
+import json
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+NUMPY_STORE_DIR = "db/numpy_store"
+SEARCH_BLOCK_SIZE = 256  # queries scored per matrix multiply, bounds the (queries x corpus) score matrix
+COPY_BLOCK_SIZE = 4096  # rows copied at a time when compacting
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the indices and scores of the k highest scores in each row, best first.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(int), empty
+    if k < scores.shape[1]:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-candidate_scores, axis=1)
+    return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_scores, order, axis=1)
+
+class NumpyVectorStore:
+    def __init__(self, namespace: str, embedding_function: Embeddings, store_dir: str = NUMPY_STORE_DIR) -> None:
+        """
+        Exact cosine search over a float32 matrix kept in a memory-mapped file, one directory per namespace.
+        Ids, documents and metadata live next to it in a JSON lines file.
+        Scores are cosine distances (1 - cosine similarity) so that lower is better, as with Chroma.
+        """
+        self.embedding_function = embedding_function
+        self.path = os.path.join(store_dir, namespace)
+        self.vectors_path = os.path.join(self.path, "vectors.f32")
+        self.records_path = os.path.join(self.path, "records.jsonl")
+        self.meta_path = os.path.join(self.path, "meta.json")
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        meta = {"dim": 0, "count": 0}
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        self.dim, count = meta["dim"], meta["count"]
+
+        self.ids, self.documents, self.metadatas = [], [], []
+        if os.path.exists(self.records_path):
+            with open(self.records_path) as f:
+                for line in f:
+                    if len(self.ids) == count:
+                        break
+                    record = json.loads(line)
+                    self.ids.append(record["id"])
+                    self.documents.append(record["document"])
+                    self.metadatas.append(record["metadata"])
+        count = len(self.ids)
+
+        # anything written past the recorded count belongs to an interrupted write
+        if os.path.exists(self.vectors_path) and os.path.getsize(self.vectors_path) > count * self.dim * 4:
+            os.truncate(self.vectors_path, count * self.dim * 4)
+        self._rewrite_records_if_needed(count)
+
+        self._open_vectors()
+        self.index_by_id = {doc_id: i for i, doc_id in enumerate(self.ids)}
+
+    def _open_vectors(self) -> None:
+        count = len(self.ids)
+        if count:
+            self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dim))
+        else:
+            self.vectors = np.empty((0, self.dim), dtype=np.float32)
+
+    def _rewrite_records_if_needed(self, count: int) -> None:
+        if not os.path.exists(self.records_path):
+            return
+        with open(self.records_path) as f:
+            num_lines = sum(1 for _ in f)
+        if num_lines != count:
+            self._write_records(self.records_path, range(count))
+
+    def _write_records(self, path: str, indices: Iterable[int]) -> None:
+        with open(path, "w") as f:
+            for i in indices:
+                f.write(json.dumps({"id": self.ids[i], "document": self.documents[i], "metadata": self.metadatas[i]}) + "\n")
+
+    def _write_meta(self, count: int) -> None:
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": self.dim, "count": count}, f)
+        os.replace(tmp_path, self.meta_path)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def add_embeddings(self, ids: List[str], documents: List[str], metadatas: List[Dict], embeddings: List[List[float]]) -> None:
+        """
+        Appends already computed embeddings. The metadata count is written last so a crash never exposes partial rows.
+        """
+        if not ids:
+            return
+        matrix = normalize(np.asarray(embeddings, dtype=np.float32))
+        if not self.dim:
+            self.dim = matrix.shape[1]
+
+        with open(self.vectors_path, "ab") as f:
+            f.write(matrix.astype(np.float32).tobytes())
+        with open(self.records_path, "a") as f:
+            for doc_id, document, metadata in zip(ids, documents, metadatas):
+                f.write(json.dumps({"id": doc_id, "document": document, "metadata": metadata}) + "\n")
+        self._write_meta(len(self.ids) + len(ids))
+
+        for doc_id, document, metadata in zip(ids, documents, metadatas):
+            self.index_by_id[doc_id] = len(self.ids)
+            self.ids.append(doc_id)
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+        self._open_vectors()
+
+    def add_documents(self, documents: List[Document], ids: List[str]) -> List[str]:
+        texts = [document.page_content for document in documents]
+        embeddings = self.embedding_function.embed_documents(texts)
+        self.add_embeddings(ids, texts, [document.metadata for document in documents], embeddings)
+        return ids
+
+    def _matches(self, metadata: Dict, where: Optional[Dict]) -> bool:
+        return not where or all(metadata.get(key) == value for key, value in where.items())
+
+    def get(self, ids: Optional[Union[str, List[str]]] = None, where: Optional[Dict] = None, limit: Optional[int] = None, offset: int = 0, include: Optional[List[str]] = None) -> Dict:
+        """
+        Mirrors Chroma's get: filters by ids and equality on metadata, returning the requested fields.
+        """
+        include = ["documents", "metadatas"] if include is None else include
+        if ids is None:
+            indices = range(len(self.ids))
+        else:
+            ids = [ids] if isinstance(ids, str) else ids
+            indices = [self.index_by_id[doc_id] for doc_id in ids if doc_id in self.index_by_id]
+        indices = [i for i in indices if self._matches(self.metadatas[i], where)]
+        indices = indices[offset:offset + limit if limit is not None else None]
+
+        ret = {"ids": [self.ids[i] for i in indices]}
+        if "documents" in include:
+            ret["documents"] = [self.documents[i] for i in indices]
+        if "metadatas" in include:
+            ret["metadatas"] = [self.metadatas[i] for i in indices]
+        if "embeddings" in include:
+            ret["embeddings"] = np.asarray(self.vectors[indices]) if indices else np.empty((0, self.dim), dtype=np.float32)
+        return ret
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        """
+        Removes rows by id or metadata filter, compacting the matrix and records files.
+        """
+        drop = set(ids or [])
+        if where:
+            drop.update(doc_id for doc_id, metadata in zip(self.ids, self.metadatas) if self._matches(metadata, where))
+        keep = [i for i, doc_id in enumerate(self.ids) if doc_id not in drop]
+        if len(keep) == len(self.ids):
+            return
+
+        tmp_vectors_path = self.vectors_path + ".tmp"
+        with open(tmp_vectors_path, "wb") as f:
+            for start in range(0, len(keep), COPY_BLOCK_SIZE):
+                f.write(np.asarray(self.vectors[keep[start:start + COPY_BLOCK_SIZE]], dtype=np.float32).tobytes())
+        tmp_records_path = self.records_path + ".tmp"
+        self._write_records(tmp_records_path, keep)
+
+        # the memmap must be released before the file underneath it is replaced
+        self.vectors = None
+        os.replace(tmp_vectors_path, self.vectors_path)
+        os.replace(tmp_records_path, self.records_path)
+        self._write_meta(len(keep))
+        self._load()
+
+    def search_by_vectors(self, query_embeddings: List[List[float]], k: int = 5) -> List[List[Tuple[Document, float]]]:
+        """
+        Exact top-k for a batch of queries with one normalized matrix multiply per block of queries.
+        """
+        if not len(query_embeddings) or not self.ids:
+            return [[] for _ in query_embeddings]
+        queries = normalize(np.asarray(query_embeddings, dtype=np.float32))
+        batch = []
+        for start in range(0, len(queries), SEARCH_BLOCK_SIZE):
+            scores = queries[start:start + SEARCH_BLOCK_SIZE] @ self.vectors.T
+            indices, similarities = top_k(scores, k)
+            for row_indices, row_similarities in zip(indices, similarities):
+                batch.append([
+                    (Document(page_content=self.documents[i], metadata=self.metadatas[i]), float(1.0 - similarity))
+                    for i, similarity in zip(row_indices, row_similarities)
+                ])
+        return batch
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding: List[float], k: int = 5, **kwargs) -> List[Tuple[Document, float]]:
+        return self.search_by_vectors([embedding], k=k)[0]
+
+    def similarity_search_with_score(self, query: str, k: int = 5, **kwargs) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self.embedding_function.embed_query(query), k=k)
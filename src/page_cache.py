@@ -0,0 +1,57 @@
+import os
+import gzip
+import json
+from typing import List, Optional
+from pypdf import PdfReader
+from src.manifest import hash_file
+
+PAGE_CACHE_DIR = "db/page_cache"
+
+def extract_pages(path: str, page_start: int = 0, page_stop: Optional[int] = None) -> List[str]:
+    reader = PdfReader(path)
+    page_stop = len(reader.pages) if page_stop is None else page_stop
+    return [reader.pages[page].extract_text() for page in range(page_start, page_stop)]
+
+class PageTextCache:
+    def __init__(self, cache_dir: str = PAGE_CACHE_DIR) -> None:
+        """
+        Keeps the extracted text of every page of a PDF as gzipped JSON, keyed by the file's content hash,
+        so a file is only parsed again when its bytes change, whatever chunking is applied afterwards.
+        """
+        self.cache_dir = cache_dir
+
+    def _path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, content_hash[:2], f"{content_hash}.json.gz")
+
+    def get(self, content_hash: str) -> Optional[List[str]]:
+        try:
+            with gzip.open(self._path(content_hash), "rt", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Error in PageTextCache.get: {e}")
+            return None
+
+    def put(self, content_hash: str, pages: List[str]) -> None:
+        path = self._path(content_hash)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # written aside and renamed so a reader never sees half a file
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump(pages, f)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Error in PageTextCache.put: {e}")
+
+    def load_pages(self, path: str, content_hash: Optional[str] = None) -> List[str]:
+        """
+        Returns the text of every page of the PDF at path, parsing and caching it on a miss.
+        """
+        content_hash = content_hash or hash_file(path)
+        pages = self.get(content_hash)
+        if pages is None:
+            pages = extract_pages(path)
+            self.put(content_hash, pages)
+        return pages
@@ -1,61 +1,174 @@
 from pydantic import BaseModel
 from src.model import Model
+from src.embedding_cache import is_cohere
 from src.vectorstore import VectorStoreManager
 from langchain_core.documents import Document
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from langchain_core.embeddings import Embeddings
-from langchain_cohere import CohereEmbeddings
 from src.schemas.question import Question
-from langchain_openai import OpenAIEmbeddings
+from src.tracing import traced, tracer
 import os
+import time
+import asyncio
+
+QUERY_BATCH_SIZE = 96  # Cohere caps a single embed request at 96 texts
+
+def embed_queries(embedding_function: Embeddings, texts: List[str]) -> List[List[float]]:
+    """
+    Embeds a list of questions in a single request.
+    Cohere embeds queries and documents differently, so its query input type is kept.
+    """
+    if hasattr(embedding_function, "embed_queries"):
+        return embedding_function.embed_queries(texts)
+    if is_cohere(embedding_function):
+        return embedding_function.embed(texts, input_type="search_query")
+    return embedding_function.embed_documents(texts)
 
 class Pipeline:
     def __init__(self,  
-                 model: Model, 
+                 model: Optional[Model], 
                  vector_store_manager: VectorStoreManager,
                  input_query: str = None,
-                 embedding_function: Optional[Embeddings] = OpenAIEmbeddings(model="text-embedding-3-large")) -> None:
+                 embedding_function: Optional[Embeddings] = None) -> None:
         """
         Initialize the Pipeline with components for embedding, vector store, and model querying.
+        The embedding function defaults to the vector store's, and without a model the shared one is used on first query.
         """
-        self.embedding_function = embedding_function
-        self.embedding = embedding_function.model
-        self.model = model
+        self.embedding_function = embedding_function or vector_store_manager.embedding_function
+        self.embedding = self.embedding_function.model
+        self._model = model
         self.vector_store_manager = vector_store_manager
         self.vector_store = vector_store_manager.vector_store
         self.input_query = input_query
 
+    @property
+    def model(self) -> Model:
+        if self._model is None:
+            from src.registry import registry
+            self._model = registry.llm()
+        return self._model
+
+    @traced("pipeline.process_data")
     def process_data(self):
         """
-        Ingest new data into the vector store.
+        Sync the vector store with the data folder. Call this explicitly before running queries.
         """
         self.vector_store_manager.ingest_data()
     
-    def retrieve(self, input_query: str = None) -> List[str]:
+    @traced("embedding.embed_query")
+    def embed_query(self, input_query: str) -> List[float]:
+        return self.embedding_function.embed_query(input_query)
+
+    @traced("vectorstore.search")
+    def search(self, query_embedding: List[float], k: int = 5):
         """
-        Retrieve documents and their IDs based on the input query.
+        Search the vector store for an already embedded query, returning the scored documents and their IDs.
+        """
+        results = self.vector_store.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k)
+        # Extract document IDs, or None if ID does not exist
+        sources = [doc.metadata.get("id", None) for doc, _score in results]
+        return results, sources
+
+    @traced("pipeline.retrieve")
+    def retrieve(self, input_query: str = None, k: int = 5) -> List[str]:
+        """
+        Retrieve the top k documents and their IDs based on the input query.
         """
         print(f"retrieving documents with embedding: {self.embedding}")
         
-        # Perform vector similarity search
-        results = self.vector_store.similarity_search_with_score(input_query, 
-                                                                 k=5,
-                                                                 filter={"embedding": self.embedding})
-    
-        # Extract document IDs, or None if ID does not exist
-        sources = [doc.metadata.get("id", None) for doc, _score in results]    
-        return results, sources 
+        # Embed and search as separate steps so each shows up as its own stage when tracing
+        query_embedding = self.embed_query(input_query)
+        return self.search(query_embedding, k=k)
+
+    @traced("pipeline.retrieve_batch")
+    def retrieve_batch(self, input_queries: List[str], k: int = 5, batch_size: int = QUERY_BATCH_SIZE) -> Tuple[List[List[str]], List[List[float]], List[float], List[float]]:
+        """
+        Retrieve document IDs for many queries, embedding and searching them in chunks of batch_size.
+        Returns the ranked sources and scores for each query along with the embedding and search time attributed to it.
+        """
+        # Identical questions only need to be embedded and searched once
+        unique_queries = list(dict.fromkeys(input_queries))
+        print(f"retrieving documents for {len(unique_queries)} unique queries with embedding: {self.embedding}")
+
+        sources_by_query, scores_by_query, embed_time_by_query, search_time_by_query = {}, {}, {}, {}
+        for start in range(0, len(unique_queries), batch_size):
+            batch = unique_queries[start:start + batch_size]
+
+            embed_start = time.time()
+            with tracer.span("embedding.embed_queries"):
+                query_embeddings = embed_queries(self.embedding_function, batch)
+            embed_time = (time.time() - embed_start) / len(batch)
+
+            search_start = time.time()
+            batch_results = self.vector_store_manager.similarity_search_by_vectors(query_embeddings, k=k)
+            search_time = (time.time() - search_start) / len(batch)
+
+            for query, results in zip(batch, batch_results):
+                sources_by_query[query] = [doc.metadata.get("id", None) for doc, _score in results]
+                scores_by_query[query] = [score for _doc, score in results]
+                embed_time_by_query[query] = embed_time
+                search_time_by_query[query] = search_time
+
+        sources = [sources_by_query[query] for query in input_queries]
+        scores = [scores_by_query[query] for query in input_queries]
+        embed_times = [embed_time_by_query[query] for query in input_queries]
+        search_times = [search_time_by_query[query] for query in input_queries]
+        return sources, scores, embed_times, search_times
+
+    @traced("pipeline.aembed_query")
+    async def aembed_query(self, input_query: str) -> List[float]:
+        """
+        Embed a query with the async embedding API.
+        """
+        return await self.embedding_function.aembed_query(input_query)
+
+    @traced("pipeline.asearch")
+    async def asearch(self, query_embedding: List[float], k: int = 5):
+        """
+        Search the vector store for an already embedded query without blocking the event loop.
+        """
+        results = await asyncio.to_thread(
+            self.vector_store.similarity_search_by_vector_with_relevance_scores,
+            query_embedding,
+            k=k
+        )
+        sources = [doc.metadata.get("id", None) for doc, _score in results]
+        return results, sources
+
+    @traced("pipeline.aretrieve")
+    async def aretrieve(self, input_query: str, k: int = 5):
+        """
+        Async counterpart of retrieve.
+        """
+        query_embedding = await self.aembed_query(input_query)
+        return await self.asearch(query_embedding, k=k)
+
+    @traced("pipeline.agenerate")
+    async def agenerate(self, input_query: str, retrieved_documents: Optional[List[Document]] = None):
+        """
+        Async counterpart of generate.
+        """
+        if retrieved_documents is None:
+            retrieved_documents, sources = await self.aretrieve(input_query)
+        else:
+            sources = [doc[0].metadata.get("id", None) for doc in retrieved_documents]
+
+        context_text = "\n\n---\n\n".join([doc[0].page_content for doc in retrieved_documents])
+        response = await self.model.aquery(input_query, context_txt=context_text)
+        return response, sources
 
+    @traced("pipeline.generate")
     def generate(self, input_query: str, retrieved_documents: Optional[List[Document]] = None) -> str:
         """
         Generate a response based on the input query and optionally retrieved documents.
         """
-        self.process_data()  # Update knowledge base
         print(f"input query has type: {type(input_query)}")
 
         # Retrieve documents if not provided
         if retrieved_documents is None:
             retrieved_documents, sources = self.retrieve(input_query)
+        else:
+            sources = [doc[0].metadata.get("id", None) for doc in retrieved_documents]
 
         # Generate response using the model and retrieved context
         print("starting to generate a response")
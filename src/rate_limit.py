@@ -0,0 +1,73 @@
+import sys
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+from langchain_core.embeddings import Embeddings
+from src.embedding_cache import is_cohere
+
+# Requests per second allowed for each provider
+DEFAULT_RATE_LIMITS = {
+    "openai": 50.0,
+    "cohere": 30.0,
+}
+
+T = TypeVar("T")
+
+def rate_limit_errors() -> Tuple[type, ...]:
+    """
+    The errors the providers raise when we exceed their rate limits.
+    Only SDKs that are already imported can have raised one, so nothing is imported here.
+    """
+    errors = []
+    if "openai" in sys.modules:
+        from openai import RateLimitError
+        errors.append(RateLimitError)
+    if "cohere" in sys.modules:
+        from cohere.errors import TooManyRequestsError
+        errors.append(TooManyRequestsError)
+    return tuple(errors)
+
+def provider_for(embedding_function: Embeddings) -> str:
+    """
+    Returns the name of the provider serving an embedding function, looking through CachedEmbeddings.
+    """
+    underlying = getattr(embedding_function, "underlying", embedding_function)
+    return "cohere" if is_cohere(underlying) else "openai"
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        """
+        Allows up to `rate` acquisitions per second, with bursts of up to `capacity`.
+        """
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+async def call_with_retries(call: Callable[[], Awaitable[T]], bucket: TokenBucket, max_retries: int = 5, base_delay: float = 1.0) -> T:
+    """
+    Awaits call() once the bucket allows it, backing off exponentially when the provider reports a rate limit.
+    """
+    for attempt in range(max_retries + 1):
+        await bucket.acquire()
+        try:
+            return await call()
+        except rate_limit_errors() as e:
+            if attempt == max_retries:
+                raise
+            delay = base_delay * 2 ** attempt + random.uniform(0, base_delay)
+            print(f"rate limited ({type(e).__name__}), retrying in {delay:.2f} seconds")
+            await asyncio.sleep(delay)
@@ -0,0 +1,100 @@
+import time
+import threading
+from enum import Enum
+from typing import Callable, Dict, TypeVar
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from tabulate import tabulate
+
+T = TypeVar("T")
+
+# Define available embeddings using an Enum, the clients themselves are only built on first use
+class Embedding(Enum):
+    COHERE = "embed-english-v3.0"
+    OPENAI_SMALL = "text-embedding-3-small"
+    OPENAI_LARGE = "text-embedding-3-large"
+
+    @property
+    def function(self) -> Embeddings:
+        return registry.embedding(self)
+
+class ComponentRegistry:
+    def __init__(self) -> None:
+        """
+        Creates embedding clients, the LLM, vector stores and the tracker db once, on first use, and shares them.
+        Records how long each component took to build so startup cost can be reported.
+        """
+        self._components = {}
+        self._lock = threading.RLock()
+        self.build_times: Dict[str, float] = {}
+        # time spent building nested components, so each one is only charged for its own work
+        self._nested_times = []
+
+    def _get(self, key: str, factory: Callable[[], T]) -> T:
+        with self._lock:
+            if key not in self._components:
+                start = time.time()
+                self._nested_times.append(0.0)
+                try:
+                    self._components[key] = factory()
+                finally:
+                    nested_time = self._nested_times.pop()
+                    elapsed = time.time() - start
+                    self.build_times[key] = elapsed - nested_time
+                    if self._nested_times:
+                        self._nested_times[-1] += elapsed
+            return self._components[key]
+
+    def embedding(self, embedding: Embedding) -> Embeddings:
+        def build():
+            from src.embedding_cache import CachedEmbeddings
+            load_dotenv()
+            if embedding is Embedding.COHERE:
+                from langchain_cohere import CohereEmbeddings
+                return CachedEmbeddings(CohereEmbeddings(model=embedding.value))
+            from langchain_openai import OpenAIEmbeddings
+            return CachedEmbeddings(OpenAIEmbeddings(model=embedding.value))
+        return self._get(f"embedding:{embedding.name}", build)
+
+    def llm(self):
+        from src.model import Model
+        return self._get("llm", Model)
+
+    def sql(self):
+        from src.vectorstore import SqlDb
+        return self._get("sql", SqlDb)
+
+    def chroma_client(self):
+        def build():
+            import chromadb
+            from src.vectorstore import PERSITENT_DIR_PATH
+            return chromadb.PersistentClient(path=PERSITENT_DIR_PATH)
+        return self._get("chroma_client", build)
+
+    def vector_store_manager(self, embedding: Embedding, backend: str = "chroma"):
+        def build():
+            from src.vectorstore import VectorStoreManager
+            return VectorStoreManager(embedding_function=embedding.function, sql_document_tracker=self.sql(), backend=backend)
+        return self._get(f"vector_store:{backend}:{embedding.name}", build)
+
+    def pipeline(self, embedding: Embedding, backend: str = "chroma"):
+        def build():
+            from src.pipeline import Pipeline
+            # the LLM is resolved on first use, retrieval-only runs never build it
+            return Pipeline(
+                model=None,
+                embedding_function=embedding.function,
+                vector_store_manager=self.vector_store_manager(embedding, backend),
+            )
+        return self._get(f"pipeline:{backend}:{embedding.name}", build)
+
+    def report(self, import_time: float = None) -> str:
+        table = []
+        if import_time is not None:
+            table.append(["imports", f"{import_time:.4f}"])
+        table += [[key, f"{seconds:.4f}"] for key, seconds in self.build_times.items()]
+        total = sum(self.build_times.values()) + (import_time or 0.0)
+        table.append(["Total", f"{total:.4f}"])
+        return tabulate(table, headers=["Component", "Build Time (s)"], tablefmt="grid")
+
+registry = ComponentRegistry()
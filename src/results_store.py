@@ -0,0 +1,250 @@
+import json
+import atexit
+import time
+import secrets
+import sqlite3
+import argparse
+import threading
+from typing import Dict, List, Optional, Tuple
+from tabulate import tabulate
+from src.schemas.test_case import TestCase
+from src.schemas.test_result import TestResult
+
+RESULTS_DB_PATH = "db/results.db"
+COMMIT_BATCH_SIZE = 50  # results buffered before a commit, so a crash loses at most this many
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+def split_completed(test_cases: List[TestCase], completed: Dict[str, Dict[str, TestResult]]) -> Tuple[List[TestCase], List[TestCase]]:
+    """
+    Splits test cases, in test set order, into those every run in completed (run -> results keyed by doc_id) has
+    already finished and those still to run.
+    """
+    done, pending = [], []
+    for test_case in test_cases:
+        finished = all(test_case.doc_id in results for results in completed.values())
+        (done if finished else pending).append(test_case)
+    return done, pending
+
+class ResultsStore:
+    def __init__(self, path: str = RESULTS_DB_PATH, commit_batch_size: int = COMMIT_BATCH_SIZE) -> None:
+        """
+        Keeps every experiment run and the outcome of each of its test cases in SQLite as they finish,
+        so an interrupted run can be resumed by id and past runs can be compared without running anything again.
+        """
+        self.commit_batch_size = commit_batch_size
+        self._pending = []
+        self._lock = threading.RLock()
+        # results still buffered when the process dies of an exception or Ctrl-C are written on the way out
+        atexit.register(self.flush)
+        try:
+            self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            with self._lock, self.conn:
+                # One row per run, with the answers it was started with and the test cases it planned, in order
+                self.conn.execute('''CREATE TABLE IF NOT EXISTS runs (
+                                        run_id TEXT PRIMARY KEY,
+                                        started_at REAL NOT NULL,
+                                        finished_at REAL,
+                                        status TEXT NOT NULL,
+                                        mode TEXT,
+                                        embedding TEXT,
+                                        backend TEXT,
+                                        settings TEXT NOT NULL,
+                                        doc_ids TEXT NOT NULL
+                                    )''')
+                # One row per finished test case
+                self.conn.execute('''CREATE TABLE IF NOT EXISTS case_results (
+                                        run_id TEXT NOT NULL,
+                                        doc_id TEXT NOT NULL,
+                                        question TEXT,
+                                        hit INTEGER NOT NULL,
+                                        rank INTEGER,
+                                        score REAL,
+                                        embed_time REAL,
+                                        search_time REAL,
+                                        generate_time REAL,
+                                        finished_at REAL NOT NULL,
+                                        PRIMARY KEY (run_id, doc_id),
+                                        FOREIGN KEY (run_id) REFERENCES runs(run_id)
+                                    )''')
+                self.conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_embedding ON runs (embedding, started_at)')
+        except Exception as e:
+            print(f"Error in ResultsStore.__init__: {e}")
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self.conn.close()
+
+    def start_run(self, settings: Dict, test_cases: List[TestCase], run_id: Optional[str] = None) -> str:
+        """
+        Records a new run with the settings it was started with and the doc_ids of its test cases, returning its id.
+        """
+        run_id = run_id or new_run_id()
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    'INSERT INTO runs (run_id, started_at, status, mode, embedding, backend, settings, doc_ids) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    (run_id, time.time(), "running", settings.get("mode"), settings.get("embedding"), settings.get("backend"),
+                     json.dumps(settings), json.dumps([test_case.doc_id for test_case in test_cases]))
+                )
+        except Exception as e:
+            print(f"Error in ResultsStore.start_run: {e}")
+        return run_id
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        try:
+            with self._lock:
+                row = self.conn.execute('SELECT run_id, started_at, finished_at, status, settings, doc_ids FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+            if row is None:
+                return None
+            return {
+                "run_id": row[0],
+                "started_at": row[1],
+                "finished_at": row[2],
+                "status": row[3],
+                "settings": json.loads(row[4]),
+                "doc_ids": json.loads(row[5]),
+            }
+        except Exception as e:
+            print(f"Error in ResultsStore.get_run: {e}")
+            return None
+
+    def get_group(self, group_id: str) -> Dict[str, Dict]:
+        """
+        The runs started together under group_id, one per embedding model of a Compare run, keyed by embedding.
+        """
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    "SELECT run_id FROM runs WHERE json_extract(settings, '$.group') = ? ORDER BY run_id", (group_id,)
+                ).fetchall()
+            runs = [self.get_run(row[0]) for row in rows]
+            return {run["settings"]["embedding"]: run for run in runs if run}
+        except Exception as e:
+            print(f"Error in ResultsStore.get_group: {e}")
+            return {}
+
+    def resolve(self, run_id: str) -> Tuple[Optional[Dict], Dict[str, Dict]]:
+        """
+        Finds the run to resume and, for a Compare run, its group. A Compare run is one stored run per model,
+        resumed together by their group id or any one of their run ids.
+        """
+        run = self.get_run(run_id)
+        group = self.get_group(run["settings"].get("group") if run else run_id)
+        if group:
+            run = next(iter(group.values()))
+        return run, group
+
+    def completed_results(self, run_id: str) -> Dict[str, TestResult]:
+        """
+        The results already stored for a run, keyed by doc_id.
+        """
+        self.flush()
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    '''SELECT doc_id, question, hit, rank, score, embed_time, search_time, generate_time
+                       FROM case_results WHERE run_id = ?''',
+                    (run_id,)
+                ).fetchall()
+            columns = ["doc_id", "question", "hit", "rank", "score", "embed_time", "search_time", "generate_time"]
+            return {row[0]: TestResult.from_dict(dict(zip(columns, row))) for row in rows}
+        except Exception as e:
+            print(f"Error in ResultsStore.completed_results: {e}")
+            return {}
+
+    def record(self, run_id: str, result: TestResult) -> None:
+        """
+        Buffers a finished test case, committing once commit_batch_size are waiting.
+        Cases that errored are left out so resuming the run tries them again.
+        """
+        if result.error:
+            return
+        with self._lock:
+            self._pending.append((run_id, result.doc_id, result.question, int(result.hit), result.rank, result.score,
+                                  result.embed_time, result.search_time, result.generate_time, time.time()))
+            if len(self._pending) >= self.commit_batch_size:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        '''INSERT OR REPLACE INTO case_results
+                           (run_id, doc_id, question, hit, rank, score, embed_time, search_time, generate_time, finished_at)
+                           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                        self._pending
+                    )
+                self._pending = []
+            except Exception as e:
+                print(f"Error in ResultsStore.flush: {e}")
+
+    def finish_run(self, run_id: str, status: str = "finished") -> None:
+        self.flush()
+        try:
+            with self._lock, self.conn:
+                self.conn.execute('UPDATE runs SET finished_at = ?, status = ? WHERE run_id = ?', (time.time(), status, run_id))
+        except Exception as e:
+            print(f"Error in ResultsStore.finish_run: {e}")
+
+    def list_runs(self, embedding: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """
+        The most recent runs, oldest first, with their metrics computed from the stored cases.
+        """
+        self.flush()
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    '''SELECT r.run_id, r.started_at, r.status, r.mode, r.embedding, r.backend, json_array_length(r.doc_ids),
+                              COUNT(c.doc_id), COALESCE(SUM(c.hit), 0),
+                              AVG(CASE WHEN c.rank IS NOT NULL THEN 1.0 / c.rank ELSE 0 END),
+                              AVG(c.embed_time + c.search_time + c.generate_time)
+                       FROM runs r LEFT JOIN case_results c ON c.run_id = r.run_id
+                       WHERE ? IS NULL OR r.embedding = ?
+                       GROUP BY r.run_id
+                       ORDER BY r.started_at DESC
+                       LIMIT ?''',
+                    (embedding, embedding, limit)
+                ).fetchall()
+            columns = ["run_id", "started_at", "status", "mode", "embedding", "backend", "planned", "completed", "hits", "mrr", "mean_duration"]
+            return [dict(zip(columns, row)) for row in reversed(rows)]
+        except Exception as e:
+            print(f"Error in ResultsStore.list_runs: {e}")
+            return []
+
+    def trend_report(self, embedding: Optional[str] = None, limit: int = 20) -> str:
+        headers = ["Run", "Started", "Status", "Mode", "Embedding", "Backend", "Cases", "Hit Rate (%)", "MRR", "Mean Duration (s)"]
+        table = []
+        for run in self.list_runs(embedding, limit):
+            completed = run["completed"]
+            table.append([
+                run["run_id"],
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(run["started_at"])),
+                run["status"],
+                run["mode"],
+                run["embedding"],
+                run["backend"],
+                f"{completed}/{run['planned']}",
+                f"{run['hits'] / completed * 100:.2f}" if completed else "-",
+                f"{run['mrr']:.4f}" if completed else "-",
+                f"{run['mean_duration']:.4f}" if completed else "-",
+            ])
+        return tabulate(table, headers=headers, tablefmt="grid")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Trend report over the experiment runs kept in the results store.")
+    parser.add_argument("--embedding", choices=["COHERE", "OPENAI_SMALL", "OPENAI_LARGE"], help="only show runs with this embedding")
+    parser.add_argument("--limit", type=int, default=20, help="number of most recent runs to show")
+    parser.add_argument("--db", default=RESULTS_DB_PATH)
+    args = parser.parse_args()
+    print(ResultsStore(args.db).trend_report(args.embedding, args.limit))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import math
+import itertools
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+from tabulate import tabulate
+from src.metrics import mcnemar_p_value, wilson_interval
+from src.schemas.test_case import TestCase
+from src.schemas.test_result import TestResult
+
+DEFAULT_ROUND_SIZE = 50
+DEFAULT_MIN_CASES = 100  # never stop on fewer cases, the intervals are unreliable below this
+DEFAULT_TARGET_HALF_WIDTH = 0.05  # stop once every model's 95% recall interval is within +/- this
+DEFAULT_ALPHA = 0.05
+
+# USD per million tokens, and rough token counts per request, used to estimate what a run has spent
+PRICE_PER_MILLION_TOKENS = {
+    "embed-english-v3.0": 0.10,
+    "text-embedding-3-small": 0.02,
+    "text-embedding-3-large": 0.13,
+    "gpt-4o-input": 2.50,
+    "gpt-4o-output": 10.00,
+}
+QUERY_TOKENS = 25
+ANSWER_INPUT_TOKENS = 1200
+ANSWER_OUTPUT_TOKENS = 300
+
+class UsageMeter:
+    def __init__(self, embedding_functions: List, model=None, queries_per_request: int = 1) -> None:
+        """
+        Counts the requests sent to each provider, as counted by the embedding functions and the model when they issue them,
+        so a batched embed request is one call and a rate-limited retry is another.
+        Cost is estimated per text instead, from the cache misses, since providers bill by token and not by request.
+        queries_per_request is how many questions the run embeds per request, e.g. QUERY_BATCH_SIZE in Batch mode.
+        """
+        self.embedding_functions = embedding_functions
+        self.model = model
+        self.queries_per_request = queries_per_request
+
+    def usage(self) -> Tuple[int, float]:
+        """
+        Returns (API calls, estimated dollars) so far.
+        """
+        calls, dollars = 0, 0.0
+        for embedding_function in self.embedding_functions:
+            calls += getattr(embedding_function, "requests", 0)
+            dollars += getattr(embedding_function, "misses", 0) * self.embedding_price(embedding_function)
+        if self.model is not None:
+            calls += self.model.requests
+            dollars += self.model.cache.misses * self.answer_price()
+        return calls, dollars
+
+    def per_case(self) -> Tuple[float, float]:
+        """
+        Upper bound on (API calls, dollars) for one test case before anything has run:
+        an uncached query embedding per model and one answer, when answers are generated.
+        """
+        calls = len(self.embedding_functions) / self.queries_per_request + (1 if self.model is not None else 0)
+        dollars = sum(self.embedding_price(embedding_function) for embedding_function in self.embedding_functions)
+        if self.model is not None:
+            dollars += self.answer_price()
+        return calls, dollars
+
+    @staticmethod
+    def embedding_price(embedding_function) -> float:
+        return QUERY_TOKENS * PRICE_PER_MILLION_TOKENS.get(getattr(embedding_function, "model", ""), 0.0) / 1e6
+
+    @staticmethod
+    def answer_price() -> float:
+        return (ANSWER_INPUT_TOKENS * PRICE_PER_MILLION_TOKENS["gpt-4o-input"] + ANSWER_OUTPUT_TOKENS * PRICE_PER_MILLION_TOKENS["gpt-4o-output"]) / 1e6
+
+def cases_that_fit(remaining: float, cost_per_case: float) -> int:
+    # rounded first, since e.g. 1 // 0.02 is 49.0 in floating point
+    return math.floor(round(remaining / cost_per_case, 9))
+
+class AdaptiveScheduler:
+    def __init__(self,
+                 run_round: Callable[[List[TestCase]], Dict[str, List[TestResult]]],
+                 round_size: int = DEFAULT_ROUND_SIZE,
+                 min_cases: int = DEFAULT_MIN_CASES,
+                 target_half_width: float = DEFAULT_TARGET_HALF_WIDTH,
+                 alpha: float = DEFAULT_ALPHA,
+                 max_calls: Optional[int] = None,
+                 max_dollars: Optional[float] = None,
+                 meter: Optional[UsageMeter] = None) -> None:
+        """
+        Runs test cases in rounds of round_size through run_round, which returns each model's results for a round,
+        and stops as soon as the numbers are settled rather than after every case:
+        - one model: once the 95% Wilson interval on its hit rate is no wider than +/- target_half_width
+        - several models: once every pair differs significantly on a paired McNemar test over the same cases,
+          or every model's interval is that narrow, so any difference left is too small to matter
+        - any run: when the API calls or estimated dollars counted by meter reach max_calls or max_dollars,
+          trimming the last round to what still fits
+        The significance level is split evenly over every round that could run (Bonferroni), because testing after
+        each round would otherwise find a difference by chance far more often than alpha.
+        """
+        self.run_round = run_round
+        self.round_size = round_size
+        self.min_cases = min_cases
+        self.target_half_width = target_half_width
+        self.alpha = alpha
+        self.max_calls = max_calls
+        self.max_dollars = max_dollars
+        self.meter = meter
+        self.rounds = []
+        self.stop_reason = None
+        self.available = 0
+        self.alpha_per_round = alpha
+        self.spent = (0, 0.0)
+
+    def run(self, test_cases: List[TestCase], prior: Optional[Dict[str, List[TestResult]]] = None) -> Dict[str, List[TestResult]]:
+        """
+        Returns every model's results for the cases that were run, prior results (e.g. from a resumed run) first.
+        """
+        results = {name: list(model_results) for name, model_results in (prior or {}).items()}
+        self.available = len(test_cases) + min((len(model_results) for model_results in results.values()), default=0)
+        self.alpha_per_round = self.alpha / max(1, math.ceil(self.available / self.round_size))
+        start_usage = self.meter.usage() if self.meter else (0, 0.0)
+        self.stop_reason = "ran every test case"
+
+        start = 0
+        while start < len(test_cases):
+            size, budget_reason = self.round_size, None
+            if self.meter:
+                size, budget_reason = self.fit_budget(start_usage, start)
+                if not size:
+                    self.stop_reason = budget_reason
+                    break
+            batch = test_cases[start:start + size]
+            for name, model_results in self.run_round(batch).items():
+                results.setdefault(name, []).extend(model_results)
+            start += len(batch)
+            self.rounds.append(self.summarize(results))
+            reason = self.settled(self.rounds[-1])
+            if reason:
+                self.stop_reason = reason
+                break
+            if budget_reason and start < len(test_cases):
+                # a round trimmed to the budget is the last one
+                self.stop_reason = budget_reason
+                break
+
+        self.spent = tuple(np.subtract(self.meter.usage(), start_usage)) if self.meter else (0, 0.0)
+        return results
+
+    def fit_budget(self, start_usage: Tuple[int, float], cases_run: int) -> Tuple[int, Optional[str]]:
+        """
+        Returns how many cases the next round can run within max_calls and max_dollars, and why it was trimmed, if it was.
+        The cost per case is the average so far, or the meter's upper bound before the first round.
+        """
+        calls, dollars = np.subtract(self.meter.usage(), start_usage)
+        if cases_run:
+            calls_per_case, dollars_per_case = calls / cases_run, dollars / cases_run
+        else:
+            calls_per_case, dollars_per_case = self.meter.per_case()
+        size, reason = self.round_size, None
+        if self.max_calls is not None and calls_per_case > 0:
+            fits = cases_that_fit(self.max_calls - calls, calls_per_case)
+            if fits < size:
+                size, reason = fits, f"the cap of {self.max_calls} API calls was reached"
+        if self.max_dollars is not None and dollars_per_case > 0:
+            fits = cases_that_fit(self.max_dollars - dollars, dollars_per_case)
+            if fits < size:
+                size, reason = fits, f"the ${self.max_dollars:.2f} budget was reached"
+        return max(size, 0), reason
+
+    def summarize(self, results: Dict[str, List[TestResult]]) -> Dict:
+        """
+        Hit rate intervals per model and paired tests per pair of models over the cases all of them have run.
+        """
+        num_cases = min(len(model_results) for model_results in results.values())
+        hits = {name: np.array([result.hit for result in model_results[:num_cases]], dtype=bool) for name, model_results in results.items()}
+        models = {}
+        for name, model_hits in hits.items():
+            successes = int(model_hits.sum())
+            low, high = wilson_interval(np.array([successes]), num_cases)
+            models[name] = {"hits": successes, "recall": successes / num_cases if num_cases else 0.0, "low": float(low[0]), "high": float(high[0])}
+        pairs = []
+        for a, b in itertools.combinations(hits, 2):
+            only_a = int((hits[a] & ~hits[b]).sum())
+            only_b = int((hits[b] & ~hits[a]).sum())
+            pairs.append({"a": a, "b": b, "only_a": only_a, "only_b": only_b, "p_value": mcnemar_p_value(only_a, only_b)})
+        return {"num_cases": num_cases, "models": models, "pairs": pairs}
+
+    def settled(self, summary: Dict) -> Optional[str]:
+        if summary["num_cases"] < self.min_cases:
+            return None
+        half_widths = [(model["high"] - model["low"]) / 2 for model in summary["models"].values()]
+        if summary["pairs"] and all(pair["p_value"] < self.alpha_per_round for pair in summary["pairs"]):
+            return f"every pair of models differs at p < {self.alpha_per_round:.4g}"
+        if max(half_widths) <= self.target_half_width:
+            return f"every recall interval is within +/- {self.target_half_width * 100:.1f} points"
+        return None
+
+    def to_dict(self) -> Dict:
+        return {
+            "stop_reason": self.stop_reason,
+            "cases_used": self.rounds[-1]["num_cases"] if self.rounds else 0,
+            "cases_available": self.available,
+            "api_calls": int(self.spent[0]),
+            "estimated_dollars": float(self.spent[1]),
+            "alpha_per_round": self.alpha_per_round,
+            "rounds": self.rounds,
+        }
+
+    def report(self) -> str:
+        if not self.rounds:
+            return "No rounds were run"
+        last = self.rounds[-1]
+        table = [
+            ["Stop Reason", self.stop_reason],
+            ["Cases Used", f"{last['num_cases']} of {self.available}"],
+            ["Rounds", len(self.rounds)],
+            ["API Calls", int(self.spent[0])],
+            ["Est. Cost ($)", f"{self.spent[1]:.4f}"],
+        ]
+        for name, model in last["models"].items():
+            table.append([f"Hit Rate (%): {name}", f"{model['recall'] * 100:.2f} [{model['low'] * 100:.2f}, {model['high'] * 100:.2f}]"])
+        for pair in last["pairs"]:
+            table.append([f"McNemar p: {pair['a']} vs {pair['b']}", f"{pair['p_value']:.4g} ({pair['only_a']} vs {pair['only_b']} discordant)"])
+        return tabulate(table, headers=["Adaptive Stopping", "Value"], tablefmt="grid")
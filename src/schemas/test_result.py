@@ -0,0 +1,62 @@
+from typing import List, Optional
+from src.schemas.test_case import TestCase
+
+
+class TestResult:
+    def __init__(self, test_case: TestCase, sources: list, embed_time: float = 0.0, search_time: float = 0.0, generate_time: float = 0.0, scores: Optional[List[float]] = None, k: Optional[int] = None, error: Optional[str] = None):
+        """
+        Outcome of one test case. sources are ranked best first, and hit means the target is within the top k of them.
+        error is set when the case could not be run, so a resumed run tries it again.
+        """
+        self.question = test_case.question
+        self.doc_id = test_case.doc_id
+        self.sources = sources
+        self.scores = scores or []
+        # 1-based rank of the target document in the retrieved list, None when it was not retrieved
+        self.rank = sources.index(test_case.doc_id) + 1 if test_case.doc_id in sources else None
+        self.score = self.scores[self.rank - 1] if self.rank and self.rank <= len(self.scores) else None
+        self.hit = self.rank is not None and (k is None or self.rank <= k)
+        self.embed_time = embed_time
+        self.search_time = search_time
+        self.generate_time = generate_time
+        self.error = error
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TestResult":
+        """
+        Rebuilds a result from the fields to_dict keeps, e.g. one read back from the results store.
+        The ranked sources are not kept, so sources only holds the target when it was retrieved.
+        """
+        result = cls.__new__(cls)
+        result.question = data["question"]
+        result.doc_id = data["doc_id"]
+        result.rank = data["rank"]
+        result.score = data["score"]
+        result.hit = bool(data["hit"])
+        result.sources = [data["doc_id"]] if result.rank else []
+        result.scores = [result.score] if result.score is not None else []
+        result.embed_time = data["embed_time"]
+        result.search_time = data["search_time"]
+        result.generate_time = data["generate_time"]
+        result.error = data.get("error")
+        return result
+
+    @property
+    def duration(self) -> float:
+        return self.embed_time + self.search_time + self.generate_time
+
+    def __bool__(self) -> bool:
+        return self.hit
+
+    def to_dict(self) -> dict:
+        return {
+            "question": self.question,
+            "doc_id": self.doc_id,
+            "rank": self.rank,
+            "score": self.score,
+            "hit": self.hit,
+            "embed_time": self.embed_time,
+            "search_time": self.search_time,
+            "generate_time": self.generate_time,
+            "error": self.error,
+        }
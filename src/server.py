@@ -0,0 +1,225 @@
+import os
+import json
+import time
+import argparse
+import threading
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from src.async_runner import AsyncExperimentRunner
+from src.client import DEFAULT_HOST, DEFAULT_PORT
+from src.metrics import DEFAULT_KS, RetrievalMetrics
+from src.registry import Embedding, registry
+from src.results_store import ResultsStore
+from src.schemas.test_result import TestResult
+from src.test_generator import TestQuestionGenerator
+
+JOB_MODES = ("Sequential", "Batch", "Async")
+
+class EvaluationService:
+    def __init__(self, store: Optional[ResultsStore] = None) -> None:
+        """
+        Keeps pipelines, vector stores, the LLM and the tracker db resident between evaluation jobs.
+        Each model's collection is synced with the data folder the first time a job uses it, or when a job asks for it,
+        and jobs on the same model run one at a time.
+        """
+        self.store = store or ResultsStore()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._pipeline_locks: Dict[str, threading.Lock] = {}
+        self._generators: Dict[str, TestQuestionGenerator] = {}
+        self._synced = set()
+
+    def warm(self, embedding: Embedding, backend: str = "chroma", sync: bool = False) -> str:
+        """
+        Builds (once) everything a job on this model needs, syncing its collection on first use or when sync is set.
+        """
+        key = f"{backend}:{embedding.name}"
+        pipeline = registry.pipeline(embedding, backend)
+        with self._lock:
+            lock = self._pipeline_locks.setdefault(key, threading.Lock())
+            if key not in self._generators:
+                self._generators[key] = TestQuestionGenerator(vector_store_manager=pipeline.vector_store_manager)
+        if sync or key not in self._synced:
+            with lock:
+                pipeline.process_data()
+                self._synced.add(key)
+        return key
+
+    def health(self) -> Dict:
+        return {"status": "ok", "uptime_s": time.time() - self.started_at, "warm": sorted(self._synced), "build_times": registry.build_times}
+
+    def run_job(self, job: Dict, emit: Callable[[Dict], None]) -> None:
+        """
+        Runs one evaluation job, calling emit with a started event, one result event per test case as it finishes
+        and a summary event. Every case is also written to the results store under the job's run id.
+        """
+        job_start = time.time()
+        if job.get("embedding", "OPENAI_LARGE") not in Embedding.__members__:
+            raise ValueError(f"Unknown embedding: {job['embedding']}, expected one of {', '.join(Embedding.__members__)}")
+        embedding = Embedding[job.get("embedding", "OPENAI_LARGE")]
+        backend = job.get("backend", "chroma")
+        mode = job.get("mode", "Batch").capitalize()
+        if mode not in JOB_MODES:
+            raise ValueError(f"Unknown mode: {mode}, expected one of {', '.join(JOB_MODES)}")
+        ks = sorted(set(job.get("ks") or DEFAULT_KS))
+        k = int(job.get("k", 5))
+        generate_answer = bool(job.get("generate_answer", False))
+
+        key = self.warm(embedding, backend, sync=bool(job.get("sync", False)))
+        pipeline = registry.pipeline(embedding, backend)
+        generator = self._generators[key]
+
+        with self._pipeline_locks[key]:
+            if job.get("doc_ids"):
+                by_doc_id = generator.sql.get_questions_by_doc_ids(job["doc_ids"])
+                test_cases = [by_doc_id[doc_id] for doc_id in job["doc_ids"] if doc_id in by_doc_id]
+            else:
+                test_cases = generator.build_test_set(int(job.get("num_cases", 10)), stratify=bool(job.get("stratify", True)), seed=job.get("seed"))
+
+            # the same keys main prompts for, so a job's run can also be resumed from the interactive CLI
+            settings = {
+                "mode": mode,
+                "embedding": embedding.name,
+                "backend": backend,
+                "experiments": str(len(test_cases)),
+                "ks": ",".join(map(str, ks)),
+                "stratify": bool(job.get("stratify", True)),
+                "evaluation": "Full generation" if generate_answer else "Retrieval only",
+                "concurrency": str(job.get("concurrency", 16)),
+                "trace": False,
+            }
+            run_id = self.store.start_run(settings, test_cases)
+            emit({"event": "started", "run_id": run_id, "num_cases": len(test_cases), "startup_s": time.time() - job_start})
+
+            def on_result(result: TestResult) -> None:
+                self.store.record(run_id, result)
+                emit({"event": "result", **result.to_dict()})
+
+            search_k = max(ks + [k])
+            results = []
+            if mode == "Batch":
+                results = generator.run_test_cases_batch(pipeline_to_test=pipeline, test_cases=test_cases, k=k, search_k=search_k, on_result=on_result)
+            elif mode == "Async":
+                runner = AsyncExperimentRunner(pipeline=pipeline, concurrency=int(job.get("concurrency", 16)), generate_answer=generate_answer, k=k, search_k=search_k, on_result=on_result)
+                results = runner.run_sync(test_cases)
+            else:
+                for test_case in test_cases:
+                    result = generator.run_test_case(pipeline_to_test=pipeline, test_case=test_case, generate_answer=generate_answer, k=k, search_k=search_k)
+                    on_result(result)
+                    results.append(result)
+
+            failed_cases = sum(1 for result in results if result.error)
+            self.store.finish_run(run_id, status="incomplete" if failed_cases or len(results) < len(test_cases) else "finished")
+
+        success_count = sum(1 for result in results if result.hit)
+        emit({
+            "event": "summary",
+            "run_id": run_id,
+            "num_cases": len(results),
+            "successes": success_count,
+            "failed_cases": failed_cases,
+            "success_rate": success_count / len(results) if results else 0.0,
+            "duration_s": time.time() - job_start,
+            "metrics": RetrievalMetrics.from_results(results, ks).to_dict(),
+        })
+
+class EvaluationHandler(BaseHTTPRequestHandler):
+    """
+    GET /health reports what is warm, and POST /jobs takes a JSON job and streams newline-delimited JSON events back.
+    """
+    service: EvaluationService = None
+
+    def address_string(self) -> str:
+        # Unix socket peers have no host and port
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def _send_json(self, status: int, payload: Dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._send_json(200, self.service.health())
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        if self.path != "/jobs":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+        try:
+            job = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except Exception as e:
+            self._send_json(400, {"error": f"Invalid job: {e}"})
+            return
+
+        # no Content-Length, so the stream ends when the connection closes
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.end_headers()
+
+        def emit(event: Dict) -> None:
+            self.wfile.write((json.dumps(event) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+        try:
+            self.service.run_job(job, emit)
+        except (BrokenPipeError, ConnectionResetError):
+            print("Client went away before the job finished")
+        except Exception as e:
+            print(f"Error in EvaluationHandler.do_POST: {e}")
+            try:
+                emit({"event": "error", "message": str(e)})
+            except OSError:
+                pass
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        socketserver.UnixStreamServer.server_bind(self)
+        # BaseHTTPRequestHandler reads these, a Unix socket has neither
+        self.server_name, self.server_port = "localhost", 0
+
+def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: Optional[str] = None, warm: Optional[List[str]] = None, backend: str = "chroma") -> None:
+    service = EvaluationService()
+    for name in warm or []:
+        print(f"Warming {name} ({backend})")
+        service.warm(Embedding[name], backend)
+    handler = type("BoundEvaluationHandler", (EvaluationHandler,), {"service": service})
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, handler)
+        print(f"Serving evaluation jobs on unix socket {socket_path}")
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        print(f"Serving evaluation jobs on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+        service.store.flush()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Long-running evaluation server that keeps models, vector stores and the tracker db loaded.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default="chroma", help="backend of the models warmed at startup")
+    parser.add_argument("--warm", nargs="*", choices=[embedding.name for embedding in Embedding], default=[], help="models to load and sync before the first job")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.socket, args.warm, args.backend)
+
+if __name__ == "__main__":
+    main()
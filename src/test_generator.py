@@ -1,40 +1,87 @@
+import os
+import time
 import random
+from collections import Counter
 from langchain_core.pydantic_v1 import BaseModel, Field
 from langchain.docstore.document import Document
-from typing import List, Dict
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from src.schemas.test_case import TestCase
 from src.schemas.question import Question
+from src.schemas.test_result import TestResult
 from src.vectorstore import VectorStoreManager, SqlDb
 from src.model import Model
-from src.pipeline import Pipeline
+from src.pipeline import Pipeline, QUERY_BATCH_SIZE
+from src.registry import Embedding, registry
+from src.tracing import traced
+
+def stratified_slots(counts: Dict[str, Dict[int, int]], num_cases: int, rng: random.Random) -> List[Tuple[str, int]]:
+    """
+    The (source, page) each of up to num_cases sampled ids comes from, given the number of chunks per page of each source.
+    Sources are taken in turn and each source's pages are covered before any page repeats, shuffled at every level.
+    """
+    def source_slots(source: str, pages: List[Tuple[int, int]]) -> Iterator[Tuple[str, int]]:
+        for i in range(max(n for _page, n in pages)):
+            for page, n in pages:
+                if i < n:
+                    yield source, page
+
+    sources = []
+    for source, pages in counts.items():
+        pages = list(pages.items())
+        rng.shuffle(pages)
+        sources.append(source_slots(source, pages))
+    rng.shuffle(sources)
+
+    slots = []
+    while sources and len(slots) < num_cases:
+        for source in list(sources):
+            slot = next(source, None)
+            if slot is None:
+                sources.remove(source)
+                continue
+            slots.append(slot)
+            if len(slots) == num_cases:
+                break
+    return slots
 
 class TestQuestionGenerator:
-    def __init__(self):
+    def __init__(self, sql: Optional[SqlDb] = None, vector_store_manager: Optional[VectorStoreManager] = None):
         """
         Initialize the TestQuestionGenerator with components for generating and testing questions.
+        Test documents are sampled from vector_store_manager's collection, and shared components come from the registry.
         """
-        self.llm = Model()
-        self.vector_store_manager = VectorStoreManager()
-        self.pipeline = Pipeline(model=self.llm, vector_store_manager=self.vector_store_manager)
-        self.sql = SqlDb()
+        self.sql = sql or registry.sql()
+        self.vector_store_manager = vector_store_manager or registry.vector_store_manager(Embedding.OPENAI_LARGE)
+        self.pipeline = Pipeline(model=None, vector_store_manager=self.vector_store_manager)
+
+    @property
+    def llm(self) -> Model:
+        # only built when a QA pair actually has to be generated
+        return self.pipeline.model
 
+    @traced("test_generator.pick_random_document")
     def pick_random_document(self) -> Dict[str, str]: 
         try:
             ret = {}
-            # Get document IDs from the vector store
-            ids = self.vector_store_manager.vector_store.get()['ids']
-            if not ids:
+            # Pick a position in the collection and look up only the id stored there
+            count = self.vector_store_manager.count()
+            if not count:
                 self.pipeline.process_data()
-            random_id = random.choice(ids)
+                count = self.vector_store_manager.count()
+            offset = random.randrange(count)
+            random_id = self.vector_store_manager.ids_at([offset])[offset]
 
             # Store the selected document's ID and content
             ret['doc_id'] = random_id
-            ret['document'] = self.vector_store_manager.vector_store.get(random_id)['documents'] 
+            document = self.vector_store_manager.vector_store.get(random_id)
+            ret['document'] = document['documents'] 
+            ret['source'] = os.path.basename(document['metadatas'][0]['source'])
             return ret
         except Exception as e:
             print(f"Error in TestQuestionGenerator.pick_random_document: {e}")
             return {}
 
+    @traced("test_generator.generate_test_case")
     def generate_test_case(self, document_content: str) -> TestCase:
         """
         Generates or retrieves a test case for a given document.
@@ -42,7 +89,7 @@ class TestQuestionGenerator:
         try: 
             if not self.sql.doc_id_has_question(document_content['doc_id']):
                 # Generate a new QA pair using the LLM
-                qa = self.llm.generate_qa_pair(doc_id=document_content['doc_id'], document_content=document_content["document"])
+                qa = self.llm.generate_qa_pair(doc_id=document_content['doc_id'], document_content=document_content["document"], source=document_content.get('source'))
                 self.sql.insert_question(qa)
             else:
                 # Retrieve existing QA pair from the database
@@ -53,23 +100,130 @@ class TestQuestionGenerator:
             print(f"Error in TestQuestionGenerator.generate_test_case: {e}")
             return None
 
-    def run_test_case(self, pipeline_to_test: Pipeline, test_case: TestCase) -> bool:
+    @traced("test_generator.sample_doc_ids")
+    def sample_doc_ids(self, num_cases: int, stratify: bool = False, seed: Optional[int] = None) -> List[str]:
+        """
+        Samples up to num_cases distinct chunk ids without loading any document bodies or embeddings.
+        With stratify, sources are taken in turn and each source's pages are covered before any page repeats.
+        The collection is only ever read a page at a time, so memory grows with num_cases and the number of pages, not chunks.
+        """
+        rng = random.Random(seed)
+        manager = self.vector_store_manager
+        if not stratify:
+            # positions drawn from range(count) are resolved to ids one page at a time, never listing the collection
+            count = manager.count()
+            offsets = rng.sample(range(count), min(num_cases, count))
+            ids = manager.ids_at(offsets)
+            return [ids[offset] for offset in offsets if offset in ids]
+
+        # first pass: count the chunks on every page of every source
+        counts = {}
+        for _doc_id, metadata in manager.iter_metadatas():
+            pages = counts.setdefault(metadata.get('source'), {})
+            pages[metadata.get('page')] = pages.get(metadata.get('page'), 0) + 1
+
+        # decide which page each sampled id comes from, then which of that page's chunks
+        slots = stratified_slots(counts, num_cases, rng)
+        needed = Counter(slots)
+        chosen = {(source, page): set(rng.sample(range(counts[source][page]), n)) for (source, page), n in needed.items()}
+
+        # second pass: pick out the chosen chunks, keeping only those ids
+        picked = {key: [] for key in needed}
+        seen = Counter()
+        for doc_id, metadata in manager.iter_metadatas():
+            key = (metadata.get('source'), metadata.get('page'))
+            if key in chosen:
+                if seen[key] in chosen[key]:
+                    picked[key].append(doc_id)
+                seen[key] += 1
+        for ids in picked.values():
+            rng.shuffle(ids)
+        return [picked[key].pop() for key in slots if picked[key]]
+
+    @traced("test_generator.build_test_set")
+    def build_test_set(self, num_cases: int, stratify: bool = False, seed: Optional[int] = None, max_concurrency: int = 8) -> List[TestCase]:
+        """
+        Builds a set of test cases for num_cases distinct documents, reusing stored QA pairs where they exist.
+        Missing QA pairs are generated in concurrent batches and stored in bulk.
+        """
+        try:
+            doc_ids = self.sample_doc_ids(num_cases, stratify=stratify, seed=seed)
+            test_cases = self.sql.get_questions_by_doc_ids(doc_ids)
+            missing = [doc_id for doc_id in doc_ids if doc_id not in test_cases]
+            print(f"Sampled {len(doc_ids)} documents, {len(test_cases)} already have a QA pair")
+
+            # generate in batches so every finished batch is persisted even if a later one fails
+            batch_size = max_concurrency * 8
+            for start in range(0, len(missing), batch_size):
+                batch_ids = missing[start:start + batch_size]
+                items = self.vector_store_manager.vector_store.get(ids=batch_ids, include=["documents", "metadatas"])
+                documents = [
+                    {"doc_id": doc_id, "document": document, "source": os.path.basename(metadata['source'])}
+                    for doc_id, document, metadata in zip(items['ids'], items['documents'], items['metadatas'])
+                ]
+                generated = self.llm.generate_qa_pairs(documents, max_concurrency=max_concurrency)
+                self.sql.insert_questions(generated)
+                test_cases.update({test_case.doc_id: test_case for test_case in generated})
+
+            return [test_cases[doc_id] for doc_id in doc_ids if doc_id in test_cases]
+        except Exception as e:
+            print(f"Error in TestQuestionGenerator.build_test_set: {e}")
+            return []
+
+    @traced("test_generator.run_test_case")
+    def run_test_case(self, pipeline_to_test: Pipeline, test_case: TestCase, generate_answer: bool = False, k: int = 5, search_k: Optional[int] = None) -> TestResult:
         """
-        Executes a test case by querying the pipeline and verifying the result.
+        Executes a test case by querying the pipeline and recording the rank and score of the expected document.
+        The search goes search_k deep so deeper cutoffs can be scored from the same run, while a hit still means top k.
+        Only retrieval is scored, so the answer is generated only when generate_answer is set.
         """
         try:
             question = test_case.question
-            # Ask the pipeline the test question
-            response, sources = pipeline_to_test.generate(input_query=question)
-            sources = set(sources)
-
-            # Check if the correct document ID is among the sources
-            if test_case.doc_id in sources:
-                print(f'Passed test: {question}')
-                return True 
-            else:
-                print(f'Failed test: {question}')
-                return False    
+            # Ask the pipeline the test question, timing the embedding call and the search apart as Batch mode does
+            print(f"retrieving documents with embedding: {pipeline_to_test.embedding}")
+            embed_start = time.time()
+            query_embedding = pipeline_to_test.embed_query(question)
+            embed_time = time.time() - embed_start
+
+            search_start = time.time()
+            retrieved_documents, sources = pipeline_to_test.search(query_embedding, k=max(k, search_k or k))
+            search_time = time.time() - search_start
+
+            generate_time = 0.0
+            if generate_answer:
+                # the answer only ever sees the top k documents
+                generate_start = time.time()
+                pipeline_to_test.generate(input_query=question, retrieved_documents=retrieved_documents[:k])
+                generate_time = time.time() - generate_start
+
+            result = TestResult(test_case, sources, embed_time=embed_time, search_time=search_time, generate_time=generate_time, scores=[score for _doc, score in retrieved_documents], k=k)
         except Exception as e:
             print(f"Error in TestQuestionGenerator.run_test_case: {e}")
-            return False
+            result = TestResult(test_case, [], k=k, error=str(e))
+
+        print(f"{'Passed' if result.hit else 'Failed'} test: {test_case.question}")
+        return result
+
+    @traced("test_generator.run_test_cases_batch")
+    def run_test_cases_batch(self, pipeline_to_test: Pipeline, test_cases: List[TestCase], k: int = 5, search_k: Optional[int] = None, batch_size: int = QUERY_BATCH_SIZE, on_result: Optional[Callable[[TestResult], None]] = None) -> List[TestResult]:
+        """
+        Executes many test cases at once, embedding their questions in batches and searching search_k deep for the whole set.
+        on_result is called with each result as its batch finishes, and the results of finished batches are kept if a later one fails.
+        """
+        results = []
+        try:
+            for start in range(0, len(test_cases), batch_size):
+                batch = test_cases[start:start + batch_size]
+                questions = [test_case.question for test_case in batch]
+                sources, scores, embed_times, search_times = pipeline_to_test.retrieve_batch(questions, k=max(k, search_k or k), batch_size=batch_size)
+
+                for test_case, case_sources, case_scores, embed_time, search_time in zip(batch, sources, scores, embed_times, search_times):
+                    result = TestResult(test_case, case_sources, embed_time=embed_time, search_time=search_time, scores=case_scores, k=k)
+                    print(f"{'Passed' if result.hit else 'Failed'} test: {test_case.question}")
+                    results.append(result)
+                    if on_result:
+                        on_result(result)
+            return results
+        except Exception as e:
+            print(f"Error in TestQuestionGenerator.run_test_cases_batch: {e}")
+            return results
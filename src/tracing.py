@@ -0,0 +1,120 @@
+import os
+import json
+import time
+import inspect
+import functools
+import threading
+import numpy as np
+from contextlib import nullcontext
+from typing import Callable, Dict, Optional
+from tabulate import tabulate
+
+# upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = (1, 10, 100, 1000)
+NULL_SPAN = nullcontext()
+
+class Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: Optional[Dict]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        end = time.perf_counter_ns()
+        # list.append is atomic, so spans from worker threads need no lock
+        self.tracer.spans.append((self.name, self.start, end - self.start, threading.get_ident(), self.args))
+
+class Tracer:
+    def __init__(self) -> None:
+        """
+        Records named spans for each pipeline stage. While disabled, span() hands back a shared no-op context
+        and traced functions call straight through, so leaving the instrumentation in place costs next to nothing.
+        """
+        self.enabled = False
+        self.spans = []
+        self.origin = time.perf_counter_ns()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        self.spans = []
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name: str, **args):
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args or None)
+
+    def durations(self) -> Dict[str, np.ndarray]:
+        """
+        Span durations in seconds grouped by stage name, in the order stages were first seen.
+        """
+        grouped = {}
+        for name, _start, duration, _tid, _args in self.spans:
+            grouped.setdefault(name, []).append(duration)
+        return {name: np.asarray(durations) / 1e9 for name, durations in grouped.items()}
+
+    def report(self) -> str:
+        """
+        Latency percentiles and a histogram of span durations for every stage.
+        """
+        bucket_headers = [f"<{edge}ms" if edge < 1000 else f"<{edge // 1000}s" for edge in HISTOGRAM_BUCKETS_MS]
+        bucket_headers.append(f">={HISTOGRAM_BUCKETS_MS[-1] // 1000}s")
+        table = []
+        for name, durations in self.durations().items():
+            p50, p95, p99 = np.percentile(durations * 1000, [50, 95, 99])
+            counts = np.bincount(np.searchsorted(HISTOGRAM_BUCKETS_MS, durations * 1000, side="right"), minlength=len(HISTOGRAM_BUCKETS_MS) + 1)
+            table.append([name, len(durations), f"{durations.sum():.4f}", f"{p50:.2f}", f"{p95:.2f}", f"{p99:.2f}"] + counts.tolist())
+        headers = ["Stage", "Count", "Total (s)", "p50 (ms)", "p95 (ms)", "p99 (ms)"] + bucket_headers
+        return tabulate(table, headers=headers, tablefmt="grid")
+
+    def export_chrome_trace(self, path: str) -> str:
+        """
+        Writes the spans in Chrome trace event format, viewable in chrome://tracing or Perfetto.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        pid = os.getpid()
+        events = []
+        for name, start, duration, tid, args in self.spans:
+            event = {"name": name, "cat": name.split(".")[0], "ph": "X", "ts": (start - self.origin) / 1000, "dur": duration / 1000, "pid": pid, "tid": tid}
+            if args:
+                event["args"] = args
+            events.append(event)
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return path
+
+tracer = Tracer()
+
+def traced(name: str) -> Callable:
+    """
+    Decorator recording every call of a function or coroutine function as a span named name.
+    """
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not tracer.enabled:
+                    return await func(*args, **kwargs)
+                with Span(tracer, name, None):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with Span(tracer, name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
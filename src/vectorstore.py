@@ -1,143 +1,380 @@
 import os 
-import chromadb
-from langchain_openai import OpenAIEmbeddings
 from langchain_core.embeddings import Embeddings
 from langchain_chroma import Chroma
 from pydantic import BaseModel
 from langchain_core.pydantic_v1 import BaseModel, Field
-from typing import List, Optional, Dict
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter, TextSplitter
 from src.schemas.question import Question
 from src.schemas.test_case import TestCase
+from src.ingestion import IngestionPipeline, IngestionStats
+from src.manifest import DATA_DIR, CorpusManifest
+from src.numpy_store import NUMPY_STORE_DIR, NumpyVectorStore
+from src.page_cache import PAGE_CACHE_DIR, PageTextCache
+from src.tracing import traced
 import sqlite3
+import hashlib
+import threading
+import numpy as np
 
 PERSITENT_DIR_PATH = "db/chroma_langchain_db"
+COLLECTION_PREFIX = "llm-embedding-test-suite-1"
+VECTOR_STORE_BACKENDS = ("chroma", "numpy")
+TRACKER_DB_PATH = "db/knowledge_files_tracker2.db"
+SQL_BATCH_SIZE = 500  # stay below sqlite's bound parameter limit
+GET_PAGE_SIZE = 5000  # rows fetched per request when walking a whole collection
+
+def chunk_content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
 
 class VectorStoreManager:
-    def __init__(self, embedding_function:Optional[Embeddings]=OpenAIEmbeddings(model="text-embedding-3-large")) -> None:
+    def __init__(self, 
+                 embedding_function:Optional[Embeddings]=None, 
+                 sql_document_tracker: Optional["SqlDb"] = None, 
+                 backend: str = "chroma",
+                 client=None,
+                 store_dir: str = NUMPY_STORE_DIR,
+                 data_dir: str = DATA_DIR,
+                 hnsw_params: Optional[Dict] = None,
+                 text_splitter: Optional[TextSplitter] = None,
+                 page_cache_dir: str = PAGE_CACHE_DIR) -> None:
+        """
+        backend selects where vectors live: "chroma" for the persistent Chroma collection,
+        or "numpy" for exact search over a memory-mapped matrix (see NumpyVectorStore).
+        The embedding function, tracker db and Chroma client default to the shared ones in the registry.
+        store_dir, data_dir and page_cache_dir let a store be kept apart from the real one, as the offline benchmarks do.
+        text_splitter defaults to 800 character chunks with 80 characters of overlap.
+        hnsw_params (e.g. {"space": "cosine", "M": 32}) tune a Chroma collection's index, and only apply when the collection is created.
+        """
+        from src.registry import Embedding, registry
         print("initilising vector store")
-        self.embedding_function=embedding_function
-        self.collection_name = "llm-embedding-test-suite-1"
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        if backend not in VECTOR_STORE_BACKENDS:
+            raise ValueError(f"Unknown vector store backend: {backend}")
+        self.backend = backend
+        self.embedding_function=embedding_function or Embedding.OPENAI_LARGE.function
+        # every embedding model gets its own collection so searches never scan other models' vectors
+        self.collection_name = f"{COLLECTION_PREFIX}-{self.embedding_function.model}"
+        self.text_splitter = text_splitter or RecursiveCharacterTextSplitter(
                     chunk_size=800,
                     chunk_overlap=80,
                     length_function=len,
                     is_separator_regex=False,
                 )
-        self.sql_document_tracker = SqlDb()
+        self.page_cache = PageTextCache(page_cache_dir)
+        self.sql_document_tracker = sql_document_tracker or registry.sql()
 
         try:
-            self.client = chromadb.PersistentClient()
-            self.collection = self.client.get_or_create_collection("main-collection")
-            self.embedding_function = self.embedding_function
-            self.vector_store = Chroma(
-                collection_name=self.collection_name,
-                embedding_function=self.embedding_function,
-                persist_directory=PERSITENT_DIR_PATH, 
-            )
+            if backend == "numpy":
+                self.vector_store = NumpyVectorStore(self.collection_name, self.embedding_function, store_dir=store_dir)
+            else:
+                self.client = client or registry.chroma_client()
+                self.vector_store = Chroma(
+                    client=self.client,
+                    collection_name=self.collection_name,
+                    embedding_function=self.embedding_function,
+                    collection_metadata={f"hnsw:{key}": value for key, value in hnsw_params.items()} if hnsw_params else None,
+                )
             self.embedding = self.embedding_function.model
+            # ingested files are tracked per collection and backend
+            self.namespace = self.collection_name if backend == "chroma" else f"{backend}:{self.collection_name}"
+            self.manifest = CorpusManifest(self.sql_document_tracker, self.namespace, data_dir=data_dir)
             print("succesfully initilised vector store")
         except Exception as e:
             print(f"Error in VectorStoreManager.__init__: {e}")
         
-    def ingest_data(self):
+    @traced("vectorstore.ingest_data")
+    def ingest_data(self) -> Optional[IngestionStats]:
         """
-        Ingest new documents from 'data/' folder into the vector store.
+        Sync the vector store with the 'data/' folder, ingesting only files the manifest reports as added or modified.
+        Chunks of modified and deleted files are removed first so stale content is never retrieved.
         """ 
-        print("Checking to see if any new documents have been added")
-        try:
-            # get files
-            knowledge_files = os.listdir('data/')
-            new_knowledge = set()
-            knowledge_file_tracker_db = SqlDb()
-
-            # check if any new files
-            for file in knowledge_files:
-                if not knowledge_file_tracker_db.document_with_embedding_exists(doc_id=file, embedding=self.embedding):
-                    new_knowledge.add(file)
-                    print(f"new file found {file} with embedding: {self.embedding}")
-                    # update document tracker db to contain new file
-                    self.sql_document_tracker.insert_document_and_embedding(name=file, embedding=self.embedding)
-            
-            # process and upload the new files to vector store
-            if new_knowledge:
-                for knowledge in new_knowledge:
-                    loader = PyPDFLoader(f"data/{knowledge}")
-                    documents = loader.load_and_split()
-                    split_documents = self.text_splitter.split_documents(documents)
-                    self.add_to_chroma(split_documents)
+        return sync_vector_stores([self])
+
+    @traced("vectorstore.delete_source")
+    def delete_source(self, path: str) -> None:
+        """
+        Removes every chunk of a source file from this manager's collection.
+        """
+        try:
+            if self.backend == "numpy":
+                self.vector_store.delete(where={"source": path})
             else:
-                print('no new data to be added')
+                self.vector_store._collection.delete(where={"source": path})
+            print(f"removed chunks of {path} with embedding: {self.embedding}")
         except Exception as e:
-            print(f"Error in VectorStoreManager.ingest_data: {e}")
+            print(f"Error in VectorStoreManager.delete_source: {e}")
         
-    def add_to_chroma(self, chunks):
+    def existing_ids(self, ids: List[str]) -> set:
+        """
+        Returns which of ids are already stored, looking up only those ids in batches rather than listing the collection.
+        """
+        found = set()
+        unique_ids = list(dict.fromkeys(ids))
+        for start in range(0, len(unique_ids), SQL_BATCH_SIZE):
+            found.update(self.vector_store.get(ids=unique_ids[start:start + SQL_BATCH_SIZE], include=[])["ids"])
+        return found
+
+    def count(self) -> int:
+        if self.backend == "numpy":
+            return self.vector_store.count()
+        return self.vector_store._collection.count()
+
+    def iter_pages(self, include: Optional[List[str]] = None, where: Optional[Dict] = None, page_size: int = GET_PAGE_SIZE) -> Iterator[Dict]:
+        """
+        Walks the collection page_size rows at a time, yielding each page as returned by get,
+        so memory is bounded by one page however large the collection grows.
+        """
+        offset = 0
+        while True:
+            page = self.vector_store.get(where=where, limit=page_size, offset=offset, include=include or [])
+            if not page["ids"]:
+                return
+            yield page
+            if len(page["ids"]) < page_size:
+                return
+            offset += page_size
+
+    def iter_ids(self, page_size: int = GET_PAGE_SIZE) -> Iterator[str]:
+        for page in self.iter_pages(page_size=page_size):
+            yield from page["ids"]
+
+    def iter_metadatas(self, page_size: int = GET_PAGE_SIZE) -> Iterator[Tuple[str, Dict]]:
+        for page in self.iter_pages(include=["metadatas"], page_size=page_size):
+            yield from zip(page["ids"], page["metadatas"])
+
+    def ids_at(self, offsets: Iterable[int], page_size: int = GET_PAGE_SIZE) -> Dict[int, str]:
+        """
+        Resolves positions in the collection's storage order to ids, fetching only the ids between nearby positions.
+        With count this is the id index used for sampling: positions are drawn from range(count) and looked up here,
+        so no list of every id is ever built.
+        """
+        found = {}
+        wanted = sorted(set(offsets))
+        i = 0
+        while i < len(wanted):
+            start = wanted[i]
+            # positions less than a page apart share one request
+            j = i
+            while j + 1 < len(wanted) and wanted[j + 1] < start + page_size:
+                j += 1
+            ids = self.vector_store.get(limit=wanted[j] - start + 1, offset=start, include=[])["ids"]
+            for offset in wanted[i:j + 1]:
+                if offset - start < len(ids):
+                    found[offset] = ids[offset - start]
+            i = j + 1
+        return found
+
+    def load_embeddings(self, page_size: int = GET_PAGE_SIZE) -> Tuple[List[str], np.ndarray]:
+        """
+        All ids and vectors, filled into one preallocated float32 matrix a page at a time
+        rather than materialising the whole collection as Python lists first.
+        """
+        count = self.count()
+        ids = []
+        vectors = None
+        for page in self.iter_pages(include=["embeddings"], page_size=page_size):
+            page_vectors = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                vectors = np.empty((count, page_vectors.shape[1]), dtype=np.float32)
+            vectors[len(ids):len(ids) + len(page_vectors)] = page_vectors
+            ids += page["ids"]
+        if vectors is None:
+            return [], np.empty((0, 0), dtype=np.float32)
+        return ids, vectors[:len(ids)]
+
+    @traced("vectorstore.add_to_chroma")
+    def add_to_chroma(self, chunks, calculate_ids: bool = True) -> Optional[int]:
+        """
+        Adds the chunks that are not already in the vector store and returns how many were added, or None if they could not be added.
+        Chunk ids are content hashes, so chunks that are already stored are skipped without being embedded again.
+        """
         try:
             vs = self.vector_store
 
-            # Calculate Page IDs.
-            chunks_with_ids = self.calculate_chunk_ids(chunks)
+            # Calculate content hash IDs.
+            chunks_with_ids = self.calculate_chunk_ids(chunks) if calculate_ids else chunks
 
-            # get documents in vector store
-            existing_items = vs.get(include=[])  
-            existing_ids = set(existing_items["ids"])
-            print(f"Number of existing documents in vs: {len(existing_ids)}")
+            # only the candidate ids are looked up
+            existing_ids = self.existing_ids([chunk.metadata["id"] for chunk in chunks_with_ids])
+            print(f"{len(existing_ids)} of {len(chunks_with_ids)} chunks already in vs")
 
-            # add documents that don't exist in the DB.
-            new_chunks = []
+            # add documents that don't exist in the DB, once each
+            new_chunks = {}
             for chunk in chunks_with_ids:
                 if chunk.metadata["id"] not in existing_ids:
-                    new_chunks.append(chunk)
+                    new_chunks.setdefault(chunk.metadata["id"], chunk)
 
             # upload new document chunks to vector store
             if len(new_chunks):
-                new_chunk_ids = [chunk.metadata["id"] for chunk in new_chunks]
-                print(new_chunks)
-                vs.add_documents(documents=new_chunks, ids=new_chunk_ids)
-                print("successfully added new documents")
+                vs.add_documents(documents=list(new_chunks.values()), ids=list(new_chunks))
+                print(f"successfully added {len(new_chunks)} new documents")
             else:
                 print("No new documents to add")
+            return len(new_chunks)
         except Exception as e:
             print(f"Error in VectorStoreManager.add_to_chroma: {e}")
+            return None
 
-    def calculate_chunk_ids(self, chunks):
+    @traced("vectorstore.prune_source")
+    def prune_source(self, path: str, current_ids: Dict[str, str]) -> int:
         """
-        Generates unique IDs for document chunks based on their source and page number.
-        Returns This will create IDs like "doc: POL011BA.pdf page: 6:2"
-        Page Source : Page Number : Chunk Index
+        Deletes the stored chunks of a re-ingested file that are not among current_ids (chunk id -> content hash),
+        and points QA pairs written for a deleted chunk at the new chunk with the same text. Returns how many were deleted.
         """
         try:
-            
+            stored = self.vector_store.get(where={"source": path}, include=["documents"])
+            stale = [(doc_id, document) for doc_id, document in zip(stored["ids"], stored["documents"]) if doc_id not in current_ids]
+            if not stale:
+                return 0
 
+            # a chunk that only moved keeps its QA pair
+            id_by_hash = {}
+            for chunk_id, content_hash in current_ids.items():
+                id_by_hash.setdefault(content_hash, chunk_id)
+            remapped = {}
+            for doc_id, document in stale:
+                new_id = id_by_hash.get(chunk_content_hash(document))
+                if new_id is not None:
+                    remapped[doc_id] = new_id
+            self.sql_document_tracker.remap_doc_ids(remapped)
+
+            stale_ids = [doc_id for doc_id, _document in stale]
+            if self.backend == "numpy":
+                # every numpy delete compacts the files, so it is done once
+                self.vector_store.delete(ids=stale_ids)
+            else:
+                for start in range(0, len(stale_ids), SQL_BATCH_SIZE):
+                    self.vector_store.delete(ids=stale_ids[start:start + SQL_BATCH_SIZE])
+            print(f"removed {len(stale_ids)} stale chunks of {path} with embedding: {self.embedding}")
+            return len(stale_ids)
+        except Exception as e:
+            print(f"Error in VectorStoreManager.prune_source: {e}")
+            return 0
+
+    @traced("vectorstore.similarity_search_by_vectors")
+    def similarity_search_by_vectors(self, embeddings: List[List[float]], k: int = 5, filter: Optional[Dict] = None) -> List[List[Tuple[Document, float]]]:
+        """
+        Runs one top-k search for a whole batch of query embeddings.
+        Returns a list of (document, score) lists, one per query, in the same order.
+        """
+        try:
+            if self.backend == "numpy":
+                return self.vector_store.search_by_vectors(embeddings, k=k)
+
+            results = self.vector_store._collection.query(
+                query_embeddings=embeddings,
+                n_results=k,
+                where=filter,
+                include=["documents", "metadatas", "distances"],
+            )
+            batch = []
+            for documents, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"]):
+                batch.append([
+                    (Document(page_content=document, metadata=metadata or {}), distance)
+                    for document, metadata, distance in zip(documents, metadatas, distances)
+                ])
+            return batch
+        except Exception as e:
+            print(f"Error in VectorStoreManager.similarity_search_by_vectors: {e}")
+            return [[] for _ in embeddings]
+
+    def calculate_chunk_ids(self, chunks):
+        """
+        Generates IDs for document chunks from a hash of their source, page and text, so unchanged chunks keep their ID
+        when a file is edited. Identical text on the same page is told apart by its occurrence.
+        The old positional ID, like "doc: /POL011BA.pdf page:6:2" (Page Source : Page Number : Chunk Index), is kept as position_id.
+        """
+        try:
             last_page_id = None
             current_chunk_index = 0
+            occurrences = {}
 
             # calculate ids for all chunks
             for chunk in chunks:
                 chunk.metadata['embedding']=self.embedding
-                source = chunk.metadata.get("source")[4:]
+                source = chunk.metadata.get("source")
                 page = chunk.metadata.get("page")
-                current_page_id = f"doc: {source} page:{page}"
+                current_page_id = f"doc: {source[4:]} page:{page}"
 
                 # increment index of chunks with with the same page number
                 current_chunk_index = current_chunk_index + 1 if last_page_id == current_page_id else 0
+                chunk.metadata["position_id"] = f"{current_page_id}:{current_chunk_index}"
 
-                # create chunk ID.
-                chunk_id = f"{current_page_id}:{current_chunk_index}"
-                # add ID to metadata
-                chunk.metadata["id"] = chunk_id
+                content_hash = chunk_content_hash(chunk.page_content)
+                occurrence = occurrences.get((source, page, content_hash), 0)
+                occurrences[(source, page, content_hash)] = occurrence + 1
+                chunk.metadata["content_hash"] = content_hash
+                chunk.metadata["id"] = hashlib.sha256(f"{source}\0{page}\0{occurrence}\0{content_hash}".encode()).hexdigest()[:32]
 
                 last_page_id = current_page_id
             return chunks
         except Exception as e:
             print(f"Error in VectorStoreManager.calculate_chunk_ids: {e}")
   
+@traced("vectorstore.sync")
+def sync_vector_stores(vector_store_managers: List[VectorStoreManager]) -> Optional[IngestionStats]:
+    """
+    Syncs several vector stores with the 'data/' folder at once.
+    Each changed file is parsed and chunked once, and only the embedding step is repeated per store.
+    Returns the ingestion stats, or None when nothing had to be ingested.
+    """
+    print("Checking to see if any documents have been added, modified or deleted")
+    try:
+        to_ingest = {}
+        diffs = []
+        for manager in vector_store_managers:
+            diff = manager.manifest.diff()
+            for path in diff.touched:
+                manager.manifest.record(path, diff.entries[path])
+            if not diff.has_changes:
+                continue
+            print(f"corpus changes for embedding {manager.embedding}: {diff}")
+            diffs.append((manager, diff))
+
+            # drop the chunks of files that disappeared, modified files are diffed chunk by chunk during ingestion
+            for path in diff.deleted:
+                manager.delete_source(path)
+            for path in diff.deleted:
+                manager.manifest.forget(path)
+                manager.sql_document_tracker.delete_entry(doc_id=os.path.basename(path), embedding=manager.embedding)
+
+            for path in diff.added + diff.modified:
+                to_ingest.setdefault(path, []).append(manager)
+
+        if not to_ingest:
+            print('no new data to be added')
+            return None
+
+        # parse, split and upload the new and modified files to every vector store that needs them
+        stats = IngestionPipeline(vector_store_managers).ingest(to_ingest)
+        print(stats.report())
+
+        # update the manifests and document tracker db once the files are in the vector stores
+        for manager, diff in diffs:
+            for path in diff.added + diff.modified:
+                # a file that failed to parse or embed stays out of the manifest, so the next sync retries it
+                if path in stats.failed_paths:
+                    continue
+                manager.manifest.record(path, diff.entries[path])
+                manager.sql_document_tracker.insert_document_and_embedding(name=os.path.basename(path), embedding=manager.embedding)
+        return stats
+    except Exception as e:
+        print(f"Error in sync_vector_stores: {e}")
+        return None
+
 class SqlDb:
-    def __init__(self) -> None:
+    def __init__(self, path: str = TRACKER_DB_PATH) -> None:
+        """
+        Holds one long-lived connection to the tracker db in WAL mode, shared safely across threads through a lock.
+        """
+        self._lock = threading.RLock()
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
+            self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            with self._lock, self.conn:
+                cursor = self.conn.cursor()
 
                 # Create a table to store documents and embeddings (if it doesn't already exist)
                 cursor.execute('''CREATE TABLE IF NOT EXISTS documents (
@@ -152,95 +389,209 @@ class SqlDb:
                                     doc_id TEXT,
                                     question TEXT NOT NULL,
                                     answer TEXT NOT NULL,
+                                    source TEXT,
                                     FOREIGN KEY (doc_id) REFERENCES documents(doc_title)
                                 )''')
-                conn.commit()
+                # Create a table recording the size, mtime and content hash of each ingested file per namespace
+                cursor.execute('''CREATE TABLE IF NOT EXISTS corpus_manifest (
+                                    path TEXT NOT NULL,
+                                    namespace TEXT NOT NULL,
+                                    size INTEGER NOT NULL,
+                                    mtime REAL NOT NULL,
+                                    content_hash TEXT NOT NULL,
+                                    PRIMARY KEY (path, namespace)
+                                )''')
+
+                # qa_pairs created before the source column existed get it backfilled from the legacy chunk ids
+                columns = [row[1] for row in cursor.execute('PRAGMA table_info(qa_pairs)')]
+                if 'source' not in columns:
+                    cursor.execute('ALTER TABLE qa_pairs ADD COLUMN source TEXT')
+                    cursor.execute("""UPDATE qa_pairs SET source = substr(doc_id, 7, instr(doc_id, ' page:') - 7)
+                                      WHERE source IS NULL AND doc_id LIKE 'doc: /% page:%'""")
+
+                # Indexes for the lookups below
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_qa_pairs_doc_id ON qa_pairs (doc_id)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_qa_pairs_source ON qa_pairs (source)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_documents_embedding_name ON documents (embedding_name)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_corpus_manifest_namespace ON corpus_manifest (namespace)')
             print("Successfully instantiated SQL db")
         except Exception as e:
             print(f"Error in SqlDb.__init__: {e}")
 
+    @staticmethod
+    def _to_test_case(doc_id: str, question: str, answer: str, source: Optional[str]) -> TestCase:
+        return TestCase({
+            "QA": Question(question=question, answer=answer),
+            "doc_id": doc_id,
+            "source": source,
+        })
+
+    def close(self) -> None:
+        with self._lock:
+            self.conn.close()
+
+    @traced("sql.insert_document_and_embedding")
     def insert_document_and_embedding(self, name: str, embedding: str) -> None:
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
-                cursor.execute('INSERT INTO documents (doc_title, embedding_name) VALUES (?, ?)', (name, embedding))
-                conn.commit()
-        except sqlite3.IntegrityError as i:
-            print(f"sqlite3.IntegrityError in SqlDb.insert_document_and_embedding {e}")
+            with self._lock, self.conn:
+                # re-ingesting a modified file, or a second backend for the same model, records the same pair again
+                self.conn.execute('INSERT OR IGNORE INTO documents (doc_title, embedding_name) VALUES (?, ?)', (name, embedding))
         except Exception as e:
             print(f"Error in SqlDb.insert_document_and_embedding: {e}")
 
+    @traced("sql.insert_question")
     def insert_question(self, test_case: TestCase) -> None:
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
-                doc_id = test_case.doc_id
-                question = test_case.question
-                answer = test_case.answer
-                cursor.execute(
-                    'INSERT INTO qa_pairs (doc_id, question, answer) VALUES (?, ?, ?)', 
-                    (doc_id, question, answer)
-                )
-                conn.commit()
-            print(f"Successfully inserted question-answer pair for document ID {doc_id}.")
+            self.insert_questions([test_case])
+            print(f"Successfully inserted question-answer pair for document ID {test_case.doc_id}.")
         except Exception as e:
             print(f"Error in SqlDb.insert_question: {e}")
 
+    @traced("sql.insert_questions")
+    def insert_questions(self, test_cases: List[TestCase]) -> None:
+        """
+        Inserts many question-answer pairs in a single transaction.
+        """
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany(
+                    'INSERT INTO qa_pairs (doc_id, question, answer, source) VALUES (?, ?, ?, ?)', 
+                    [(test_case.doc_id, test_case.question, test_case.answer, test_case.source) for test_case in test_cases]
+                )
+        except Exception as e:
+            print(f"Error in SqlDb.insert_questions: {e}")
+
+    @traced("sql.document_with_embedding_exists")
     def document_with_embedding_exists(self, doc_id: str, embedding: str) -> bool:
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT 1 FROM documents WHERE doc_title = ? AND embedding_name = ?', (doc_id, embedding))
-                conn.commit()
-            return bool(cursor.fetchone())
+            with self._lock:
+                cursor = self.conn.execute('SELECT 1 FROM documents WHERE doc_title = ? AND embedding_name = ?', (doc_id, embedding))
+                return bool(cursor.fetchone())
         except Exception as e:
             print(f"Error in SqlDb.document_with_embedding_exists: {e}")
             return False
 
+    @traced("sql.get_question_by_doc_id")
     def get_question_by_doc_id(self, doc_id: str) -> TestCase:
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT question, answer FROM qa_pairs WHERE doc_id = ?', (doc_id,))
-                row = cursor.fetchone()
-                if row:
-                    test_case = {
-                        "QA": Question(question=row[0], answer=row[1]),
-                        "doc_id": doc_id
-                    }
-                    return TestCase(test_case)
-                else:
-                    raise ValueError(f"No question found for doc_id: {doc_id}")
+            test_case = self.get_questions_by_doc_ids([doc_id]).get(doc_id)
+            if test_case is None:
+                raise ValueError(f"No question found for doc_id: {doc_id}")
+            return test_case
         except Exception as e:
             print(f"Error in SqlDb.get_question_by_doc_id: {e}")
             return None
 
+    @traced("sql.get_questions_by_doc_ids")
+    def get_questions_by_doc_ids(self, doc_ids: List[str]) -> Dict[str, TestCase]:
+        """
+        Fetches the question for each of many doc_ids, returning a dict keyed by doc_id for those that have one.
+        """
+        try:
+            test_cases = {}
+            unique_doc_ids = list(dict.fromkeys(doc_ids))
+            with self._lock:
+                for start in range(0, len(unique_doc_ids), SQL_BATCH_SIZE):
+                    batch = unique_doc_ids[start:start + SQL_BATCH_SIZE]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self.conn.execute(
+                        f'SELECT doc_id, question, answer, source FROM qa_pairs WHERE doc_id IN ({placeholders}) ORDER BY id',
+                        batch
+                    ).fetchall()
+                    for row in rows:
+                        # keep the first question generated for a document, as get_question_by_doc_id always has
+                        test_cases.setdefault(row[0], self._to_test_case(*row))
+            return test_cases
+        except Exception as e:
+            print(f"Error in SqlDb.get_questions_by_doc_ids: {e}")
+            return {}
+
+    @traced("sql.get_all_qa_pairs")
+    def get_all_qa_pairs(self, embedding: str) -> List[TestCase]:
+        """
+        Fetches every question-answer pair whose source document has been ingested with the given embedding, in one query.
+        """
+        try:
+            with self._lock:
+                rows = self.conn.execute(
+                    '''SELECT q.doc_id, q.question, q.answer, q.source FROM qa_pairs q
+                       JOIN documents d ON d.doc_title = q.source
+                       WHERE d.embedding_name = ?
+                       ORDER BY q.id''',
+                    (embedding,)
+                ).fetchall()
+            return [self._to_test_case(*row) for row in rows]
+        except Exception as e:
+            print(f"Error in SqlDb.get_all_qa_pairs: {e}")
+            return []
+
+    @traced("sql.doc_id_has_question")
     def doc_id_has_question(self, doc_id: str) -> bool:
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT 1 FROM qa_pairs WHERE doc_id = ? LIMIT 1', (doc_id,))
-                result = cursor.fetchone()
-                return result is not None
+            with self._lock:
+                cursor = self.conn.execute('SELECT 1 FROM qa_pairs WHERE doc_id = ? LIMIT 1', (doc_id,))
+                return cursor.fetchone() is not None
         except Exception as e:
             print(f"Error in SqlDb.doc_id_has_question: {e}")
             return False
 
+    @traced("sql.get_all_entries")
     def get_all_entries(self, embedding: str) -> list:
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
-                cursor.execute('SELECT doc_title FROM documents WHERE embedding_name = ?', (embedding,))
+            with self._lock:
+                cursor = self.conn.execute('SELECT doc_title FROM documents WHERE embedding_name = ?', (embedding,))
                 return [row[0] for row in cursor.fetchall()]
         except Exception as e:
             print(f"Error in SqlDb.get_all_entries: {e}")
             return []
 
+    @traced("sql.delete_entry")
     def delete_entry(self, doc_id: str, embedding: str) -> None:
         try:
-            with sqlite3.connect('db/knowledge_files_tracker2.db') as conn:
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM documents WHERE doc_title = ? AND embedding_name = ?', (doc_id, embedding))
-                conn.commit()
+            with self._lock, self.conn:
+                self.conn.execute('DELETE FROM documents WHERE doc_title = ? AND embedding_name = ?', (doc_id, embedding))
         except Exception as e:
             print(f"Error in SqlDb.delete_entry: {e}")
+
+    @traced("sql.remap_doc_ids")
+    def remap_doc_ids(self, mapping: Dict[str, str]) -> None:
+        """
+        Moves QA pairs from old chunk ids to new ones, e.g. when a chunk's id changes but its text does not.
+        """
+        if not mapping:
+            return
+        try:
+            with self._lock, self.conn:
+                self.conn.executemany('UPDATE qa_pairs SET doc_id = ? WHERE doc_id = ?', [(new, old) for old, new in mapping.items()])
+            print(f"Moved QA pairs of {len(mapping)} chunks to their new ids")
+        except Exception as e:
+            print(f"Error in SqlDb.remap_doc_ids: {e}")
+
+    @traced("sql.get_manifest")
+    def get_manifest(self, namespace: str) -> Dict[str, Tuple[int, float, str]]:
+        try:
+            with self._lock:
+                cursor = self.conn.execute('SELECT path, size, mtime, content_hash FROM corpus_manifest WHERE namespace = ?', (namespace,))
+                return {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+        except Exception as e:
+            print(f"Error in SqlDb.get_manifest: {e}")
+            return {}
+
+    @traced("sql.upsert_manifest_entry")
+    def upsert_manifest_entry(self, path: str, namespace: str, size: int, mtime: float, content_hash: str) -> None:
+        try:
+            with self._lock, self.conn:
+                self.conn.execute(
+                    'INSERT OR REPLACE INTO corpus_manifest (path, namespace, size, mtime, content_hash) VALUES (?, ?, ?, ?, ?)',
+                    (path, namespace, size, mtime, content_hash)
+                )
+        except Exception as e:
+            print(f"Error in SqlDb.upsert_manifest_entry: {e}")
+
+    @traced("sql.delete_manifest_entry")
+    def delete_manifest_entry(self, path: str, namespace: str) -> None:
+        try:
+            with self._lock, self.conn:
+                self.conn.execute('DELETE FROM corpus_manifest WHERE path = ? AND namespace = ?', (path, namespace))
+        except Exception as e:
+            print(f"Error in SqlDb.delete_manifest_entry: {e}")
@@ -0,0 +1,44 @@
+import pytest
+from src.fakes import FakeEmbeddings
+from src.vectorstore import SqlDb, VectorStoreManager
+
+class FlakyEmbeddings(FakeEmbeddings):
+    """
+    Fake embeddings that raise like an unavailable provider while failing is set.
+    """
+    def __init__(self, dim: int = 16) -> None:
+        super().__init__(dim=dim)
+        self.failing = False
+
+    def embed_documents(self, texts):
+        if self.failing:
+            raise RuntimeError("provider unavailable")
+        return super().embed_documents(texts)
+
+@pytest.fixture
+def flaky_embeddings():
+    return FlakyEmbeddings(dim=16)
+
+@pytest.fixture
+def manager_factory(tmp_path):
+    """
+    Returns (make, data_dir, sql), where make builds managers (numpy-backed unless told otherwise) that keep everything under tmp_path.
+    """
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    sql = SqlDb(str(tmp_path / "tracker.db"))
+
+    def make(embedding_function=None, backend="numpy", **kwargs):
+        if backend == "chroma" and "client" not in kwargs:
+            import chromadb
+            kwargs["client"] = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+        kwargs.setdefault("store_dir", str(tmp_path / "store"))
+        kwargs.setdefault("page_cache_dir", str(tmp_path / "page_cache"))
+        return VectorStoreManager(
+            embedding_function=embedding_function or FakeEmbeddings(dim=16),
+            sql_document_tracker=sql,
+            backend=backend,
+            data_dir=str(data_dir),
+            **kwargs,
+        )
+    return make, data_dir, sql
@@ -0,0 +1,77 @@
+import os
+from langchain_core.documents import Document
+from src.benchmark import write_pdf
+
+def chunks(texts, page=0, source="data/a.pdf"):
+    return [Document(page_content=text, metadata={"source": source, "page": page}) for text in texts]
+
+def ids_of(manager, documents):
+    return [chunk.metadata["id"] for chunk in manager.calculate_chunk_ids(documents)]
+
+def test_ids_depend_on_text_not_position(manager_factory):
+    manager = manager_factory[0]()
+    before = ids_of(manager, chunks(["first", "second", "third"]))
+    # a chunk inserted in front shifts every position but must not change the other ids
+    after = ids_of(manager, chunks(["new", "first", "second", "third"]))
+    assert after[1:] == before
+    assert after[0] not in before
+
+def test_ids_differ_by_source_and_page(manager_factory):
+    manager = manager_factory[0]()
+    base = ids_of(manager, chunks(["same text"]))
+    assert ids_of(manager, chunks(["same text"], page=1)) != base
+    assert ids_of(manager, chunks(["same text"], source="data/b.pdf")) != base
+    assert ids_of(manager, chunks(["same text"])) == base
+
+def test_repeated_text_on_a_page_gets_distinct_ids(manager_factory):
+    manager = manager_factory[0]()
+    ids = ids_of(manager, chunks(["repeat", "repeat", "other", "repeat"]))
+    assert len(set(ids)) == 4
+
+def test_position_id_keeps_the_old_format(manager_factory):
+    manager = manager_factory[0]()
+    documents = manager.calculate_chunk_ids(chunks(["a", "b"], page=6, source="data/POL011BA.pdf"))
+    assert [chunk.metadata["position_id"] for chunk in documents] == ["doc: /POL011BA.pdf page:6:0", "doc: /POL011BA.pdf page:6:1"]
+
+def test_reingesting_an_edited_file_only_embeds_changed_chunks(manager_factory):
+    make, data_dir, _sql = manager_factory
+    pages = [[f"page {page} line {line} alpha beta gamma" for line in range(5)] for page in range(4)]
+    path = os.path.join(data_dir, "doc.pdf")
+    write_pdf(path, pages)
+
+    manager = make()
+    first = manager.ingest_data()
+    original_ids = set(manager.vector_store.ids)
+    assert first.embeddings == len(original_ids) > 0
+
+    pages[2] = ["this page was rewritten entirely"]
+    write_pdf(path, pages)
+    # a newer mtime so the manifest sees the edit even on coarse filesystem clocks
+    os.utime(path, (os.path.getmtime(path) + 10, os.path.getmtime(path) + 10))
+    second = manager.ingest_data()
+
+    current_ids = set(manager.vector_store.ids)
+    assert second.embeddings == len(current_ids - original_ids) == 1
+    assert second.pruned == len(original_ids - current_ids) >= 1
+    pages_left = {metadata["page"] for metadata in manager.vector_store.metadatas}
+    assert pages_left == {0, 1, 2, 3}
+
+def test_failed_embedding_keeps_the_old_chunks(manager_factory, flaky_embeddings):
+    make, data_dir, _sql = manager_factory
+    pages = [[f"page {page} line {line} alpha beta gamma" for line in range(5)] for page in range(3)]
+    path = os.path.join(data_dir, "doc.pdf")
+    write_pdf(path, pages)
+    manager = make(flaky_embeddings)
+    manager.ingest_data()
+    original_ids = set(manager.vector_store.ids)
+
+    pages[1] = ["this page was rewritten entirely"]
+    write_pdf(path, pages)
+    os.utime(path, (os.path.getmtime(path) + 10, os.path.getmtime(path) + 10))
+    flaky_embeddings.failing = True
+    stats = manager.ingest_data()
+
+    # the new chunk never reached the store, so the chunks it replaces must stay
+    assert stats.failed_paths == {path}
+    assert stats.embeddings == stats.pruned == 0
+    assert set(manager.vector_store.ids) == original_ids
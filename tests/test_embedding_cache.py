@@ -0,0 +1,77 @@
+import itertools
+import numpy as np
+import pytest
+from src import embedding_cache
+from src.embedding_cache import CachedEmbeddings
+from src.fakes import FakeEmbeddings
+
+class CountingEmbeddings(FakeEmbeddings):
+    def __init__(self, dim: int = 16) -> None:
+        super().__init__(dim=dim)
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+@pytest.fixture(autouse=True)
+def ticking_clock(monkeypatch):
+    # every lookup and store gets a later timestamp, so least recently used is well defined
+    clock = itertools.count(1.0)
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: next(clock))
+
+def make_cache(tmp_path, max_entries=1_000_000, underlying=None):
+    return CachedEmbeddings(underlying or CountingEmbeddings(), cache_path=str(tmp_path / "embedding_cache.db"), max_entries=max_entries)
+
+def cached_texts(cache):
+    return cache.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+def test_hits_and_misses_count_texts(tmp_path):
+    cache = make_cache(tmp_path)
+    first = cache.embed_documents(["a", "b", "c"])
+    second = cache.embed_documents(["a", "b", "d"])
+    assert (cache.hits, cache.misses) == (2, 4)
+    assert cache.hit_rate == pytest.approx(2 / 6)
+    assert np.allclose(second[:2], first[:2])
+    assert cache.underlying.calls == [["a", "b", "c"], ["d"]]
+
+def test_requests_count_provider_calls_not_texts(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.embed_queries(["a", "b", "c"])
+    cache.embed_queries(["a", "b"])
+    cache.embed_documents(["x", "y"])
+    assert cache.requests == 2
+
+def test_duplicate_texts_are_embedded_once(tmp_path):
+    cache = make_cache(tmp_path)
+    vectors = cache.embed_documents(["a", "a", "b"])
+    assert cache.underlying.calls == [["a", "b"]]
+    assert vectors[0] == vectors[1]
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=3)
+    cache.embed_documents(["a", "b", "c"])
+    cache.embed_documents(["a"])  # a is now more recent than b and c
+    cache.embed_documents(["d"])
+    assert cached_texts(cache) == 3
+    cache.underlying.calls.clear()
+    cache.embed_documents(["a", "c", "d"])
+    assert cache.underlying.calls == []
+    cache.embed_documents(["b"])
+    assert cache.underlying.calls == [["b"]]
+
+def test_cache_survives_a_new_instance(tmp_path):
+    first = make_cache(tmp_path)
+    vectors = first.embed_documents(["a", "b"])
+    first.conn.close()
+    second = make_cache(tmp_path)
+    assert second.num_entries == 2
+    assert np.allclose(second.embed_documents(["a", "b"]), vectors)
+    assert second.underlying.calls == []
+
+def test_models_do_not_share_entries(tmp_path):
+    small = make_cache(tmp_path, underlying=CountingEmbeddings(dim=8))
+    small.embed_documents(["a"])
+    large = make_cache(tmp_path, underlying=CountingEmbeddings(dim=16))
+    assert len(large.embed_documents(["a"])[0]) == 16
+    assert large.misses == 1
@@ -0,0 +1,51 @@
+import numpy as np
+from src.hnsw_sweep import HnswSweep, exact_scores, pareto_frontier
+from src.schemas.question import Question
+from src.schemas.test_case import TestCase as Case
+
+def row(name, latency, overlap):
+    return {"name": name, "latency_p50_ms": latency, "overlap": overlap}
+
+def test_pareto_frontier_keeps_only_unbeaten_rows():
+    rows = [row("fast", 0.1, 0.6), row("slow worse", 0.5, 0.5), row("balanced", 0.3, 0.8), row("exact", 0.9, 1.0), row("slower same", 1.2, 1.0)]
+    assert [r["name"] for r in pareto_frontier(rows)] == ["fast", "balanced", "exact"]
+
+def test_pareto_frontier_breaks_latency_ties_on_overlap():
+    rows = [row("worse", 0.2, 0.7), row("better", 0.2, 0.9)]
+    assert [r["name"] for r in pareto_frontier(rows)] == ["better"]
+    assert pareto_frontier([]) == []
+
+def test_exact_scores_rank_like_each_distance():
+    vectors = np.array([[1.0, 0.0], [3.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+    query = np.array([[2.6, 0.1]], dtype=np.float32)
+    assert np.argmax(exact_scores(vectors, query, "l2")) == 1
+    assert np.argmax(exact_scores(vectors, query, "ip")) == 1
+    # cosine ignores length, so the two vectors on the x axis tie
+    scores = exact_scores(vectors, query, "cosine")[0]
+    assert np.isclose(scores[0], scores[1]) and scores[0] > scores[2]
+
+def test_sweep_builds_once_and_varies_search_ef(manager_factory):
+    make, _data_dir, _sql = manager_factory
+    manager = make()
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+    ids = [f"id-{i}" for i in range(len(vectors))]
+    manager.vector_store.add_embeddings(ids, [f"text {i}" for i in ids], [{"page": 0} for _ in ids], vectors.tolist())
+    test_cases = [Case({"doc_id": ids[i], "QA": Question(question=f"question number {i} about topic {i % 7}", answer="True")}) for i in range(40)]
+
+    grid = {"space": ["cosine"], "construction_ef": [16], "M": [4], "search_ef": [1, 400]}
+    sweep = HnswSweep(manager, grid=grid, k=10)
+    rows = sweep.run(test_cases)
+
+    assert len(sweep.builds) == 1 and [r["search_ef"] for r in rows] == [1, 400]
+    assert sweep.builds[0]["index_bytes"] > vectors.nbytes
+    assert rows[0]["index_bytes"] == rows[1]["index_bytes"] == sweep.builds[0]["index_bytes"]
+    # a wide search on the same build finds more of the exact top-k than a greedy one
+    assert rows[1]["overlap"] > rows[0]["overlap"]
+    assert rows[1]["overlap"] > 0.9
+    assert "Index (MB)" in sweep.report(rows)
+
+def test_sweep_with_no_test_cases(manager_factory):
+    manager = manager_factory[0]()
+    manager.vector_store.add_embeddings(["a"], ["text"], [{}], [[1.0] * 16])
+    assert HnswSweep(manager).run([]) == []
@@ -0,0 +1,107 @@
+import os
+from src.benchmark import write_pdf
+from src.ingestion import IngestionPipeline
+from src.manifest import hash_file
+from src.page_cache import PageTextCache, extract_pages
+
+class RecordingPageCache(PageTextCache):
+    def __init__(self, cache_dir, events) -> None:
+        super().__init__(cache_dir)
+        self.events = events
+
+    def put(self, content_hash, pages):
+        self.events.append(("cache", len(pages)))
+        super().put(content_hash, pages)
+
+def write_corpus(data_dir, page_counts):
+    paths = []
+    for name, num_pages in page_counts.items():
+        path = os.path.join(data_dir, name)
+        write_pdf(path, [[f"{name} page {page} line {line} alpha beta" for line in range(3)] for page in range(num_pages)])
+        paths.append(path)
+    return paths
+
+def record_stores(manager, events, monkeypatch):
+    add_to_chroma = manager.add_to_chroma
+    def recording_add(chunks, calculate_ids=True):
+        events.append(("store", len(chunks)))
+        return add_to_chroma(chunks, calculate_ids)
+    monkeypatch.setattr(manager, "add_to_chroma", recording_add)
+
+def test_page_texts_are_cached_as_each_file_finishes(manager_factory, tmp_path, monkeypatch):
+    make, data_dir, _sql = manager_factory
+    manager = make()
+    paths = write_corpus(data_dir, {"a.pdf": 5, "b.pdf": 3})
+    events = []
+    record_stores(manager, events, monkeypatch)
+    page_cache = RecordingPageCache(str(tmp_path / "page_cache"), events)
+
+    IngestionPipeline([manager], max_workers=1, batch_size=1, pages_per_task=2, page_cache=page_cache).ingest({path: [manager] for path in paths})
+
+    assert [event for event in events if event[0] == "cache"] == [("cache", 5), ("cache", 3)]
+    # the first file is cached while the second is still being stored, not held until the run is over
+    last_store = max(i for i, event in enumerate(events) if event[0] == "store")
+    assert events.index(("cache", 5)) < last_store
+    # pages come back range by range and are put together in page order
+    assert page_cache.get(hash_file(paths[0])) == extract_pages(paths[0])
+
+    again = IngestionPipeline([manager], max_workers=1, pages_per_task=2, page_cache=page_cache).ingest({path: [manager] for path in paths})
+    assert again.pages == again.cached_pages == 8
+    assert again.embeddings == 0
+
+def test_chunks_are_stored_in_full_batches(manager_factory, monkeypatch):
+    make, data_dir, _sql = manager_factory
+    manager = make()
+    paths = write_corpus(data_dir, {"a.pdf": 6, "b.pdf": 5})
+    events = []
+    record_stores(manager, events, monkeypatch)
+
+    stats = IngestionPipeline([manager], max_workers=2, batch_size=4, pages_per_task=2).ingest({path: [manager] for path in paths})
+
+    sizes = [size for _kind, size in events]
+    assert sum(sizes) == stats.chunks == stats.embeddings == manager.count() > 8
+    # only what is left over at the end goes in a smaller batch
+    assert all(size == 4 for size in sizes[:-1]) and 0 < sizes[-1] <= 4
+    assert stats.pages == 11 and not stats.failed_paths
+
+def test_pages_are_parsed_once_for_several_stores(manager_factory, tmp_path):
+    make, data_dir, _sql = manager_factory
+    first = make()
+    second = make(store_dir=str(tmp_path / "second"))
+    paths = write_corpus(data_dir, {"a.pdf": 3, "b.pdf": 2})
+
+    stats = IngestionPipeline([first, second], max_workers=2, batch_size=3).ingest({paths[0]: [first, second], paths[1]: [second]})
+
+    assert stats.pages == 5
+    assert stats.embeddings == first.count() + second.count()
+    assert {metadata["source"] for metadata in first.vector_store.metadatas} == {paths[0]}
+    assert {metadata["source"] for metadata in second.vector_store.metadatas} == set(paths)
+
+def test_unreadable_file_is_failed_and_keeps_its_chunks(manager_factory):
+    make, data_dir, _sql = manager_factory
+    manager = make()
+    good, bad = write_corpus(data_dir, {"good.pdf": 2, "bad.pdf": 2})
+    IngestionPipeline([manager], max_workers=1).ingest({good: [manager], bad: [manager]})
+    stored = manager.count()
+
+    with open(bad, "wb") as f:
+        f.write(b"not a pdf")
+    stats = IngestionPipeline([manager], max_workers=1).ingest({good: [manager], bad: [manager]})
+
+    assert stats.failed_paths == {bad}
+    assert stats.pruned == 0 and manager.count() == stored
+
+def test_failed_embedding_batch_fails_only_its_files(manager_factory, flaky_embeddings, tmp_path):
+    make, data_dir, _sql = manager_factory
+    healthy = make()
+    flaky = make(flaky_embeddings, store_dir=str(tmp_path / "flaky"))
+    a, b = write_corpus(data_dir, {"a.pdf": 2, "b.pdf": 2})
+    flaky_embeddings.failing = True
+
+    stats = IngestionPipeline([healthy, flaky], max_workers=1, batch_size=1000).ingest({a: [healthy], b: [healthy, flaky]})
+
+    # b's batch for the flaky store never landed, so b is not ingested even though the healthy store has it
+    assert stats.failed_paths == {b}
+    assert flaky.count() == 0
+    assert {metadata["source"] for metadata in healthy.vector_store.metadatas} == {a, b}
+    assert stats.embeddings == healthy.count()
@@ -0,0 +1,96 @@
+import pytest
+from langchain_core.prompts import ChatPromptTemplate
+from src import llm_cache
+from src.fakes import FakeChatModel
+from src.llm_cache import LLMResponseCache
+from src.schemas.question import Question
+
+TEMPLATE = ChatPromptTemplate.from_template("Answer using this context: {context}\nQuestion: {question}")
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        self.now += 1
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache.time, "time", clock)
+    return clock
+
+def make_cache(tmp_path, **kwargs):
+    return LLMResponseCache(cache_path=str(tmp_path / "llm_cache.db"), **kwargs)
+
+def test_key_is_stable_and_covers_every_input():
+    llm = FakeChatModel()
+    inputs = {"context": "some text", "question": "why?"}
+    key = LLMResponseCache.make_key(llm, TEMPLATE, inputs)
+    assert key == LLMResponseCache.make_key(FakeChatModel(), TEMPLATE, dict(reversed(list(inputs.items()))))
+    # latency is not an identifying param, so it shares entries
+    assert key == LLMResponseCache.make_key(FakeChatModel(latency=0.5), TEMPLATE, inputs)
+    others = {
+        LLMResponseCache.make_key(FakeChatModel(answer_length=50), TEMPLATE, inputs),
+        LLMResponseCache.make_key(llm, ChatPromptTemplate.from_template("{context} {question}"), inputs),
+        LLMResponseCache.make_key(llm, TEMPLATE, {**inputs, "question": "how?"}),
+        LLMResponseCache.make_key(llm, TEMPLATE, inputs, schema=Question),
+    }
+    assert key not in others
+    assert len(others) == 4
+
+def test_round_trip_and_counts(tmp_path, clock):
+    cache = make_cache(tmp_path)
+    cache.put_many({"a": "answer a", "b": {"question": "q", "answer": "True"}})
+    assert cache.get_many(["a", "b", "c"]) == {"a": "answer a", "b": {"question": "q", "answer": "True"}}
+    assert (cache.hits, cache.misses) == (2, 1)
+    assert cache.get("c") is None
+    assert cache.hit_rate == pytest.approx(2 / 4)
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=100)
+    cache.put("a", "answer")
+    clock.now += 50
+    assert cache.get("a") == "answer"
+    # the read above refreshed last_used, but expiry counts from when it was stored
+    clock.now += 100
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_no_ttl_keeps_entries(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=None)
+    cache.put("a", "answer")
+    clock.now += 10 ** 9
+    assert cache.get("a") == "answer"
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")  # b is now the least recently used
+    cache.put("c", 3)
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+    assert cache.num_entries == 2
+
+def test_expired_entries_are_dropped_before_live_ones(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=100, max_entries=2)
+    cache.put("old", 1)
+    clock.now += 200
+    cache.put("a", 2)
+    cache.put("b", 3)
+    assert cache.get_many(["a", "b"]) == {"a": 2, "b": 3}
+    assert cache.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 2
+
+def test_disabled_cache_always_misses(tmp_path, clock):
+    cache = make_cache(tmp_path, enabled=False)
+    cache.put("a", "answer")
+    assert cache.get_many(["a", "a"]) == {}
+    assert (cache.hits, cache.misses) == (0, 2)
+    assert cache.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+def test_environment_switch(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLM_CACHE", "off")
+    assert not make_cache(tmp_path).enabled
+    monkeypatch.setenv("LLM_CACHE", "on")
+    assert make_cache(tmp_path).enabled
@@ -0,0 +1,94 @@
+import os
+from src.benchmark import write_pdf
+from src.manifest import CorpusManifest
+
+class ManifestTable:
+    """
+    In-memory stand-in for SqlDb's corpus_manifest table, which lives in the shared tracker db.
+    """
+    def __init__(self) -> None:
+        self.rows = {}
+
+    def get_manifest(self, namespace):
+        return {path: entry for (path, row_namespace), entry in self.rows.items() if row_namespace == namespace}
+
+    def upsert_manifest_entry(self, path, namespace, size, mtime, content_hash):
+        self.rows[(path, namespace)] = (size, mtime, content_hash)
+
+    def delete_manifest_entry(self, path, namespace):
+        self.rows.pop((path, namespace), None)
+
+def write(path, content: bytes, mtime: float) -> None:
+    with open(path, "wb") as f:
+        f.write(content)
+    os.utime(path, (mtime, mtime))
+
+def record_all(manifest, diff):
+    for path, entry in diff.entries.items():
+        manifest.record(path, entry)
+    for path in diff.deleted:
+        manifest.forget(path)
+
+def test_diff_reports_added_modified_touched_and_deleted(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    manifest = CorpusManifest(ManifestTable(), "ns", data_dir=str(data_dir))
+    paths = {name: os.path.join(data_dir, f"{name}.pdf") for name in ("kept", "edited", "touched", "removed")}
+    for name, path in paths.items():
+        write(path, name.encode(), 1000.0)
+    write(os.path.join(data_dir, "notes.txt"), b"ignored", 1000.0)
+
+    diff = manifest.diff()
+    assert sorted(diff.added) == sorted(paths.values())
+    assert diff.has_changes
+    record_all(manifest, diff)
+
+    # nothing changed on disk, so nothing is re-hashed or reported
+    diff = manifest.diff()
+    assert not diff.has_changes and not diff.touched and not diff.entries
+
+    write(paths["edited"], b"edited with new content", 2000.0)
+    write(paths["touched"], b"touched", 2000.0)
+    os.remove(paths["removed"])
+    write(os.path.join(data_dir, "new.pdf"), b"new", 2000.0)
+
+    diff = manifest.diff()
+    assert diff.added == [os.path.join(data_dir, "new.pdf")]
+    assert diff.modified == [paths["edited"]]
+    assert diff.touched == [paths["touched"]]
+    assert diff.deleted == [paths["removed"]]
+    assert str(diff) == "1 added, 1 modified, 1 deleted"
+    record_all(manifest, diff)
+    assert not manifest.diff().has_changes
+
+def test_namespaces_are_tracked_separately(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    sql = ManifestTable()
+    write(os.path.join(data_dir, "a.pdf"), b"a", 1000.0)
+    first = CorpusManifest(sql, "model-a", data_dir=str(data_dir))
+    record_all(first, first.diff())
+
+    assert not first.diff().has_changes
+    assert CorpusManifest(sql, "model-b", data_dir=str(data_dir)).diff().added == [os.path.join(data_dir, "a.pdf")]
+
+def test_file_whose_embedding_failed_is_retried(manager_factory, flaky_embeddings):
+    make, data_dir, _sql = manager_factory
+    path = os.path.join(data_dir, "doc.pdf")
+    write_pdf(path, [[f"page {page} alpha beta gamma"] for page in range(3)])
+    manager = make(flaky_embeddings)
+
+    flaky_embeddings.failing = True
+    assert manager.ingest_data().failed_paths == {path}
+    assert manager.manifest.diff().added == [path]
+
+    flaky_embeddings.failing = False
+    stats = manager.ingest_data()
+    assert not stats.failed_paths and stats.embeddings == 3
+    assert not manager.manifest.diff().has_changes
+
+    write_pdf(path, [[f"page {page} alpha beta gamma edited"] for page in range(3)])
+    os.utime(path, (os.path.getmtime(path) + 10, os.path.getmtime(path) + 10))
+    flaky_embeddings.failing = True
+    manager.ingest_data()
+    assert manager.manifest.diff().modified == [path]
@@ -0,0 +1,54 @@
+import math
+import numpy as np
+import pytest
+from src.metrics import RetrievalMetrics, mean_interval, parse_ks, wilson_interval
+
+def test_wilson_interval_known_values():
+    # 8 of 10 and 0 of 20, checked against published Wilson score intervals
+    low, high = wilson_interval(np.array([8, 0]), 10)
+    assert low[0] == pytest.approx(0.4902, abs=1e-4)
+    assert high[0] == pytest.approx(0.9433, abs=1e-4)
+    low, high = wilson_interval(np.array([0]), 20)
+    assert low[0] == pytest.approx(0.0, abs=1e-12)
+    assert high[0] == pytest.approx(0.1611, abs=1e-4)
+
+def test_wilson_interval_contains_the_estimate_and_narrows_with_n():
+    for n in (10, 100, 1000):
+        low, high = wilson_interval(np.array([n // 4]), n)
+        assert low[0] <= 0.25 <= high[0]
+    widths = [np.subtract(*wilson_interval(np.array([n // 2]), n)[::-1])[0] for n in (10, 100, 1000)]
+    assert widths == sorted(widths, reverse=True)
+
+def test_wilson_interval_of_no_cases_is_zero():
+    low, high = wilson_interval(np.array([0, 0]), 0)
+    assert low.tolist() == [0.0, 0.0] and high.tolist() == [0.0, 0.0]
+
+def test_mean_interval_edge_cases():
+    assert mean_interval(np.array([])) == (0.0, 0.0, 0.0)
+    assert mean_interval(np.array([0.5])) == (0.5, 0.5, 0.5)
+    mean, low, high = mean_interval(np.array([0.0, 1.0, 1.0, 0.0]))
+    assert mean == 0.5 and 0.0 <= low < 0.5 < high <= 1.0
+
+def test_recall_mrr_and_ndcg_from_ranks():
+    # ranks of the target document, 0 when it was not retrieved
+    metrics = RetrievalMetrics([1, 2, 5, 0], ks=[1, 3, 5])
+    assert metrics.recall.tolist() == [0.25, 0.5, 0.75]
+    assert metrics.mrr == pytest.approx((1 + 1 / 2 + 1 / 5) / 4)
+    assert metrics.ndcg[1][0] == pytest.approx(0.25)
+    assert metrics.ndcg[3][0] == pytest.approx((1 + 1 / math.log2(3)) / 4)
+    assert metrics.ndcg[5][0] == pytest.approx((1 + 1 / math.log2(3) + 1 / math.log2(6)) / 4)
+
+def test_mrr_is_cut_off_at_the_deepest_k():
+    # a search that went deeper than the cutoffs must not count towards MRR
+    metrics = RetrievalMetrics([1, 20], ks=[1, 5])
+    assert metrics.mrr == pytest.approx(0.5)
+    assert metrics.recall.tolist() == [0.5, 0.5]
+
+def test_ks_are_sorted_and_deduplicated():
+    assert RetrievalMetrics([1], ks=[10, 1, 10]).ks == [1, 10]
+    assert parse_ks("20, 1,5,5") == [1, 5, 20]
+
+def test_no_cases():
+    metrics = RetrievalMetrics([], ks=[1, 5])
+    assert metrics.recall.tolist() == [0.0, 0.0]
+    assert metrics.mrr == 0.0
@@ -0,0 +1,81 @@
+import numpy as np
+from src.fakes import FakeEmbeddings
+from src.numpy_store import NumpyVectorStore, top_k
+
+def make_store(tmp_path, namespace="test"):
+    return NumpyVectorStore(namespace, FakeEmbeddings(dim=16), store_dir=str(tmp_path))
+
+def add_texts(store, texts, start=0):
+    ids = [f"id-{start + i}" for i in range(len(texts))]
+    store.add_embeddings(ids, texts, [{"source": "a.pdf", "page": i} for i in range(len(texts))], store.embedding_function.embed_documents(texts))
+    return ids
+
+def test_top_k_returns_best_first():
+    scores = np.array([[0.1, 0.9, 0.5, 0.7], [0.3, 0.2, 0.8, 0.1]])
+    indices, values = top_k(scores, 2)
+    assert indices.tolist() == [[1, 3], [2, 0]]
+    assert np.allclose(values, [[0.9, 0.7], [0.8, 0.3]])
+
+def test_top_k_with_k_past_the_row_length():
+    indices, values = top_k(np.array([[0.2, 0.6]]), 5)
+    assert indices.tolist() == [[1, 0]]
+    assert top_k(np.empty((1, 0)), 3)[0].shape == (1, 0)
+
+def test_search_matches_brute_force(tmp_path):
+    store = make_store(tmp_path)
+    rng = np.random.default_rng(0)
+    # random vectors, so no two documents tie on score
+    matrix = rng.normal(size=(300, 16)).astype(np.float32)
+    ids = [f"id-{i}" for i in range(len(matrix))]
+    store.add_embeddings(ids, [f"text {i}" for i in ids], [{"id": doc_id} for doc_id in ids], matrix.tolist())
+    queries = rng.normal(size=(5, 16)).astype(np.float32)
+
+    results = store.search_by_vectors(queries.tolist(), k=10)
+    normalized = matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+    for query, hits in zip(queries, results):
+        similarities = normalized @ (query / np.linalg.norm(query))
+        expected = np.argsort(-similarities)[:10]
+        assert [doc.metadata["id"] for doc, _score in hits] == [ids[i] for i in expected]
+        # cosine distances, lower is better
+        assert np.allclose([score for _doc, score in hits], 1 - similarities[expected], atol=1e-5)
+
+def test_reopen_keeps_vectors_and_records(tmp_path):
+    store = make_store(tmp_path)
+    ids = add_texts(store, ["alpha beta", "gamma delta", "epsilon zeta"])
+    vectors = np.asarray(store.vectors).copy()
+
+    reopened = make_store(tmp_path)
+    assert reopened.ids == ids
+    assert reopened.dim == 16
+    assert np.allclose(np.asarray(reopened.vectors), vectors)
+    assert reopened.get("id-1")["documents"] == ["gamma delta"]
+
+def test_delete_compacts_and_persists(tmp_path):
+    store = make_store(tmp_path)
+    add_texts(store, ["alpha beta", "gamma delta", "epsilon zeta", "eta theta"])
+    store.delete(ids=["id-1"])
+    store.delete(where={"page": 3})
+    assert store.ids == ["id-0", "id-2"]
+
+    reopened = make_store(tmp_path)
+    assert reopened.ids == ["id-0", "id-2"]
+    assert reopened.search_by_vectors(reopened.embedding_function.embed_documents(["epsilon zeta"]), k=1)[0][0][0].page_content == "epsilon zeta"
+
+def test_interrupted_write_is_truncated_on_load(tmp_path):
+    store = make_store(tmp_path)
+    add_texts(store, ["alpha beta", "gamma delta"])
+    # rows appended without the metadata count being updated, as if the process died mid-write
+    with open(store.vectors_path, "ab") as f:
+        f.write(np.ones((1, 16), dtype=np.float32).tobytes())
+    with open(store.records_path, "a") as f:
+        f.write('{"id": "id-9", "document": "partial", "metadata": {}}\n')
+
+    reopened = make_store(tmp_path)
+    assert reopened.ids == ["id-0", "id-1"]
+    assert reopened.vectors.shape == (2, 16)
+
+def test_get_pages_with_offset_and_limit(tmp_path):
+    store = make_store(tmp_path)
+    ids = add_texts(store, [f"text {i}" for i in range(10)])
+    assert store.get(limit=4, offset=3, include=[])["ids"] == ids[3:7]
+    assert store.get(ids=["id-2", "missing"], include=["embeddings"])["embeddings"].shape == (1, 16)
@@ -0,0 +1,109 @@
+import sys
+import asyncio
+import types
+import httpx
+import openai
+import pytest
+from src import rate_limit
+from src.embedding_cache import CachedEmbeddings
+from src.fakes import FakeEmbeddings
+from src.rate_limit import TokenBucket, call_with_retries, provider_for, rate_limit_errors
+
+class FakeClock:
+    """
+    Stands in for time.monotonic and asyncio.sleep, so sleeping advances time instantly and is recorded.
+    """
+    def __init__(self) -> None:
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", types.SimpleNamespace(monotonic=clock.monotonic))
+    monkeypatch.setattr(rate_limit, "asyncio", types.SimpleNamespace(Lock=asyncio.Lock, sleep=clock.sleep))
+    return clock
+
+def rate_limited() -> openai.RateLimitError:
+    response = httpx.Response(429, request=httpx.Request("POST", "https://api.openai.com/v1/embeddings"))
+    return openai.RateLimitError("slow down", response=response, body=None)
+
+def test_bucket_allows_a_burst_then_paces_at_the_rate(clock):
+    async def scenario():
+        # a rate whose intervals are exact in binary, as the fake clock only moves when something sleeps
+        bucket = TokenBucket(rate=8.0, capacity=3)
+        for _ in range(3):
+            await bucket.acquire()
+        assert clock.sleeps == []
+        await bucket.acquire()
+        await bucket.acquire()
+    asyncio.run(scenario())
+    assert clock.sleeps == [0.125, 0.125]
+
+def test_bucket_refills_up_to_its_capacity(clock):
+    async def scenario():
+        bucket = TokenBucket(rate=2.0)
+        await bucket.acquire(2)
+        clock.now += 0.5
+        await bucket.acquire()
+        assert clock.sleeps == []
+        # an hour idle still only banks a burst of capacity
+        clock.now += 3600
+        await bucket.acquire(2)
+        await bucket.acquire()
+    asyncio.run(scenario())
+    assert clock.sleeps == [0.5]
+
+def test_slow_bucket_still_bursts_one_request(clock):
+    # below one request per second the burst is still a whole request
+    assert TokenBucket(rate=0.25).capacity == 1.0
+
+def test_retries_back_off_exponentially(clock):
+    attempts = []
+    async def call():
+        attempts.append(clock.now)
+        if len(attempts) < 3:
+            raise rate_limited()
+        return "ok"
+    assert asyncio.run(call_with_retries(call, TokenBucket(rate=1000.0), base_delay=1.0)) == "ok"
+    assert len(attempts) == 3
+    # base * 2^attempt plus up to base of jitter
+    first, second = clock.sleeps
+    assert 1.0 <= first <= 2.0 and 2.0 <= second <= 3.0
+
+def test_retries_give_up_after_max_retries(clock):
+    attempts = []
+    async def call():
+        attempts.append(1)
+        raise rate_limited()
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(call_with_retries(call, TokenBucket(rate=1000.0), max_retries=2, base_delay=0.5))
+    assert len(attempts) == 3 and len(clock.sleeps) == 2
+
+def test_other_errors_are_not_retried(clock):
+    attempts = []
+    async def call():
+        attempts.append(1)
+        raise ValueError("bad request")
+    with pytest.raises(ValueError):
+        asyncio.run(call_with_retries(call, TokenBucket(rate=1000.0)))
+    assert attempts == [1] and clock.sleeps == []
+
+def test_rate_limit_errors_only_cover_imported_sdks(monkeypatch):
+    monkeypatch.delitem(sys.modules, "cohere", raising=False)
+    assert rate_limit_errors() == (openai.RateLimitError,)
+    monkeypatch.delitem(sys.modules, "openai")
+    assert rate_limit_errors() == ()
+
+def test_provider_is_read_through_the_cache(tmp_path):
+    CohereEmbeddings = type("CohereEmbeddings", (FakeEmbeddings,), {})
+    assert provider_for(FakeEmbeddings(dim=4)) == "openai"
+    assert provider_for(CohereEmbeddings(dim=4)) == "cohere"
+    assert provider_for(CachedEmbeddings(CohereEmbeddings(dim=4), cache_path=str(tmp_path / "cache.db"))) == "cohere"
@@ -0,0 +1,84 @@
+from src.results_store import ResultsStore, split_completed
+from src.schemas.question import Question
+from src.schemas.test_case import TestCase as Case
+from src.schemas.test_result import TestResult as Result
+
+SETTINGS = {"mode": "Batch", "embedding": "OPENAI_LARGE", "backend": "numpy", "experiments": "5", "ks": "1,5", "stratify": True}
+
+def make_cases(n):
+    return [Case({"doc_id": f"doc-{i}", "QA": Question(question=f"question {i}", answer="True")}) for i in range(n)]
+
+def result(test_case, rank=1, error=None):
+    sources = ["other"] * (rank - 1) + [test_case.doc_id] if rank else ["other"]
+    return Result(test_case, sources, embed_time=0.01, search_time=0.02, scores=[0.9] * len(sources), k=5, error=error)
+
+def test_interrupted_run_resumes_with_only_the_missing_cases(tmp_path):
+    path = str(tmp_path / "results.db")
+    cases = make_cases(5)
+    first = ResultsStore(path, commit_batch_size=2)
+    run_id = first.start_run(SETTINGS, cases)
+    for test_case in cases[:3]:
+        first.record(run_id, result(test_case, rank=2))
+    # the process dies here: two cases were committed, the third was still buffered
+
+    second = ResultsStore(path)
+    run, group = second.resolve(run_id)
+    assert group == {}
+    assert run["status"] == "running"
+    assert run["settings"] == SETTINGS
+    assert run["doc_ids"] == [test_case.doc_id for test_case in cases]
+
+    completed = second.completed_results(run_id)
+    assert sorted(completed) == ["doc-0", "doc-1"]
+    assert completed["doc-1"].rank == 2 and completed["doc-1"].hit and completed["doc-1"].embed_time == 0.01
+    done, pending = split_completed(cases, {run_id: completed})
+    assert [test_case.doc_id for test_case in done] == ["doc-0", "doc-1"]
+    assert [test_case.doc_id for test_case in pending] == ["doc-2", "doc-3", "doc-4"]
+
+    for test_case in pending:
+        second.record(run_id, result(test_case, error="timeout" if test_case.doc_id == "doc-3" else None))
+    second.finish_run(run_id, status="incomplete")
+
+    # the case that errored was not stored, so the next resume retries it and nothing else
+    third = ResultsStore(path)
+    _done, pending = split_completed(cases, {run_id: third.completed_results(run_id)})
+    assert [test_case.doc_id for test_case in pending] == ["doc-3"]
+    assert third.get_run(run_id)["status"] == "incomplete"
+    [listed] = third.list_runs()
+    assert (listed["planned"], listed["completed"], listed["hits"]) == (5, 4, 4)
+
+def test_recording_a_case_again_replaces_it(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    [test_case] = make_cases(1)
+    run_id = store.start_run(SETTINGS, [test_case])
+    store.record(run_id, result(test_case, rank=None))
+    store.record(run_id, result(test_case, rank=3))
+    assert store.completed_results(run_id)["doc-0"].rank == 3
+
+def test_compare_runs_are_found_by_group_or_member_id(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    cases = make_cases(3)
+    group_id = "20240101-000000-abcdef"
+    run_ids = {name: store.start_run({**SETTINGS, "mode": "Compare", "embedding": name, "group": group_id}, cases, run_id=f"{group_id}-{name}")
+               for name in ("COHERE", "OPENAI_LARGE")}
+    single = store.start_run(SETTINGS, cases)
+
+    for lookup in (group_id, run_ids["COHERE"], run_ids["OPENAI_LARGE"]):
+        run, group = store.resolve(lookup)
+        assert {name: group_run["run_id"] for name, group_run in group.items()} == run_ids
+        assert run["settings"]["group"] == group_id
+
+    assert store.resolve(single)[1] == {}
+    assert store.resolve("no-such-run") == (None, {})
+
+def test_a_compare_case_is_done_once_every_model_has_it(tmp_path):
+    store = ResultsStore(str(tmp_path / "results.db"))
+    cases = make_cases(4)
+    for name, finished in (("COHERE", cases[:3]), ("OPENAI_LARGE", cases[1:])):
+        store.start_run({**SETTINGS, "embedding": name, "group": "g"}, cases, run_id=f"g-{name}")
+        for test_case in finished:
+            store.record(f"g-{name}", result(test_case))
+    completed = {name: store.completed_results(f"g-{name}") for name in ("COHERE", "OPENAI_LARGE")}
+    done, pending = split_completed(cases, completed)
+    assert [test_case.doc_id for test_case in done] == ["doc-1", "doc-2"]
+    assert [test_case.doc_id for test_case in pending] == ["doc-0", "doc-3"]
@@ -0,0 +1,95 @@
+import random
+from collections import Counter
+import pytest
+from langchain_core.documents import Document
+from src import vectorstore
+from src.test_generator import TestQuestionGenerator as Generator, stratified_slots
+
+# chunks per page of each source
+CORPUS = {"data/a.pdf": {0: 3, 1: 3, 2: 3, 3: 3}, "data/b.pdf": {0: 5, 1: 5}, "data/c.pdf": {0: 1}}
+NUM_CHUNKS = 23
+
+@pytest.fixture(params=["numpy", "chroma"])
+def manager(request, manager_factory):
+    manager = manager_factory[0](backend=request.param)
+    documents, ids = [], []
+    for source, pages in CORPUS.items():
+        for page, n in pages.items():
+            for i in range(n):
+                documents.append(Document(page_content=f"{source} page {page} chunk {i}", metadata={"source": source, "page": page}))
+                ids.append(f"{source[5]}-{page}-{i}")
+    manager.vector_store.add_documents(documents=documents, ids=ids)
+    return manager
+
+def all_ids(manager):
+    return manager.vector_store.get(include=[])["ids"]
+
+def count_gets(manager, monkeypatch):
+    calls = []
+    get = manager.vector_store.get
+    def counting_get(*args, **kwargs):
+        calls.append(kwargs)
+        return get(*args, **kwargs)
+    monkeypatch.setattr(manager.vector_store, "get", counting_get)
+    return calls
+
+def test_iter_pages_walks_the_collection_in_order(manager):
+    assert manager.count() == NUM_CHUNKS
+    pages = list(manager.iter_pages(page_size=5))
+    assert [len(page["ids"]) for page in pages] == [5, 5, 5, 5, 3]
+    assert [doc_id for page in pages for doc_id in page["ids"]] == all_ids(manager)
+    # a page size that divides the collection exactly ends on the empty page after it
+    assert len(list(manager.iter_pages(page_size=NUM_CHUNKS))) == 1
+    assert list(manager.iter_ids(page_size=4)) == all_ids(manager)
+
+def test_iter_metadatas_pairs_ids_with_their_metadata(manager):
+    pairs = dict(manager.iter_metadatas(page_size=6))
+    assert len(pairs) == NUM_CHUNKS
+    assert pairs["b-1-4"]["source"] == "data/b.pdf" and pairs["b-1-4"]["page"] == 1
+
+def test_ids_at_resolves_offsets_across_page_boundaries(manager, monkeypatch):
+    ids = all_ids(manager)
+    calls = count_gets(manager, monkeypatch)
+    offsets = [22, 0, 3, 4, 7, 8, 3, 40]
+    found = manager.ids_at(offsets, page_size=4)
+    assert found == {offset: ids[offset] for offset in offsets if offset < NUM_CHUNKS}
+    # 0 and 3 share a request, as do 4 and 7, while 8, 22 and the missing 40 each need one
+    assert len(calls) == 5
+
+def test_existing_ids_looks_up_in_batches(manager, monkeypatch):
+    monkeypatch.setattr(vectorstore, "SQL_BATCH_SIZE", 2)
+    calls = count_gets(manager, monkeypatch)
+    wanted = ["a-0-0", "missing", "c-0-0", "a-0-0", "b-1-2", "also-missing"]
+    assert manager.existing_ids(wanted) == {"a-0-0", "c-0-0", "b-1-2"}
+    assert len(calls) == 3
+
+def test_stratified_slots_cover_pages_before_repeating():
+    for seed in range(20):
+        slots = stratified_slots(CORPUS, 9, random.Random(seed))
+        assert len(slots) == 9
+        # sources take turns, so a and b get 4 each once c's only chunk is used
+        assert Counter(source for source, _page in slots) == {"data/a.pdf": 4, "data/b.pdf": 4, "data/c.pdf": 1}
+        for source, pages in CORPUS.items():
+            taken = [page for slot_source, page in slots if slot_source == source]
+            first_round = taken[:len(pages)]
+            assert len(set(first_round)) == len(first_round)
+
+def test_stratified_slots_use_every_chunk_at_most_once():
+    slots = stratified_slots(CORPUS, 100, random.Random(0))
+    assert Counter(slots) == Counter({(source, page): n for source, pages in CORPUS.items() for page, n in pages.items()})
+
+def test_sampled_ids_are_distinct_and_reproducible(manager, manager_factory):
+    generator = Generator(sql=manager_factory[2], vector_store_manager=manager)
+    for stratify in (False, True):
+        ids = generator.sample_doc_ids(12, stratify=stratify, seed=7)
+        assert len(ids) == len(set(ids)) == 12
+        assert set(ids) <= set(all_ids(manager))
+        assert generator.sample_doc_ids(12, stratify=stratify, seed=7) == ids
+    assert sorted(generator.sample_doc_ids(50, seed=1)) == sorted(all_ids(manager))
+
+def test_stratified_sample_spreads_over_sources_and_pages(manager, manager_factory):
+    generator = Generator(sql=manager_factory[2], vector_store_manager=manager)
+    ids = generator.sample_doc_ids(9, stratify=True, seed=3)
+    pages = Counter(tuple(doc_id.split("-")[:2]) for doc_id in ids)
+    # every page of a once, both pages of b twice and c's single chunk
+    assert pages == {("a", "0"): 1, ("a", "1"): 1, ("a", "2"): 1, ("a", "3"): 1, ("b", "0"): 2, ("b", "1"): 2, ("c", "0"): 1}
@@ -0,0 +1,117 @@
+import math
+import pytest
+from src.metrics import mcnemar_p_value
+from src.scheduler import AdaptiveScheduler, UsageMeter
+from src.schemas.question import Question
+from src.schemas.test_case import TestCase as Case
+from src.schemas.test_result import TestResult as Result
+
+def make_cases(n):
+    return [Case({"doc_id": f"doc-{i}", "QA": Question(question=f"question {i}", answer="True")}) for i in range(n)]
+
+def result(test_case, hit):
+    return Result(test_case, [test_case.doc_id] if hit else [], k=5)
+
+class CountingMeter(UsageMeter):
+    """
+    Charges a fixed number of calls per case run, instead of reading cache counters.
+    """
+    def __init__(self, calls_per_case):
+        super().__init__([])
+        self.calls_per_case = calls_per_case
+        self.calls = 0
+
+    def usage(self):
+        return self.calls, 0.0
+
+    def per_case(self):
+        return self.calls_per_case, 0.0
+
+def test_mcnemar_exact_values():
+    assert mcnemar_p_value(0, 0) == 1.0
+    # all 6 discordant cases on one side: 2 * (1/2)^6
+    assert mcnemar_p_value(0, 6) == pytest.approx(2 / 64)
+    assert mcnemar_p_value(6, 0) == mcnemar_p_value(0, 6)
+    # 2 vs 8: 2 * P(X <= 2) for X ~ Binomial(10, 1/2)
+    assert mcnemar_p_value(2, 8) == pytest.approx(2 * (1 + 10 + 45) / 1024)
+    assert mcnemar_p_value(5, 5) == 1.0
+
+def test_alpha_is_split_over_every_possible_round():
+    scheduler = AdaptiveScheduler(lambda batch: {"m": [result(c, True) for c in batch]}, round_size=50, min_cases=10_000, alpha=0.05)
+    scheduler.run(make_cases(420))
+    assert scheduler.alpha_per_round == pytest.approx(0.05 / math.ceil(420 / 50))
+    assert scheduler.stop_reason == "ran every test case"
+    assert [summary["num_cases"] for summary in scheduler.rounds] == [50, 100, 150, 200, 250, 300, 350, 400, 420]
+
+def test_prior_results_count_towards_the_split_and_the_rounds():
+    cases = make_cases(200)
+    prior = {"m": [result(c, True) for c in cases[:100]]}
+    scheduler = AdaptiveScheduler(lambda batch: {"m": [result(c, True) for c in batch]}, round_size=50, min_cases=10_000)
+    results = scheduler.run(cases[100:], prior=prior)
+    assert scheduler.available == 200
+    assert scheduler.alpha_per_round == pytest.approx(0.05 / 4)
+    assert len(results["m"]) == 200
+
+def test_single_model_stops_once_the_interval_is_narrow():
+    scheduler = AdaptiveScheduler(lambda batch: {"m": [result(c, True) for c in batch]}, round_size=50, min_cases=100, target_half_width=0.05)
+    results = scheduler.run(make_cases(1000))
+    # every case hits, so the Wilson half-width drops below 5 points after a couple of rounds
+    assert len(results["m"]) < 1000
+    assert "within +/- 5.0 points" in scheduler.stop_reason
+    assert scheduler.rounds[-1]["models"]["m"]["high"] - scheduler.rounds[-1]["models"]["m"]["low"] <= 0.1
+
+def test_never_stops_before_min_cases():
+    scheduler = AdaptiveScheduler(lambda batch: {"m": [result(c, True) for c in batch]}, round_size=10, min_cases=60, target_half_width=0.5)
+    scheduler.run(make_cases(200))
+    assert scheduler.rounds[-1]["num_cases"] == 60
+
+def test_two_models_stop_once_a_paired_test_separates_them():
+    def run_round(batch):
+        return {"good": [result(c, True) for c in batch], "bad": [result(c, False) for c in batch]}
+    scheduler = AdaptiveScheduler(run_round, round_size=50, min_cases=100, target_half_width=0.0001)
+    scheduler.run(make_cases(2000))
+    assert scheduler.rounds[-1]["num_cases"] == 100
+    assert scheduler.stop_reason.startswith("every pair of models differs")
+    pair = scheduler.rounds[-1]["pairs"][0]
+    assert (pair["only_a"], pair["only_b"]) == (100, 0)
+
+def test_identical_models_are_not_separated():
+    def run_round(batch):
+        hits = [result(c, int(c.doc_id.split("-")[1]) % 2 == 0) for c in batch]
+        return {"a": hits, "b": list(hits)}
+    scheduler = AdaptiveScheduler(run_round, round_size=50, min_cases=100, target_half_width=0.0001)
+    scheduler.run(make_cases(300))
+    assert scheduler.stop_reason == "ran every test case"
+    assert scheduler.rounds[-1]["pairs"][0]["p_value"] == 1.0
+
+def test_first_round_is_trimmed_to_the_call_cap():
+    meter = CountingMeter(calls_per_case=2)
+    def run_round(batch):
+        meter.calls += 2 * len(batch)
+        return {"m": [result(c, True) for c in batch]}
+    scheduler = AdaptiveScheduler(run_round, round_size=50, min_cases=10_000, max_calls=30, meter=meter)
+    scheduler.run(make_cases(500))
+    assert meter.calls <= 30
+    assert [summary["num_cases"] for summary in scheduler.rounds] == [15]
+    assert "cap of 30 API calls" in scheduler.stop_reason
+
+def test_later_rounds_use_the_observed_cost_per_case():
+    meter = CountingMeter(calls_per_case=1 / 50)
+    def run_round(batch):
+        # batched requests: one call per round however many cases it has
+        meter.calls += 1
+        return {"m": [result(c, True) for c in batch]}
+    scheduler = AdaptiveScheduler(run_round, round_size=50, min_cases=10_000, max_calls=4, meter=meter)
+    scheduler.run(make_cases(1000))
+    assert meter.calls == 4
+    assert scheduler.rounds[-1]["num_cases"] == 200
+
+def test_usage_meter_counts_requests_for_calls_and_misses_for_dollars():
+    class Embeddings:
+        model = "text-embedding-3-large"
+        requests = 3
+        misses = 200
+    calls, dollars = UsageMeter([Embeddings()]).usage()
+    assert calls == 3
+    assert dollars == pytest.approx(200 * UsageMeter.embedding_price(Embeddings()))
+    assert UsageMeter([Embeddings(), Embeddings()], queries_per_request=96).per_case()[0] == pytest.approx(2 / 96)
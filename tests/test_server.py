@@ -0,0 +1,101 @@
+import json
+import threading
+import http.client
+import pytest
+from http.server import ThreadingHTTPServer
+from src.benchmark import sample_test_cases, write_pdf
+from src.client import EvaluationClient
+from src.pipeline import Pipeline
+from src.registry import registry
+from src.results_store import ResultsStore
+from src.server import EvaluationHandler, EvaluationService
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    Serves a service backed by a temporary results store on a free port, yielding (client, service, port).
+    """
+    service = EvaluationService(store=ResultsStore(str(tmp_path / "results.db")))
+    handler = type("BoundEvaluationHandler", (EvaluationHandler,), {"service": service})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    port = httpd.server_address[1]
+    yield EvaluationClient(f"http://127.0.0.1:{port}"), service, port
+    httpd.shutdown()
+    httpd.server_close()
+    service.store.flush()
+
+@pytest.fixture
+def warm_numpy_model(manager_factory, monkeypatch):
+    """
+    Puts a fake-embedding pipeline over a small ingested corpus in the registry as OPENAI_SMALL on numpy,
+    with a stored QA pair for a few of its chunks, and returns their test cases.
+    """
+    make, data_dir, sql = manager_factory
+    for name in ("a.pdf", "b.pdf"):
+        write_pdf(str(data_dir / name), [[f"{name} page {page} line {line} alpha beta" for line in range(3)] for page in range(3)])
+    manager = make()
+    manager.ingest_data()
+    test_cases = sample_test_cases(manager, 4, query_words=6)
+    sql.insert_questions(test_cases)
+    monkeypatch.setitem(registry._components, "sql", sql)
+    monkeypatch.setitem(registry._components, "pipeline:numpy:OPENAI_SMALL", Pipeline(model=None, vector_store_manager=manager))
+    return test_cases
+
+def test_health_reports_status(server):
+    client, _service, _port = server
+    health = client.health()
+    assert health["status"] == "ok"
+    assert health["warm"] == []
+
+def test_unknown_paths_are_not_found(server):
+    _client, _service, port = server
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", "/nope")
+    response = connection.getresponse()
+    assert response.status == 404
+    assert "Unknown path" in json.loads(response.read())["error"]
+    connection.close()
+
+def test_invalid_job_json_is_rejected(server):
+    _client, _service, port = server
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("POST", "/jobs", body="{not json", headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    assert response.status == 400
+    assert "Invalid job" in json.loads(response.read())["error"]
+    connection.close()
+
+def test_unknown_embedding_streams_an_error_event(server):
+    client, _service, _port = server
+    events = list(client.submit({"embedding": "WORD2VEC", "num_cases": 1}))
+    assert len(events) == 1
+    assert events[0]["event"] == "error"
+    assert "Unknown embedding: WORD2VEC" in events[0]["message"]
+
+def test_unknown_mode_streams_an_error_event(server):
+    client, _service, _port = server
+    events = list(client.submit({"embedding": "OPENAI_SMALL", "mode": "parallel"}))
+    assert [event["event"] for event in events] == ["error"]
+    assert "Unknown mode: Parallel" in events[0]["message"]
+
+def test_job_streams_started_results_and_summary(server, warm_numpy_model):
+    client, service, _port = server
+    doc_ids = [test_case.doc_id for test_case in warm_numpy_model]
+    events = list(client.submit({"embedding": "OPENAI_SMALL", "backend": "numpy", "mode": "batch", "doc_ids": doc_ids, "ks": [1, 5]}))
+
+    assert [event["event"] for event in events] == ["started"] + ["result"] * len(doc_ids) + ["summary"]
+    started, summary = events[0], events[-1]
+    assert started["num_cases"] == len(doc_ids)
+    assert summary["run_id"] == started["run_id"]
+    assert summary["num_cases"] == len(doc_ids) and summary["failed_cases"] == 0
+    assert summary["successes"] == sum(1 for event in events[1:-1] if event["hit"])
+    assert set(summary["metrics"]["recall"]) == {"1", "5"}
+
+    # every case is stored under the job's run, so it can be resumed from the CLI
+    service.store.flush()
+    run, _group = service.store.resolve(started["run_id"])
+    assert run["status"] == "finished"
+    assert sorted(service.store.completed_results(started["run_id"])) == sorted(doc_ids)
+    assert client.health()["warm"] == ["numpy:OPENAI_SMALL"]